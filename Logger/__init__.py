@@ -1,21 +1,84 @@
+import atexit
+import json
 import logging
+import os
+import queue
+import time
+from logging.handlers import QueueHandler, QueueListener
+from threading import Lock
 
+_lock = Lock()
+_level = os.environ.get("HERE_OTA_LOG_LEVEL", "INFO").upper()
+_loggers = {}
+_handler = None
+_listener = None
 
-def set_up_logger(name="logger"):
-    logger = logging.getLogger(name)
-    logger.setLevel(logging.DEBUG)
 
-    # create console handler with a higher log level
-    # ch = logging.StreamHandler()
-    # ch.setLevel(logging.DEBUG)
-    ch = logging.StreamHandler()
-    ch.setFormatter(CustomFormatter())
-    logger.addHandler(ch)
+def set_up_logger(name="logger", level=None):
+    """
+    returns the logger with the shared handler, calling it again for the same name does not add another handler
+    :param name: logger name
+    :param level: optional level, HERE_OTA_LOG_LEVEL or INFO by default
+    :return: logging.Logger
+    """
+    with _lock:
+        logger = logging.getLogger(name)
+        if name not in _loggers:
+            logger.setLevel(level or _level)
+            logger.addHandler(_shared_handler())
+            _loggers[name] = logger
+        elif level is not None:
+            logger.setLevel(level)
+        return logger
 
-    return logger
 
+def configure_logging(level=None, structured=False, use_queue=False):
+    """
+    reconfigures every logger set up with set_up_logger and the loggers set up afterwards
+    :param level: optional level such as logging.INFO or "WARNING" for every logger
+    :param structured: if True records are written as one json object per line
+    :param use_queue: if True records are put on a queue and formatted and written by a background thread,
+    the thread logging only pays for building the record
+    """
+    global _handler, _listener, _level
+    with _lock:
+        if level is not None:
+            _level = level
+        stream_handler = logging.StreamHandler()
+        stream_handler.setFormatter(JsonFormatter() if structured else CustomFormatter())
+        _stop_listener()
+        if use_queue:
+            handler = QueueHandler(queue.SimpleQueue())
+            _listener = QueueListener(handler.queue, stream_handler, respect_handler_level=True)
+            _listener.start()
+        else:
+            handler = stream_handler
+        for logger in _loggers.values():
+            logger.removeHandler(_handler)
+            logger.addHandler(handler)
+            if level is not None:
+                logger.setLevel(level)
+        _handler = handler
 
 
+def _shared_handler():
+    global _handler
+    if _handler is None:
+        _handler = logging.StreamHandler()
+        _handler.setFormatter(CustomFormatter())
+    return _handler
+
+
+def _stop_listener():
+    """writes the records still queued and stops the background thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(_stop_listener)
+
 
 class CustomFormatter(logging.Formatter):
 
@@ -41,7 +104,29 @@ class CustomFormatter(logging.Formatter):
         logging.CRITICAL: bold_red + format + reset
     }
 
+    # one formatter per level, built once
+    FORMATTERS = {level: logging.Formatter(log_fmt) for level, log_fmt in FORMATS.items()}
+    DEFAULT_FORMATTER = logging.Formatter(format)
+
+    def format(self, record):
+        return self.FORMATTERS.get(record.levelno, self.DEFAULT_FORMATTER).format(record)
+
+
+class JsonFormatter(logging.Formatter):
+    """formats a record as one json object per line, values passed with extra= are added as keys"""
+
+    standard = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
     def format(self, record):
-        log_fmt = self.FORMATS.get(record.levelno)
-        formatter = logging.Formatter(log_fmt)
-        return formatter.format(record)
+        data = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in self.standard:
+                data[key] = value
+        if record.exc_info:
+            data["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(data, default=str)
@@ -0,0 +1,142 @@
+"""
+end to end benchmark of the main HereOtaClient methods against the local stand-in server.
+reports calls per second, server requests per second and p50/p99 latency of every scenario
+
+    python -m benchmarks.bench_client --fleet-size 2000 --latency 0.01 --calls 200 --json bench.json
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from here_ota_client import HereOtaClient, AsyncHereOtaClient
+from here_ota_client.cache import DeviceUuidCache
+from .stand_in_server import StandInServer, StandInConfig
+
+
+def percentile(values: list, q: float) -> float:
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[int(q) - 1]
+
+
+class Scenario:
+    """times every call of a scenario and counts the requests the server received"""
+
+    def __init__(self, server: StandInServer, name: str) -> None:
+        self.server = server
+        self.name = name
+        self.latencies = []
+
+    def timed(self, func):
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.latencies.append(time.perf_counter() - start)
+        return wrapper
+
+    def run(self, calls) -> dict:
+        """
+        :param calls: function running every call of the scenario
+        :return: dictionary of results
+        """
+        requests_before = sum(self.server.state.requests.values())
+        start = time.perf_counter()
+        calls()
+        elapsed = time.perf_counter() - start
+        requests = sum(self.server.state.requests.values()) - requests_before
+        return {
+            "scenario": self.name,
+            "calls": len(self.latencies),
+            "requests": requests,
+            "calls_per_sec": len(self.latencies) / elapsed,
+            "requests_per_sec": requests / elapsed,
+            "p50_ms": percentile(self.latencies, 50) * 1000,
+            "p99_ms": percentile(self.latencies, 99) * 1000,
+        }
+
+
+def run_benchmarks(config: StandInConfig, calls: int, workers: int) -> list:
+    results = []
+    with StandInServer(config) as server:
+        def new_client(**kwargs):
+            return HereOtaClient(config.username, config.password, base_url=server.url, account_url=server.url,
+                                 **kwargs)
+
+        scenario = Scenario(server, "authenticate")
+        results.append(scenario.run(lambda: [scenario.timed(new_client)() for _ in range(min(calls, 20))]))
+
+        client = new_client()
+        names = [f"{config.envs[0]}-{i:06d}" for i in range(min(calls, config.fleet_size))]
+
+        def sequential(name, method):
+            scenario = Scenario(server, name)
+            results.append(scenario.run(lambda: [scenario.timed(method)(device_name) for device_name in names]))
+
+        def threaded(name, method):
+            scenario = Scenario(server, name)
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results.append(scenario.run(lambda: list(executor.map(scenario.timed(method), names))))
+
+        sequential("get_device_info", client.get_device_info)
+        client.device_cache = DeviceUuidCache()
+        sequential("get_device_uuid (cold cache)", client.get_device_uuid)
+        sequential("get_device_history (warm cache)", client.get_device_history)
+        sequential("get_device_assignments (warm cache)", client.get_device_assignments)
+        sequential("get_device_network (warm cache)", client.get_device_network)
+        threaded(f"get_device_history x{workers} threads", client.get_device_history)
+
+        group_id = client.resolve_group(f"{config.envs[0]}-group-0000")["id"]
+        scenario = Scenario(server, "iter_group_devices (full group)")
+        results.append(scenario.run(lambda: scenario.timed(lambda: list(client.iter_group_devices(group_id)))()))
+
+        scenario = Scenario(server, "find_envs_for_device_names (20 names)")
+        results.append(scenario.run(lambda: scenario.timed(client.find_envs_for_device_names)(names[:20])))
+
+        group_id = client.create_static_group("bench-bulk")
+        scenario = Scenario(server, f"add_devices_to_group ({len(names)} devices)")
+        results.append(scenario.run(
+            lambda: scenario.timed(client.add_devices_to_group)("bench-bulk", names, group_id=group_id)
+        ))
+
+        async def gather_history(scenario):
+            async with AsyncHereOtaClient(config.username, config.password, max_concurrency=workers,
+                                          base_url=server.url, account_url=server.url) as async_client:
+                async def timed(device_name):
+                    start = time.perf_counter()
+                    await async_client.get_device_history(device_name)
+                    scenario.latencies.append(time.perf_counter() - start)
+                await asyncio.gather(*(timed(device_name) for device_name in names))
+
+        scenario = Scenario(server, f"async get_device_history (concurrency {workers})")
+        results.append(scenario.run(lambda: asyncio.run(gather_history(scenario))))
+        client.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="benchmark HereOtaClient against the local stand-in server")
+    parser.add_argument("--fleet-size", type=int, default=2000)
+    parser.add_argument("--groups", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.005, help="seconds the stand-in adds to every request")
+    parser.add_argument("--calls", type=int, default=200, help="calls per scenario")
+    parser.add_argument("--workers", type=int, default=8, help="threads or concurrency of the parallel scenarios")
+    parser.add_argument("--json", help="write the results to this json file")
+    args = parser.parse_args()
+    config = StandInConfig(fleet_size=args.fleet_size, groups=args.groups, latency=args.latency)
+    results = run_benchmarks(config, args.calls, args.workers)
+
+    print(f"{'scenario':<48}{'calls':>7}{'req':>7}{'calls/s':>10}{'req/s':>10}{'p50 ms':>9}{'p99 ms':>9}")
+    for result in results:
+        print(f"{result['scenario']:<48}{result['calls']:>7}{result['requests']:>7}{result['calls_per_sec']:>10.1f}"
+              f"{result['requests_per_sec']:>10.1f}{result['p50_ms']:>9.2f}{result['p99_ms']:>9.2f}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"config": vars(args), "created_at": time.time(), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+micro benchmark of the websocket message decoding functions on a corpus of websocket frames
+
+    python -m benchmarks.bench_event_decoding [--repeat 5000]
+"""
+import argparse
+import json
+import os
+import re
+import timeit
+from here_ota_client import utils
+from here_ota_client.events import decode_device_event, decode_device_events
+
+corpus_path = os.path.join(os.path.dirname(__file__), "data", "websocket_frames.jsonl")
+
+
+def legacy_is_device_event(message):
+    # utils.is_device_event before the fast reject was added
+    data = json.loads(message)
+    data_type = data.get("type", False)
+    if data_type is False or data_type != "DeviceEventMessage":
+        return False
+    return data['event']['payload']['correlationId'], data['event']['eventType']['id']
+
+
+def legacy_collect_event_occurred_and_correlation_id(message):
+    # utils.collect_event_occurred_and_correlation_id before the patterns were precompiled
+    event = re.search(r"{.id.:[\"'](.*?)[\"'],", message).groups()[0]
+    correlation = re.search(r"correlationId.*:[\"''](.*)[\"'],", message).groups()[0]
+    return event, correlation
+
+
+def load_corpus(repeat: int) -> list:
+    with open(corpus_path) as f:
+        frames = [line.strip() for line in f if line.strip()]
+    return frames * repeat
+
+
+def bench(name: str, func, number: int, frames: int) -> None:
+    seconds = min(timeit.repeat(func, number=number, repeat=3))
+    print(f"{name:<55} {frames * number / seconds:>14,.0f} msg/s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5000, help="times the corpus is repeated")
+    args = parser.parse_args()
+    frames = load_corpus(args.repeat)
+    events = [frame for frame in frames if "DeviceEventMessage" in frame]
+    print(f"{len(frames)} frames, {len(events)} device events")
+
+    bench("legacy is_device_event", lambda: [legacy_is_device_event(m) for m in frames], 1, len(frames))
+    bench("utils.is_device_event", lambda: [utils.is_device_event(m) for m in frames], 1, len(frames))
+    bench("events.decode_device_event", lambda: [decode_device_event(m) for m in frames], 1, len(frames))
+    bench("events.decode_device_events (batch)", lambda: decode_device_events(frames), 1, len(frames))
+    bench("legacy collect_event_occurred_and_correlation_id",
+          lambda: [legacy_collect_event_occurred_and_correlation_id(m) for m in events], 1, len(events))
+    bench("utils.collect_event_occurred_and_correlation_id",
+          lambda: [utils.collect_event_occurred_and_correlation_id(m) for m in events], 1, len(events))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,609 @@
+"""
+local stand-in for the here ota and here account apis used by HereOtaClient. it emulates the sign in redirects and
+csrf pages, the org/env pages, device search, groups, assignments, history, events, network info, updates,
+software targets, campaigns and the websocket with a generated fleet and a configurable latency per request
+
+    python -m benchmarks.stand_in_server --port 8080 --fleet-size 10000 --latency 0.02
+
+    client = HereOtaClient("stand-in@example.com", "stand-in", base_url="http://127.0.0.1:8080",
+                           account_url="http://127.0.0.1:8080")
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import threading
+import uuid as uuid_lib
+from collections import Counter, deque
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from aiohttp import web, WSMsgType
+
+uuid_namespace = uuid_lib.UUID("9a0c6f1e-3d1b-4f0a-9b7e-2b8d0c6e4f11")
+epoch = datetime(2023, 1, 1, tzinfo=timezone.utc)
+
+
+def stable_uuid(name: str) -> str:
+    return str(uuid_lib.uuid5(uuid_namespace, name))
+
+
+def timestamp(seconds: float) -> str:
+    return (epoch + timedelta(seconds=seconds)).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+@dataclass
+class StandInConfig:
+    username: str = "stand-in@example.com"
+    password: str = "stand-in"
+    envs: tuple = ("default", "staging")
+    fleet_size: int = 1000
+    groups: int = 20
+    updates: int = 50
+    targets: int = 200
+    hardware_ids: int = 10
+    history_per_device: int = 15
+    latency: float = 0.0
+    jitter: float = 0.0
+    event_interval: float = 0.001
+    failure_every: int = 10
+
+
+class Env:
+    """generated fleet, groups, updates and campaigns of one env"""
+
+    def __init__(self, name: str, config: StandInConfig) -> None:
+        self.name = name
+        self.namespace = f"auth0|{name}"
+        self.csrf_token = f"csrf-{name}"
+        self.devices = []
+        self.devices_by_uuid = {}
+        self.device_index = {}
+        for i in range(config.fleet_size):
+            device_name = f"{name}-{i:06d}"
+            device = {
+                "namespace": self.namespace,
+                "uuid": stable_uuid(device_name),
+                "deviceName": device_name,
+                "deviceId": device_name,
+                "deviceType": "Vehicle",
+                "lastSeen": timestamp(90 * 86400 + i),
+                "createdAt": timestamp(i),
+                "activatedAt": timestamp(i + 60),
+                "deviceStatus": "UpToDate",
+            }
+            self.devices.append(device)
+            self.devices_by_uuid[device["uuid"]] = device
+            self.device_index[device["uuid"]] = i
+        self.groups = []
+        self.group_members = {}
+        for j in range(config.groups):
+            self.add_group(f"{name}-group-{j:04d}")
+            self.group_members[self.groups[-1]["id"]] = {
+                device["uuid"]: None for device in self.devices[j::config.groups]
+            }
+        self.updates = [
+            {
+                "uuid": stable_uuid(f"{name}-update-{k}"),
+                "name": f"{name}-update-{k:04d}",
+                "description": f"generated update {k}",
+                "createdAt": timestamp(k * 3600),
+                "updatedAt": timestamp(k * 3600 + 60),
+            }
+            for k in range(config.updates)
+        ]
+        self.targets = {}
+        for k in range(config.targets):
+            target_name = f"{name}-software-{k % 20:02d}"
+            version = f"{k // 20}.{k % 7}.{k % 3}"
+            self.targets[f"{target_name}-{version}"] = {
+                "hashes": {"sha256": hashlib.sha256(f"{target_name}-{version}".encode()).hexdigest()},
+                "length": 1024 * (k + 1),
+                "custom": {
+                    "name": target_name,
+                    "version": version,
+                    "hardwareIds": [f"hw-{(k + h) % config.hardware_ids:02d}" for h in range(2)],
+                    "targetFormat": "BINARY",
+                    "uri": None,
+                    "createdAt": timestamp(k * 600),
+                    "updatedAt": timestamp(k * 600),
+                },
+            }
+        self.targets_version = 1
+        self.campaigns = {}
+        self.extra_history = {}
+        self.assignments = {}
+
+    def targets_document(self) -> dict:
+        return {
+            "signatures": [{"keyid": stable_uuid(f"{self.name}-targets-key"), "method": "ed25519", "sig": "stand-in"}],
+            "signed": {"_type": "Targets", "expires": timestamp(365 * 86400), "targets": self.targets,
+                       "version": self.targets_version},
+        }
+
+    def add_group(self, name: str, group_type: str = "static") -> dict:
+        group = {
+            "id": stable_uuid(f"{self.name}-group-{len(self.groups)}-{name}"),
+            "groupName": name,
+            "namespace": self.namespace,
+            "createdAt": timestamp(len(self.groups) * 60),
+            "updatedAt": timestamp(len(self.groups) * 60),
+            "groupType": group_type,
+            "expression": None,
+        }
+        self.groups.append(group)
+        self.group_members[group["id"]] = {}
+        return group
+
+    def history(self, device_uuid: str, count: int) -> list:
+        entries = list(reversed(self.extra_history.get(device_uuid, [])))
+        index = self.device_index[device_uuid]
+        for k in range(count):
+            entries.append({
+                "deviceUuid": device_uuid,
+                "correlationId": f"urn:here-ota:campaign:{stable_uuid(f'{self.name}-history-{k}')}",
+                "success": (index + k) % 7 != 0,
+                "receivedAt": timestamp(86400 * (count - k) + index),
+            })
+        return entries
+
+
+def page(values: list, request: web.Request) -> dict:
+    limit = int(request.query.get("limit", 50))
+    offset = int(request.query.get("offset", 0))
+    return {"values": values[offset:offset + limit], "total": len(values), "offset": offset, "limit": limit}
+
+
+class StandInState:
+    def __init__(self, config: StandInConfig) -> None:
+        self.config = config
+        self.envs = {name: Env(name, config) for name in config.envs}
+        self.envs_by_token = {env.csrf_token: env for env in self.envs.values()}
+        self.sessions = set()
+        self.requests = Counter()
+        self.sockets = set()
+        self.tasks = set()
+        self.faults = {}
+
+    def inject_faults(self, route: str, *statuses: int, retry_after: str = None) -> None:
+        """
+        answers the next requests of a route such as "GET /api/v1/devices" with the statuses, one per request
+        :param retry_after: optional Retry-After header of the fault responses
+        """
+        self.faults.setdefault(route, deque()).extend((status, retry_after) for status in statuses)
+
+    def expire_sessions(self) -> None:
+        """drops every session so the next api request gets a 401"""
+        self.sessions.clear()
+
+    async def close_sockets(self) -> None:
+        """closes every websocket connection so listeners have to reconnect"""
+        for ws in list(self.sockets):
+            await ws.close()
+
+    def env_for(self, request: web.Request) -> Env:
+        if request.cookies.get("session") not in self.sessions:
+            raise web.HTTPUnauthorized(text=json.dumps({"error": "no session"}), content_type="application/json")
+        env = self.envs_by_token.get(request.headers.get("Csrf-Token"))
+        if env is None:
+            raise web.HTTPForbidden(text=json.dumps({"error": "invalid csrf token"}), content_type="application/json")
+        return env
+
+    async def broadcast(self, message: dict) -> None:
+        data = json.dumps(message)
+        for ws in list(self.sockets):
+            try:
+                await ws.send_str(data)
+            except ConnectionError:
+                self.sockets.discard(ws)
+
+
+def conditional_response(request: web.Request, body: bytes, last_modified: str = None) -> web.Response:
+    """json response with an etag of its body, answered with 304 when the request carries the same etag"""
+    etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+    headers = {"ETag": etag}
+    if last_modified:
+        headers["Last-Modified"] = last_modified
+    if request.headers.get("If-None-Match") == etag:
+        return web.Response(status=304, headers=headers)
+    return web.Response(body=body, content_type="application/json", headers=headers)
+
+
+def html_page(csrf_token: str, websocket_url: str) -> str:
+    return (
+        "<html><body>\n"
+        f'<input type="hidden" id="csrf-token-val" value="{csrf_token}">\n'
+        f'<input type="hidden" id="ws-url" value="{websocket_url}">\n'
+        "</body></html>\n"
+    )
+
+
+def create_app(config: StandInConfig = None) -> web.Application:
+    config = config or StandInConfig()
+    state = StandInState(config)
+    routes = web.RouteTableDef()
+
+    @web.middleware
+    async def latency_middleware(request, handler):
+        route = request.match_info.route.resource
+        key = f"{request.method} {route.canonical if route else request.path}"
+        state.requests[key] += 1
+        if config.latency or config.jitter:
+            await asyncio.sleep(config.latency + random.uniform(0, config.jitter))
+        if state.faults.get(key):
+            status, retry_after = state.faults[key].popleft()
+            return web.Response(status=status, text=json.dumps({"error": "injected fault"}),
+                                headers={"Retry-After": retry_after} if retry_after else None)
+        return await handler(request)
+
+    # sign in flow
+
+    @routes.get("/")
+    async def index(request):
+        raise web.HTTPFound("/login/1")
+
+    @routes.get("/login/1")
+    async def login_1(request):
+        raise web.HTTPFound("/login/2")
+
+    @routes.get("/login/2")
+    async def login_2(request):
+        raise web.HTTPFound(
+            "/sign-in?client-id=stand-in-client&realm=here",
+            headers={"x-correlation-id": str(uuid_lib.uuid4())},
+        )
+
+    @routes.get("/sign-in")
+    async def sign_in_page(request):
+        response = web.Response(text="<script>window.here = {csrf: 'account-csrf', realm: 'here'};</script>\n",
+                                content_type="text/html")
+        response.set_cookie("state", "stand-in-state")
+        return response
+
+    @routes.post("/api/account/sign-in-with-password")
+    async def sign_in(request):
+        data = await request.json()
+        if request.headers.get("x-csrf-token") != "account-csrf" \
+                or data.get("email") != config.username or data.get("password") != config.password:
+            return web.json_response({"error": "invalid credentials"}, status=401)
+        session = str(uuid_lib.uuid4())
+        state.sessions.add(session)
+        response = web.json_response({
+            "accessToken": f"token-{session}",
+            "userId": stable_uuid(config.username),
+            "firstname": "Stand",
+            "lastname": "In",
+            "email": config.username,
+        })
+        response.set_cookie("session", session)
+        return response
+
+    @routes.get("/authorize")
+    async def authorize(request):
+        if request.cookies.get("session") not in state.sessions:
+            raise web.HTTPUnauthorized()
+        default = next(iter(state.envs.values()))
+        return web.Response(text=html_page(default.csrf_token, f"ws://{request.host}/ws"), content_type="text/html")
+
+    @routes.get("/user/organizations")
+    async def organizations(request):
+        state.env_for(request)
+        return web.json_response([{"name": env.name, "namespace": env.namespace} for env in state.envs.values()])
+
+    @routes.get("/user/organizations/default")
+    async def default_organization(request):
+        state.env_for(request)
+        default = next(iter(state.envs.values()))
+        return web.json_response({"name": default.name, "namespace": default.namespace})
+
+    @routes.get("/organizations/{namespace}/index")
+    async def organization_index(request):
+        if request.cookies.get("session") not in state.sessions:
+            raise web.HTTPUnauthorized()
+        for env in state.envs.values():
+            if env.namespace == request.match_info["namespace"]:
+                return web.Response(text=html_page(env.csrf_token, f"ws://{request.host}/ws"),
+                                    content_type="text/html")
+        raise web.HTTPNotFound()
+
+    # devices
+
+    @routes.get("/api/v1/devices")
+    async def search_devices(request):
+        env = state.env_for(request)
+        devices = env.devices
+        group_id = request.query.get("groupId")
+        if group_id:
+            members = env.group_members.get(group_id, {})
+            devices = [env.devices_by_uuid[device_uuid] for device_uuid in members]
+        name_contains = request.query.get("nameContains", "")
+        if name_contains:
+            devices = [device for device in devices if name_contains in device["deviceName"]]
+        return web.json_response(page(devices, request))
+
+    def device_for(request) -> tuple:
+        env = state.env_for(request)
+        device = env.devices_by_uuid.get(request.match_info["uuid"])
+        if device is None:
+            raise web.HTTPNotFound(text=json.dumps({"error": "device not found"}), content_type="application/json")
+        return env, device
+
+    @routes.get("/api/v1/devices/{uuid}")
+    async def device_info(request):
+        return web.json_response(device_for(request)[1])
+
+    @routes.get("/api/v1/devices/{uuid}/installation_history")
+    async def installation_history(request):
+        env, device = device_for(request)
+        return web.json_response(page(env.history(device["uuid"], config.history_per_device), request))
+
+    @routes.get("/api/v1/devices/{uuid}/events")
+    async def device_events(request):
+        env, device = device_for(request)
+        return web.json_response([
+            {"deviceUuid": device["uuid"], "eventType": {"id": "EcuInstallationCompleted", "version": 0},
+             "receivedAt": entry["receivedAt"], "payload": {"correlationId": entry["correlationId"],
+                                                            "success": entry["success"]}}
+            for entry in env.history(device["uuid"], 3)
+        ])
+
+    @routes.get("/api/v1/devices/{uuid}/system_info/network")
+    async def device_network(request):
+        env, device = device_for(request)
+        index = int(device["uuid"][:4], 16)
+        return web.json_response({
+            "local_ipv4": f"10.{index >> 8 & 255}.{index & 255}.17",
+            "mac": f"02:42:ac:{index >> 8 & 255:02x}:{index & 255:02x}:02",
+            "hostname": device["deviceName"],
+        })
+
+    @routes.get("/api/v1/assignments/{uuid}")
+    async def assignments(request):
+        env, device = device_for(request)
+        return web.json_response(env.assignments.get(device["uuid"], []))
+
+    # groups
+
+    @routes.get("/api/v1/device_groups")
+    async def groups(request):
+        env = state.env_for(request)
+        values = env.groups
+        if request.query.get("sortBy") == "createdAt":
+            values = sorted(values, key=lambda group: group["createdAt"], reverse=True)
+        return web.json_response(page(values, request))
+
+    @routes.post("/api/v1/device_groups")
+    async def create_group(request):
+        env = state.env_for(request)
+        data = await request.json()
+        if any(group["groupName"] == data["name"] for group in env.groups):
+            raise web.HTTPConflict(text=f"A group named {data['name']} already exists")
+        return web.json_response(env.add_group(data["name"], data.get("groupType", "static"))["id"])
+
+    @routes.route("*", "/api/v1/device_groups/{group_id}/devices/{uuid}")
+    async def group_membership(request):
+        env, device = device_for(request)
+        members = env.group_members.get(request.match_info["group_id"])
+        if members is None:
+            raise web.HTTPNotFound()
+        if request.method == "POST":
+            members[device["uuid"]] = None
+        elif request.method == "DELETE":
+            members.pop(device["uuid"], None)
+        else:
+            raise web.HTTPMethodNotAllowed(request.method, ["POST", "DELETE"])
+        return web.Response()
+
+    # updates and campaigns
+
+    @routes.get("/api/v2/updates")
+    async def updates(request):
+        env = state.env_for(request)
+        name_contains = request.query.get("nameContains", "")
+        values = [update for update in env.updates if name_contains in update["name"]]
+        if request.query.get("sortBy") == "createdAt":
+            values = sorted(values, key=lambda update: update["createdAt"], reverse=True)
+        return conditional_response(request, json.dumps(page(values, request)).encode())
+
+    @routes.get("/api/v1/user_repo/targets.json")
+    async def targets(request):
+        env = state.env_for(request)
+        return conditional_response(request, json.dumps(env.targets_document()).encode(),
+                                    "Sun, 01 Jan 2023 00:00:00 GMT")
+
+    def check_origin(request) -> None:
+        """the campaign write endpoints reject requests without the Origin of the api"""
+        if request.headers.get("Origin") != f"{request.scheme}://{request.host}":
+            raise web.HTTPForbidden(text=json.dumps({"error": "invalid origin"}), content_type="application/json")
+
+    @routes.post("/api/v2/campaigns")
+    async def create_campaign(request):
+        env = state.env_for(request)
+        check_origin(request)
+        data = await request.json()
+        campaign_id = str(uuid_lib.uuid4())
+        env.campaigns[campaign_id] = {
+            "id": campaign_id,
+            "name": data["name"],
+            "update": data["update"],
+            "groups": data["groups"],
+            "status": "prepared",
+            "stats": {"processed": 0, "affected": 0, "finished": 0, "failed": 0, "cancelled": 0},
+        }
+        return web.json_response(campaign_id)
+
+    def campaign_for(request) -> tuple:
+        env = state.env_for(request)
+        campaign = env.campaigns.get(request.match_info["campaign_id"])
+        if campaign is None:
+            raise web.HTTPNotFound()
+        return env, campaign
+
+    @routes.get("/api/v2/campaigns/{campaign_id}")
+    async def campaign_info(request):
+        return web.json_response(campaign_for(request)[1])
+
+    @routes.get("/api/v2/campaigns/{campaign_id}/stats")
+    async def campaign_stats(request):
+        campaign = campaign_for(request)[1]
+        return web.json_response({"campaign": campaign["id"], "status": campaign["status"], **campaign["stats"]})
+
+    @routes.post("/api/v2/campaigns/{campaign_id}/launch")
+    async def launch_campaign(request):
+        env, campaign = campaign_for(request)
+        check_origin(request)
+        if campaign["status"] != "prepared":
+            raise web.HTTPConflict()
+        task = asyncio.ensure_future(run_campaign(env, campaign))
+        state.tasks.add(task)
+        task.add_done_callback(state.tasks.discard)
+        return web.Response()
+
+    async def run_campaign(env: Env, campaign: dict) -> None:
+        correlation_id = f"urn:here-ota:campaign:{campaign['id']}"
+        device_uuids = list(dict.fromkeys(
+            device_uuid for group_id in campaign["groups"] for device_uuid in env.group_members.get(group_id, {})
+        ))
+        campaign["status"] = "launched"
+        campaign["stats"]["affected"] = campaign["stats"]["processed"] = len(device_uuids)
+        for device_uuid in device_uuids:
+            env.assignments[device_uuid] = [{"correlationId": correlation_id, "deviceId": device_uuid,
+                                             "inFlight": False}]
+        for n, device_uuid in enumerate(device_uuids, 1):
+            success = config.failure_every <= 0 or n % config.failure_every != 0
+            for event_type in ("EcuDownloadStarted", "EcuDownloadCompleted", "EcuInstallationStarted",
+                               "EcuInstallationCompleted"):
+                payload = {"correlationId": correlation_id, "ecu": device_uuid[:16]}
+                if event_type == "EcuInstallationCompleted":
+                    payload["success"] = success
+                await state.broadcast({"type": "DeviceEventMessage", "event": {
+                    "deviceUuid": device_uuid, "eventId": str(uuid_lib.uuid4()),
+                    "eventType": {"id": event_type, "version": 0}, "receivedAt": timestamp(n),
+                    "payload": payload,
+                }})
+            await state.broadcast({"type": "DeviceSeen", "event": {"uuid": device_uuid}})
+            env.assignments.pop(device_uuid, None)
+            env.extra_history.setdefault(device_uuid, []).append({
+                "deviceUuid": device_uuid, "correlationId": correlation_id, "success": success,
+                "receivedAt": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+            })
+            campaign["stats"]["finished"] += 1
+            if not success:
+                campaign["stats"]["failed"] += 1
+            await asyncio.sleep(config.event_interval)
+        campaign["status"] = "finished"
+
+    # websocket
+
+    @routes.get("/ws")
+    async def websocket(request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        state.sockets.add(ws)
+        try:
+            async for message in ws:
+                if message.type == WSMsgType.ERROR:
+                    break
+        finally:
+            state.sockets.discard(ws)
+        return ws
+
+    app = web.Application(middlewares=[latency_middleware])
+    app.add_routes(routes)
+    app["state"] = state
+    return app
+
+
+class StandInServer:
+    """
+    runs the stand-in on a background thread, for tests and benchmarks
+
+    with StandInServer(StandInConfig(fleet_size=500)) as server:
+        client = HereOtaClient(server.config.username, server.config.password,
+                               base_url=server.url, account_url=server.url)
+    """
+
+    def __init__(self, config: StandInConfig = None, host: str = "127.0.0.1", port: int = 0) -> None:
+        self.config = config or StandInConfig()
+        self.host = host
+        self.port = port
+        self.url = None
+        self.app = None
+        self._loop = None
+        self._runner = None
+        self._thread = None
+
+    @property
+    def state(self) -> StandInState:
+        return self.app["state"]
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def start(self) -> str:
+        ready = threading.Event()
+        self._loop = asyncio.new_event_loop()
+
+        async def setup():
+            self.app = create_app(self.config)
+            self._runner = web.AppRunner(self.app)
+            await self._runner.setup()
+            site = web.TCPSite(self._runner, self.host, self.port)
+            await site.start()
+            host, port = self._runner.addresses[0][:2]
+            self.url = f"http://{host}:{port}"
+
+        def run():
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(setup())
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self.url
+
+    def stop(self) -> None:
+        if self._loop is None:
+            return
+        future = asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop)
+        future.result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
+
+    async def _shutdown(self) -> None:
+        for ws in list(self.state.sockets):
+            await ws.close()
+        await self._runner.cleanup()
+
+    def call(self, func, *args):
+        """runs func on the server loop, use it to change the server state from another thread"""
+        async def run():
+            result = func(*args)
+            return await result if asyncio.iscoroutine(result) else result
+        return asyncio.run_coroutine_threadsafe(run(), self._loop).result()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="local stand-in for the here ota api")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--fleet-size", type=int, default=1000)
+    parser.add_argument("--groups", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="maximum random seconds added to the latency")
+    args = parser.parse_args()
+    config = StandInConfig(fleet_size=args.fleet_size, groups=args.groups, latency=args.latency, jitter=args.jitter)
+    print(f"username: {config.username} password: {config.password}")
+    web.run_app(create_app(config), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
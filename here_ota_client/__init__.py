@@ -1 +1,2 @@
-from .client import HereOtaClient
\ No newline at end of file
+from .client import HereOtaClient
+from .async_client import AsyncHereOtaClient
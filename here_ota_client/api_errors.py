@@ -20,3 +20,7 @@ class EnvironmentChangeError(Exception):
 
 class GroupNotFoundError(Exception):
     pass
+
+
+class AmbiguousMatchError(Exception):
+    pass
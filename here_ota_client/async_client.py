@@ -0,0 +1,626 @@
+import asyncio
+import time
+import aiohttp
+from contextlib import asynccontextmanager
+from typing import Self
+from urllib.parse import urlsplit
+from Logger import set_up_logger
+from . import index, utils
+from .api_errors import AuthenticationError, DeviceNotFoundError, InvalidEnvironmentError, GroupNotFoundError
+from .cache import DeviceUuidCache
+from .events import EventStream
+from .metrics import RequestMetrics
+from .pagination import aiter_pages
+from .resolve import exact_match
+from .client import (
+    here_ota_url,
+    here_account_url,
+    rebase_url,
+    scoped_envs,
+    here_ota_code_endpoint,
+    here_ota_search_device_by_device_name,
+    build_here_ota_devices_url,
+    here_ota_search_device_by_uuid,
+    here_ota_assignments,
+    here_ota_campaigns,
+    here_ota_envs_endpoint,
+    here_ota_default_namespace,
+    here_ota_create_group_endpoint,
+    build_env_url,
+    build_get_here_ota_campaign_data_url,
+    build_here_ota_authorize_url,
+    build_here_ota_add_device_to_group_endpoint,
+    build_get_here_ota_groups_url,
+    build_here_ota_devices_in_group_url,
+    build_here_ota_events_url,
+    build_here_ota_device_history_url,
+    build_here_ota_device_network_endpoint,
+)
+
+logger = set_up_logger(name="here-ota-async-client")
+
+user_agent = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/108.0.0.0 Safari/537.36"
+
+
+class AsyncHereOtaClient:
+    """
+    An asyncio api client for here ota built on aiohttp. Mirrors the methods of HereOtaClient as coroutines,
+    every request shares one connection pool and is bounded by a semaphore so many lookups can overlap
+
+    async with AsyncHereOtaClient(username, password) as client:
+        results = await asyncio.gather(*(client.get_device_history(name) for name in device_names))
+    """
+
+    def __init__(self: Self, username: str, password: str, max_concurrency: int = 20, pool_size: int = 100,
+                 device_cache: DeviceUuidCache = None, base_url: str = here_ota_url,
+                 account_url: str = here_account_url, metrics: RequestMetrics = None,
+                 env_context_ttl: float = 900) -> None:
+        """
+        stores the credentials and concurrency settings, no requests are made until authenticate is awaited
+        :param username: here account username
+        :param password: here account password
+        :param max_concurrency: the maximum amount of requests in flight at the same time
+        :param pool_size: the maximum amount of open connections in the shared pool
+        :param device_cache: optional DeviceUuidCache, by default an in memory cache is used
+        :param base_url: url of the here ota api, change it to run against another host such as a local stand-in
+        :param account_url: url of the here account sign in api
+        :param metrics: optional RequestMetrics recording every request sent, see stats
+        :param env_context_ttl: seconds the csrf token and websocket url of an env are reused, see env_context
+        """
+        self.metrics = metrics
+        self.env_context_ttl = env_context_ttl
+        self._env_contexts = {}
+        self.__username = username
+        self.__password = password
+        self.__websocket = None
+        self.__authentication_data = None
+        self.__env = None
+        self.__envs = None
+        self.__csrf_token = None
+        self.token = None
+        self.userId = None
+        self.headers = {"User-Agent": user_agent}
+        self.base_url = base_url.rstrip("/") + "/"
+        self.account_url = account_url.rstrip("/") + "/"
+        self.max_concurrency = max_concurrency
+        self.pool_size = pool_size
+        self.session = None
+        self._semaphore = None
+        self.device_cache = device_cache if device_cache is not None else DeviceUuidCache()
+
+    async def __aenter__(self: Self) -> Self:
+        await self.authenticate()
+        return self
+
+    async def __aexit__(self: Self, *exc_info) -> None:
+        await self.close()
+
+    @classmethod
+    async def create(cls, username: str, password: str, **kwargs) -> Self:
+        """
+        builds and authenticates a client
+        :return: authenticated AsyncHereOtaClient
+        """
+        client = cls(username, password, **kwargs)
+        await client.authenticate()
+        return client
+
+    @property
+    def current_env(self):
+        return self._scoped_env() or self.__env
+
+    @property
+    def list_envs(self):
+        return self.__envs
+
+    @property
+    def websocket_url(self):
+        return self.__websocket
+
+    def _scoped_env(self: Self) -> str or None:
+        envs = scoped_envs.get()
+        return envs.get(id(self)) if envs else None
+
+    @asynccontextmanager
+    async def use_env(self: Self, env: str or None):
+        """
+        scopes the requests made in the async with block to env without changing the current env of the client,
+        other tasks keep their own env so it can be used with asyncio.gather
+
+        async with client.use_env("staging"):
+            await client.get_device_history(device_name)
+
+        :param env: environment name, None leaves the env unchanged
+        :return: the env context
+        """
+        if env is None:
+            yield None
+            return
+        context = await self.env_context(env)
+        token = scoped_envs.set({**(scoped_envs.get() or {}), id(self): env})
+        try:
+            yield context
+        finally:
+            scoped_envs.reset(token)
+
+    def event_stream(self: Self, **kwargs) -> EventStream:
+        """
+        builds an EventStream on the websocket of the current env sharing this client's session and cookies
+        :param kwargs: passed on to EventStream
+        :return: EventStream
+        """
+        self._open_session()
+        return EventStream(self.__websocket, headers={"User-Agent": self.headers["User-Agent"]},
+                           session=self.session, **kwargs)
+
+    def _open_session(self: Self) -> None:
+        """
+        creates the shared aiohttp session and semaphore, must be called from inside the running loop
+        :return: void
+        """
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size)
+            # unsafe cookie jar to keep cookies of ip hosts such as a local stand-in
+            self.session = aiohttp.ClientSession(connector=connector, cookie_jar=aiohttp.CookieJar(unsafe=True))
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    async def close(self: Self) -> None:
+        self.device_cache.save()
+        if self.session is not None:
+            await self.session.close()
+
+    async def request(self: Self, method: str, url: str, headers: dict = None, **kwargs) -> aiohttp.ClientResponse:
+        """
+        performs a request through the shared session, waiting on the semaphore first.
+        the body is read before the connection is released so the response can be used afterwards
+        :param method: http method as a string
+        :param url: url as a string
+        :param headers: extra headers for this request only
+        :return: aiohttp ClientResponse with the body already read
+        """
+        self._open_session()
+        url = rebase_url(url, self.base_url, self.account_url)
+        request_headers = dict(self.headers)
+        env = self._scoped_env()
+        if env is not None and url.startswith(self.base_url + "api/"):
+            # the csrf token of the scoped env, a per request token still wins
+            request_headers["Csrf-Token"] = (await self.env_context(env))["csrf_token"]
+        if headers:
+            request_headers.update(headers)
+        async with self._semaphore:
+            start = time.perf_counter()
+            try:
+                async with self.session.request(method, url, headers=request_headers, **kwargs) as r:
+                    body = await r.read()
+            except aiohttp.ClientError:
+                if self.metrics is not None:
+                    self.metrics.record(method, url, None, time.perf_counter() - start)
+                raise
+        if self.metrics is not None:
+            self.metrics.record(method, url, r.status, time.perf_counter() - start, len(body))
+        return r
+
+    def stats(self: Self) -> dict:
+        """
+        snapshot of the request metrics per endpoint template and of the device uuid cache,
+        endpoints is empty when the client was created without metrics
+        :return: dictionary
+        """
+        return {
+            "endpoints": self.metrics.stats() if self.metrics is not None else {},
+            "cache": {"device_uuid": {"hits": self.device_cache.hits, "misses": self.device_cache.misses}},
+        }
+
+    async def get(self: Self, url: str, **kwargs) -> aiohttp.ClientResponse:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self: Self, url: str, **kwargs) -> aiohttp.ClientResponse:
+        return await self.request("POST", url, **kwargs)
+
+    async def delete(self: Self, url: str, **kwargs) -> aiohttp.ClientResponse:
+        return await self.request("DELETE", url, **kwargs)
+
+    async def authenticate(self: Self) -> None:
+        """
+        Collect the X-CSRF-Token from here OTA then use it to authenticate with
+        username and password. set a token for the current session
+        :return: void
+        """
+        # get request to here ota to get the csrf token, the redirects are followed and kept in the history
+        r1 = await self.get(here_ota_url, headers={"X-CSRF-Token": "fetch"})
+        csrf_token = utils.get_here_ota_token1(await r1.text())
+        client_id = utils.get_here_ota_client_id(r1.history[2].headers['Location'])
+        x_correlation_id = r1.history[-1].headers['x-correlation-id']
+
+        # post the users credentials with the csrf, client id and x correlation id in the headers
+        r2 = await self.post(
+            here_ota_code_endpoint,
+            headers={
+                "x-client": client_id,
+                "x-correlation-id": x_correlation_id,
+                "x-csrf-token": csrf_token,
+                "x-oidc": "true",
+                "x-realm": "here",
+                "x-sdk": "true",
+                "x-uri": "null"
+            },
+            json={
+                "realm": "here",
+                "email": self.__username,
+                "password": self.__password,
+                "rememberMe": True,
+                "isConversionSignIn": False,
+            }
+        )
+
+        # collect the access token, and state from the post request
+        self.__authentication_data = await r2.json(content_type=None)
+        self.token = self.__authentication_data.get('accessToken', False)
+        self.userId = self.__authentication_data.get("userId", False)
+        if not self.token:
+            raise AuthenticationError(f"Unable to authenticate: {self.__username} validate user credentials")
+        state = next((cookie.value for cookie in self.session.cookie_jar if cookie.key == "state"), None)
+
+        # authorize the client and state
+        authenticated = await self.get(build_here_ota_authorize_url(client_id, state))
+        content = await authenticated.text()
+        if authenticated.status != 200:
+            logger.debug(content)
+            raise AuthenticationError(f"Unable to authenticate: {self.__username}")
+        self.__csrf_token = utils.get_here_ota_token2(content)
+        self.headers["Csrf-Token"] = self.__csrf_token
+        logger.info("Authenticated")
+
+        # save the websocket url to use to listen for ECU events
+        self.__websocket = utils.get_here_ota_websocket_addr(content)
+
+        # set available envs and the current / default env
+        envs_data = await (await self.get(here_ota_envs_endpoint)).json(content_type=None)
+        self.__envs = {i["name"]: i["namespace"] for i in envs_data}
+        self.__env = (await (await self.get(here_ota_default_namespace)).json(content_type=None))["name"]
+        self._env_contexts = {self.__env: (
+            {"env": self.__env, "namespace": self.__envs.get(self.__env), "csrf_token": self.__csrf_token,
+             "websocket": self.__websocket},
+            time.monotonic() + self.env_context_ttl,
+        )}
+        logger.info("Current env %s", self.__env)
+
+    async def change_env(self: Self, env: str) -> None:
+        """
+        changes the current session environment to the specified env, no request is made
+        while the cached context of the env has not expired
+        :param env: environment to change to
+        :return: void
+        """
+        env_context = await self.env_context(env)
+        self.__csrf_token = env_context["csrf_token"]
+        self.headers["Csrf-Token"] = self.__csrf_token
+        self.__websocket = env_context["websocket"]
+        self.__env = env
+
+    async def env_context(self: Self, env: str, refresh: bool = False) -> dict:
+        """
+        returns the csrf token, websocket url and namespace of an env, fetched once and reused
+        for env_context_ttl seconds
+        :param env: environment name
+        :param refresh: if True the context is fetched even when it is cached
+        :return: dictionary with the env, namespace, csrf_token and websocket
+        """
+        cached = self._env_contexts.get(env)
+        if cached is not None and not refresh and cached[1] > time.monotonic():
+            return cached[0]
+        context = await self.fetch_env_context(env)
+        self._env_contexts[env] = (context, time.monotonic() + self.env_context_ttl)
+        return context
+
+    async def fetch_env_context(self: Self, env: str) -> dict:
+        """
+        fetches the index page of an env and collects its csrf token and websocket url
+        without changing the current session environment
+        :param env: environment name
+        :return: dictionary with the env, namespace, csrf_token and websocket
+        """
+        if env not in self.__envs:
+            raise InvalidEnvironmentError(f"{env} id not a valid env choose from: {self.__envs}")
+        name_space = self.__envs.get(env)
+        r = await self.get(build_env_url(name_space))
+        env_data = await r.text()
+        if r.status != 200:
+            logger.debug(env_data)
+            raise EnvironmentError(f"Unsuccessful Response code changing to {env}")
+        return {
+            "env": env,
+            "namespace": name_space,
+            "csrf_token": utils.get_here_ota_token2(env_data),
+            "websocket": utils.get_here_ota_websocket_addr(env_data),
+        }
+
+    async def find_envs_for_device_names(self: Self, device_names: list) -> dict:
+        """
+        searches every env for each of the device names concurrently. each env is queried with its own
+        csrf token passed per request so the session headers and current env are never changed.
+        found uuids are stored in the device cache
+        :param device_names: list of device names
+        :return: dictionary of device name to a list of the envs the device was found in
+        """
+        env_contexts = await asyncio.gather(*(self.env_context(env) for env in self.__envs))
+        keys = [(device_name, env_context) for device_name in device_names for env_context in env_contexts]
+        responses = await asyncio.gather(*(
+            self.get(
+                here_ota_search_device_by_device_name + device_name + "&limit=24&offset=0",
+                headers={"Csrf-Token": env_context["csrf_token"]},
+            )
+            for device_name, env_context in keys
+        ))
+        results = {device_name: [] for device_name in device_names}
+        for (device_name, env_context), r in zip(keys, responses):
+            # the search matches substrings, only a device named exactly device_name counts
+            device = exact_match(device_name, (await r.json(content_type=None))['values'])
+            if device is not None:
+                results[device_name].append(env_context["env"])
+                self.device_cache.set(env_context["env"], device_name, device['uuid'])
+        return results
+
+    async def find_and_switch_to_env_for_device_name(self: Self, device_name: str) -> str:
+        """
+        locates the env for a provided device_name, searching all envs concurrently,
+        and changes the session to that env
+        :param device_name: string representation of device_name
+        :return: env name
+        """
+        results = (await self.find_envs_for_device_names([device_name]))[device_name]
+        if len(results) > 1:
+            raise EnvironmentError(f"device: {device_name} exists in multiple envs {results}")
+        elif len(results) == 1:
+            await self.change_env(results[0])
+            return results[0]
+        raise DeviceNotFoundError(f"device_name not found in any of: {self.__envs} by device_name")
+
+    async def get_device_info(self: Self, device_name: str, env: str = None) -> dict:
+        """
+        returns details on a device from the search device by device_name endpoint
+        :param device_name: device_name as a string
+        :param env: if provided the request is made in this env without changing the current env
+        :return: dictionary containing the device data
+        """
+        async with self.use_env(env):
+            r = await self.get(here_ota_search_device_by_device_name + device_name + "&limit=24&offset=0")
+            return await r.json(content_type=None)
+
+    async def get_device_uuid(self: Self, device_name: str, use_cache: bool = True, env: str = None) -> str:
+        """
+        hits the device query endpoint to retrieve the device uuid, the search is skipped
+        when the uuid is already in the device cache for the current env. only the device named
+        exactly device_name is returned and cached, devices merely containing the name are not
+        :param device_name: device_name as a string
+        :param use_cache: if False the cache is bypassed and refreshed
+        :param env: if provided the request is made in this env without changing the current env
+        :return: string uuid for vehicle
+        """
+        async with self.use_env(env):
+            current_env = self.current_env
+            if use_cache:
+                uuid = self.device_cache.get(current_env, device_name)
+                if uuid is not None:
+                    return uuid
+            response = await self.get_device_info(device_name)
+            device = exact_match(device_name, response['values'])
+            offset = len(response['values'])
+            # the device named exactly device_name may be past the first page of the search
+            while device is None and 0 < offset < response.get('total', 0):
+                r = await self.get(build_here_ota_devices_url(device_name, limit=100, offset=offset))
+                values = (await r.json(content_type=None))['values']
+                device = exact_match(device_name, values)
+                offset = offset + len(values) if values else 0
+            if device is None:
+                self.device_cache.invalidate(current_env, device_name)
+                raise DeviceNotFoundError(f"No uuid found, device_name might not exist in environment: {current_env}")
+            self.device_cache.set(current_env, device_name, device['uuid'])
+            return device['uuid']
+
+    async def _request_device_resource(self: Self, device_name: str, method: str, build_url) -> aiohttp.ClientResponse:
+        """
+        resolves the device uuid and requests the url built from it. a 404 means the cached
+        mapping is stale so the entry is dropped and the request retried with a fresh uuid
+        :param device_name: device_name as a string
+        :param method: http method as a string
+        :param build_url: function taking the device uuid and returning the url
+        :return: aiohttp ClientResponse
+        """
+        uuid = await self.get_device_uuid(device_name)
+        r = await self.request(method, build_url(uuid))
+        if r.status == 404:
+            self.device_cache.invalidate(self.current_env, device_name)
+            fresh_uuid = await self.get_device_uuid(device_name, use_cache=False)
+            if fresh_uuid != uuid:
+                r = await self.request(method, build_url(fresh_uuid))
+        return r
+
+    async def get_device_history(self: Self, device_name: str, limit: int = 10, env: str = None) -> dict:
+        """
+        returns the device history for a specified device_name
+        :param device_name: device_name as a string
+        :param limit: amount of campaign to return default 10
+        :param env: if provided the request is made in this env without changing the current env
+        :return: dictionary of history data
+        """
+        async with self.use_env(env):
+            r = await self._request_device_resource(
+                device_name, "GET", lambda uuid: build_here_ota_device_history_url(uuid, limit)
+            )
+        return await r.json(content_type=None)
+
+    async def get_device_assignments(self: Self, device_name: str, env: str = None) -> list:
+        """
+        retrieves the current assignments or pending assignments for the specified device_name
+        :param device_name: the device_name as a string
+        :param env: if provided the request is made in this env without changing the current env
+        :return: list of assignments
+        """
+        async with self.use_env(env):
+            r = await self._request_device_resource(device_name, "GET", lambda uuid: here_ota_assignments + uuid)
+        return await r.json(content_type=None)
+
+    async def create_static_group(self: Self, name: str) -> dict:
+        """
+        This method creates a static group by name in the current env
+        :param name: string of the name for the new group
+        :return: dictionary result
+        """
+        r = await self.post(
+            here_ota_create_group_endpoint,
+            json={"expression": None, "groupType": "static", "name": name},
+        )
+        r.raise_for_status()
+        return await r.json(content_type=None)
+
+    async def get_groups(self: Self, limit: int = 1000, offset=0) -> dict:
+        """
+        this method gets the first 1000 groups in the current env
+        :param limit: integer of how many records to return default 1000
+        :return: python dictionary of results
+        """
+        r = await self.get(build_get_here_ota_groups_url(limit=limit, offset=offset))
+        if r.status != 200:
+            raise AuthenticationError("Unable to ping endpoint")
+        return await r.json(content_type=None)
+
+    async def find_group_by_name(self: Self, name: str, limit: int = 1000, offset=0, policy=index.UNIQUE) -> str:
+        """
+        finds the id of a group whose name contains name without prompting, a prompt would block the event loop
+        :param name: substring of the group name
+        :param limit: amount of groups searched
+        :param offset: offset of the first group searched
+        :param policy: "first", "unique" or a callable(name, matches) returning the chosen group
+        :return: group id
+        """
+        data = (await self.get_groups(limit=limit, offset=offset))['values']
+        matches = [group_data for group_data in data if name in group_data["groupName"].strip()]
+        if not matches:
+            raise GroupNotFoundError(f"No group containing {name} found in first {limit} groups")
+        return index.resolve_match(name, matches, policy)["id"]
+
+    async def find_group_id_by_name(self: Self, name: str, limit: int = 1000, offset=0, policy=index.UNIQUE) -> str:
+        """
+        finds the id of the group named name without prompting, a prompt would block the event loop
+        :param name: group name
+        :param limit: amount of groups searched
+        :param offset: offset of the first group searched
+        :param policy: "first", "unique" or a callable(name, matches) returning the chosen group
+        :return: group id
+        """
+        data = (await self.get_groups(limit=limit, offset=offset))['values']
+        matches = [group_data for group_data in data if name == group_data["groupName"].strip()]
+        if not matches:
+            raise GroupNotFoundError(f"No group named {name} found in first {limit} groups")
+        return index.resolve_match(name, matches, policy)["id"]
+
+    async def find_here_ota_campaign_id_by_name(self: Self, name: str, policy=index.UNIQUE) -> str:
+        """
+        finds the uuid of the update named name without prompting, a prompt would block the event loop
+        :param name: update name
+        :param policy: "first", "unique" or a callable(name, matches) returning the chosen update
+        :return: update uuid
+        """
+        r = await self.get(build_get_here_ota_campaign_data_url(name))
+        data = await r.json(content_type=None)
+        matches = [update for update in data['values'] if update["name"] == name]
+        if not matches:
+            raise ValueError(f"No update found with name: {name}")
+        return index.resolve_match(name, matches, policy)["uuid"]
+
+    async def add_device_to_group_by_uuid(self: Self, group_uuid: str, device_uuid: str) -> aiohttp.ClientResponse:
+        return await self.post(build_here_ota_add_device_to_group_endpoint(group_uuid, device_uuid))
+
+    async def add_device_to_group(self: Self, group: str, device_name: str) -> aiohttp.ClientResponse:
+        group_id = await self.find_group_by_name(group)
+        return await self._request_device_resource(
+            device_name, "POST", lambda uuid: build_here_ota_add_device_to_group_endpoint(group_id, uuid)
+        )
+
+    def _campaign_headers(self: Self) -> dict:
+        """the campaign endpoints expect the Host and Origin of the api, sent per request"""
+        origin = self.base_url.rstrip("/")
+        return {"Host": urlsplit(origin).netloc, "Origin": origin}
+
+    async def create_campaign(self: Self, name: str, update_id: str, group_ids: list,
+                              approval_needed: bool = False) -> str:
+        """
+        creates a campaign of an update on groups without launching it
+        :param name: campaign name
+        :param update_id: update uuid
+        :param group_ids: list of group ids
+        :param approval_needed: if True devices ask for approval before installing
+        :return: campaign id
+        """
+        r = await self.post(
+            here_ota_campaigns[:-1],  # post needs to be done on endpoint without slash
+            json={"name": name, "update": update_id, "groups": list(group_ids), "approvalNeeded": approval_needed},
+            headers=self._campaign_headers(),
+        )
+        r.raise_for_status()
+        return await r.json(content_type=None)
+
+    async def launch_campaign(self: Self, campaign_id: str) -> aiohttp.ClientResponse:
+        return await self.post(f"{here_ota_campaigns}{campaign_id}/launch", headers=self._campaign_headers())
+
+    async def launch_campaign_on_group_by_name(self: Self, name: str, group_name: str, campaign_name: str) -> aiohttp.ClientResponse:
+        group_uuid = await self.find_group_by_name(group_name)
+        update_id = await self.find_here_ota_campaign_id_by_name(campaign_name)
+        assert update_id is not None
+        return await self.launch_campaign(await self.create_campaign(name, update_id, [group_uuid]))
+
+    async def get_campaign_info(self: Self, correlation_id: str) -> aiohttp.ClientResponse:
+        return await self.get(here_ota_campaigns + correlation_id)
+
+    async def get_device_names_in_group(self: Self, group_name: str) -> list:
+        group_id = await self.find_group_by_name(group_name)
+        return [device["deviceName"] async for device in self.iter_group_devices(group_id)]
+
+    async def get_devices_in_group_by_id(self: Self, group_id: str, limit: int = 100, offset: int = 0) -> dict:
+        r = await self.get(build_here_ota_devices_in_group_url(group_id, limit=limit, offset=offset))
+        return await r.json(content_type=None)
+
+    def iter_groups(self: Self, page_size: int = 100):
+        """
+        lazily pages through every group in the current env, prefetching the next page
+        :param page_size: amount of groups requested per page
+        :return: async generator of group dictionaries
+        """
+        return aiter_pages(lambda limit, offset: self.get_groups(limit=limit, offset=offset), page_size)
+
+    def iter_group_devices(self: Self, group_id: str, page_size: int = 100):
+        """
+        lazily pages through every device in a group, prefetching the next page
+        :param group_id: group id as a string
+        :param page_size: amount of devices requested per page
+        :return: async generator of device dictionaries
+        """
+        return aiter_pages(
+            lambda limit, offset: self.get_devices_in_group_by_id(group_id, limit=limit, offset=offset), page_size
+        )
+
+    def iter_updates(self: Self, name: str = "", page_size: int = 100):
+        """
+        lazily pages through the updates sorted by createdAt, prefetching the next page
+        :param name: optional name filter, updates containing this string are returned
+        :param page_size: amount of updates requested per page
+        :return: async generator of update dictionaries
+        """
+        async def fetch_page(limit, offset):
+            r = await self.get(build_get_here_ota_campaign_data_url(name, limit=limit, offset=offset))
+            return await r.json(content_type=None)
+        return aiter_pages(fetch_page, page_size)
+
+    async def get_device_events(self: Self, device_name: str, env: str = None) -> dict:
+        async with self.use_env(env):
+            r = await self._request_device_resource(device_name, "GET", build_here_ota_events_url)
+        return await r.json(content_type=None)
+
+    async def get_device_info_by_uuid(self: Self, uuid: str) -> aiohttp.ClientResponse:
+        return await self.get(here_ota_search_device_by_uuid + uuid)
+
+    async def get_device_network(self: Self, device_name: str, env: str = None) -> dict:
+        async with self.use_env(env):
+            r = await self._request_device_resource(device_name, "GET", build_here_ota_device_network_endpoint)
+        return await r.json(content_type=None)
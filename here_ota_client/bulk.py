@@ -0,0 +1,55 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextvars import copy_context
+from dataclasses import dataclass, field
+from typing import Self
+
+
+@dataclass
+class ItemResult:
+    """outcome of one item of a bulk operation"""
+    item: str
+    ok: bool
+    status_code: int = None
+    error: str = None
+
+
+@dataclass
+class BulkReport:
+    """per item results of a bulk operation keyed by item"""
+    results: dict = field(default_factory=dict)
+
+    @property
+    def succeeded(self: Self) -> list:
+        return [result.item for result in self.results.values() if result.ok]
+
+    @property
+    def failed(self: Self) -> list:
+        return [result.item for result in self.results.values() if not result.ok]
+
+    def __len__(self: Self) -> int:
+        return len(self.results)
+
+
+def run_bulk(items, func, max_workers: int = 8) -> BulkReport:
+    """
+    calls func for every item on a thread pool. func returns a Response, a non 2xx status
+    or a raised exception is recorded as a failure for that item instead of stopping the batch.
+    func runs in a copy of the caller's context so an env scoped with use_env still applies
+    :param items: iterable of item keys such as device names
+    :param func: function taking one item and returning a requests Response
+    :param max_workers: maximum amount of concurrent calls
+    :return: BulkReport
+    """
+    report = BulkReport()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(copy_context().run, func, item): item for item in items}
+        for future in as_completed(futures):
+            item = futures[future]
+            try:
+                r = future.result()
+            except Exception as e:
+                report.results[item] = ItemResult(item, False, error=f"{type(e).__name__}: {e}")
+                continue
+            error = None if r.ok else r.text[:200]
+            report.results[item] = ItemResult(item, r.ok, status_code=r.status_code, error=error)
+    return report
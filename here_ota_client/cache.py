@@ -0,0 +1,103 @@
+import json
+import os
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Self
+
+
+class DeviceUuidCache:
+    """
+    LRU cache of device_name -> uuid mappings keyed by (env, device_name). entries expire after ttl seconds
+    and the least recently used entry is evicted once max_size is reached. if a path is provided the cache
+    is loaded from and saved to a json file so the mapping survives between runs
+    """
+
+    def __init__(self: Self, ttl: float = 24 * 60 * 60, max_size: int = 10000, path: str = None) -> None:
+        """
+        :param ttl: seconds an entry is valid for, None to never expire
+        :param max_size: maximum amount of entries kept, 0 disables the cache
+        :param path: optional json file used to persist the cache
+        """
+        self.ttl = ttl
+        self.max_size = max_size
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        if path is not None and os.path.exists(path):
+            self.load()
+
+    def __len__(self: Self) -> int:
+        return len(self._entries)
+
+    def get(self: Self, env: str, device_name: str) -> str or None:
+        """
+        returns the cached uuid or None if it is missing or expired
+        :param env: environment name the device lives in
+        :param device_name: device name as a string
+        :return: uuid string or None
+        """
+        key = (env, device_name)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            uuid, expires_at = entry
+            if expires_at is not None and expires_at < time.time():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return uuid
+
+    def set(self: Self, env: str, device_name: str, uuid: str) -> None:
+        if self.max_size <= 0:
+            return
+        expires_at = None if self.ttl is None else time.time() + self.ttl
+        key = (env, device_name)
+        with self._lock:
+            self._entries[key] = (uuid, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self: Self, env: str, device_name: str) -> None:
+        with self._lock:
+            self._entries.pop((env, device_name), None)
+
+    def clear(self: Self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def load(self: Self) -> None:
+        """
+        loads the non expired entries from the json file at self.path
+        :return: void
+        """
+        with open(self.path) as f:
+            data = json.load(f)
+        now = time.time()
+        with self._lock:
+            for env, device_name, uuid, expires_at in data:
+                if expires_at is None or expires_at > now:
+                    self._entries[(env, device_name)] = (uuid, expires_at)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def save(self: Self) -> None:
+        """
+        writes the cache to the json file at self.path, does nothing without a path
+        :return: void
+        """
+        if self.path is None:
+            return
+        with self._lock:
+            data = [[env, device_name, uuid, expires_at] for (env, device_name), (uuid, expires_at) in self._entries.items()]
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,158 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextvars import copy_context
+from dataclasses import dataclass, field
+from typing import Self
+from requests import HTTPError, RequestException
+from Logger import set_up_logger
+from . import index
+from .throttle import TokenBucket
+
+logger = set_up_logger(name="here-ota-campaigns")
+
+# kinds of targets
+GROUP = "group"
+DEVICES = "devices"
+
+
+@dataclass
+class TargetLaunch:
+    """outcome of the campaign of one target, a group name or a cohort of devices"""
+    kind: str
+    target: str
+    ok: bool
+    campaign_id: str = None
+    group_id: str = None
+    created_group: bool = False
+    missing: list = field(default_factory=list)
+    error: str = None
+
+
+@dataclass
+class LaunchManifest:
+    """campaigns launched for an update keyed by (kind, target), a group and a cohort may share a name"""
+    update_id: str
+    env: str
+    results: dict = field(default_factory=dict)
+
+    @property
+    def campaign_ids(self: Self) -> dict:
+        return {target: result.campaign_id for target, result in self.results.items() if result.ok}
+
+    @property
+    def failed(self: Self) -> dict:
+        return {target: result.error for target, result in self.results.items() if not result.ok}
+
+    def __len__(self: Self) -> int:
+        return len(self.results)
+
+
+class CampaignLauncher:
+    """
+    creates and launches one campaign of an update per target. a target is an existing group, resolved by exact
+    name from the local group index, or a cohort of device names put in a new static group first. every device
+    name is resolved in one batch before any group is created. targets run concurrently and the campaign
+    requests share a token bucket, a failing target is recorded in the manifest instead of stopping the others
+
+    launcher = CampaignLauncher(hotac)
+    manifest = launcher.launch("rollout-1", "<update_name>", groups=["<group_name>"],
+                               devices={"wave-1": ["<device_name>", ...]})
+    manifest.campaign_ids
+    manifest.failed
+    """
+
+    def __init__(self: Self, client, max_workers: int = 8, rate: float = 5, burst: int = None,
+                 approval_needed: bool = False) -> None:
+        """
+        :param client: HereOtaClient
+        :param max_workers: maximum amount of targets launched concurrently
+        :param rate: campaign requests per second
+        :param burst: campaign requests sent at once before the rate applies, rate by default
+        :param approval_needed: passed on to every campaign
+        """
+        self.client = client
+        self.max_workers = max_workers
+        self.bucket = TokenBucket(rate, burst)
+        self.approval_needed = approval_needed
+
+    def launch(self: Self, name: str, update: str = None, groups=(), devices=(), update_id: str = None) -> LaunchManifest:
+        """
+        :param name: campaign name, each campaign is named <name>-<target>
+        :param update: update name, ignored when update_id is provided
+        :param groups: iterable of group names
+        :param devices: list of device names each launched on its own, or dictionary of cohort name to device names
+        :param update_id: optional update uuid to skip the update lookup
+        :return: LaunchManifest
+        """
+        if update_id is None:
+            update_id = self.client.resolve_update(update)["uuid"]
+        cohorts = devices if isinstance(devices, dict) else {device_name: [device_name] for device_name in devices}
+        manifest = LaunchManifest(update_id, self.client.current_env)
+        group_index = self.client.group_index() if groups else None
+        known = {}
+        device_names = [device_name for members in cohorts.values() for device_name in members]
+        if device_names:
+            known = self.client.resolve_devices(device_names)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {}
+            for group_name in groups:
+                futures[executor.submit(copy_context().run, self._launch_group, name, update_id, group_index,
+                                        group_name)] = (GROUP, group_name)
+            for cohort, members in cohorts.items():
+                futures[executor.submit(copy_context().run, self._launch_cohort, name, update_id, cohort,
+                                        members, known)] = (DEVICES, cohort)
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    manifest.results[key] = future.result()
+                except Exception as e:
+                    manifest.results[key] = TargetLaunch(*key, False, error=f"{type(e).__name__}: {e}")
+        logger.info("Launched %s campaigns of %s, %s failed", len(manifest.campaign_ids), update_id,
+                    len(manifest.failed))
+        return manifest
+
+    def _launch_group(self: Self, name: str, update_id: str, group_index: index.NameIndex,
+                      group_name: str) -> TargetLaunch:
+        group = group_index.resolve(group_name, index.EXACT, index.UNIQUE)
+        if group is None:
+            return TargetLaunch(GROUP, group_name, False, error=f"No group named {group_name}")
+        result = TargetLaunch(GROUP, group_name, False, group_id=group["id"])
+        return self._launch(f"{name}-{group_name}", update_id, result)
+
+    def _launch_cohort(self: Self, name: str, update_id: str, cohort: str, device_names: list,
+                       known: dict) -> TargetLaunch:
+        members = [device_name for device_name in device_names if known.get(device_name) is not None]
+        result = TargetLaunch(DEVICES, cohort, False, missing=[device_name for device_name in device_names
+                                                               if known.get(device_name) is None])
+        if not members:
+            result.error = "None of the devices exist"
+            return result
+        try:
+            result.group_id = self.client.create_static_group(f"{name}-{cohort}")
+        except HTTPError as e:
+            result.error = f"Unable to create the group {name}-{cohort}: {e}"
+            return result
+        result.created_group = True
+        report = self.client.add_devices_to_group(None, members, group_id=result.group_id, max_workers=4)
+        if report.failed:
+            result.error = f"Unable to add {len(report.failed)} devices to the group: {report.failed[:10]}"
+            return result
+        return self._launch(f"{name}-{cohort}", update_id, result)
+
+    def _launch(self: Self, campaign_name: str, update_id: str, result: TargetLaunch) -> TargetLaunch:
+        # errors are recorded on the result so the manifest keeps the group created for a cohort
+        try:
+            self.bucket.acquire()
+            result.campaign_id = self.client.create_campaign(campaign_name, update_id, [result.group_id],
+                                                             approval_needed=self.approval_needed)
+            self.bucket.acquire()
+            r = self.client.launch_campaign(result.campaign_id)
+        except RequestException as e:
+            result.ok = False
+            result.error = f"{type(e).__name__}: {e}"
+            return result
+        if not r.ok:
+            result.error = f"Launch returned {r.status_code}: {r.text[:200]}"
+            return result
+        result.ok = True
+        return result
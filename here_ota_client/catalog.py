@@ -0,0 +1,244 @@
+import codecs
+import json
+import re
+import sys
+from dataclasses import dataclass
+from typing import Self
+
+chunk_size = 2 ** 16
+version_part_pattern = re.compile(r"\d+|[^\d.+\-_]+")
+decoder = json.JSONDecoder()
+
+
+@dataclass(frozen=True, slots=True)
+class SoftwareTarget:
+    filename: str
+    name: str
+    version: str
+    hardware_ids: tuple
+    length: int
+    sha256: str
+    target_format: str
+    created_at: str
+
+
+def version_key(version: str) -> tuple:
+    """
+    sort key comparing versions part by part, numeric parts as numbers so 1.10.0 is newer than 1.9.0
+    :param version: version string
+    :return: tuple
+    """
+    return tuple((0, int(part), "") if part.isdigit() else (1, 0, part)
+                 for part in version_part_pattern.findall(version or ""))
+
+
+def _target_from_data(filename: str, data: dict) -> SoftwareTarget:
+    custom = data.get("custom") or {}
+    intern = sys.intern
+    return SoftwareTarget(
+        filename=filename,
+        name=intern(custom.get("name") or filename),
+        version=custom.get("version") or "",
+        hardware_ids=tuple(intern(hardware_id) for hardware_id in custom.get("hardwareIds") or ()),
+        length=data.get("length", 0),
+        sha256=(data.get("hashes") or {}).get("sha256"),
+        target_format=intern(custom.get("targetFormat") or ""),
+        created_at=custom.get("createdAt"),
+    )
+
+
+class _StreamReader:
+    """pulls json tokens and values out of an iterable of byte chunks, only the unparsed tail is kept in memory"""
+
+    def __init__(self: Self, chunks) -> None:
+        self._chunks = iter(chunks)
+        self._decode = codecs.getincrementaldecoder("utf-8")().decode
+        self.buffer = ""
+        self.pos = 0
+        self.exhausted = False
+
+    def _fill(self: Self) -> bool:
+        for chunk in self._chunks:
+            text = self._decode(chunk) if isinstance(chunk, bytes) else chunk
+            if text:
+                self.buffer = self.buffer[self.pos:] + text
+                self.pos = 0
+                return True
+        self.exhausted = True
+        return False
+
+    def _skip_whitespace(self: Self) -> None:
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buffer) or not self._fill():
+                return
+
+    def peek(self: Self) -> str:
+        self._skip_whitespace()
+        if self.pos >= len(self.buffer):
+            raise ValueError("Unexpected end of json document")
+        return self.buffer[self.pos]
+
+    def expect(self: Self, chars: str) -> str:
+        char = self.peek()
+        if char not in chars:
+            raise ValueError(f"Expected one of {chars!r} at {char!r}")
+        self.pos += 1
+        return char
+
+    def value(self: Self):
+        """
+        decodes the next value, more chunks are read while the value is incomplete or ends the buffer
+        :return: the decoded value
+        """
+        self._skip_whitespace()
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # a number at the end of the buffer may continue in the next chunk
+            if end == len(self.buffer) and not self.exhausted and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def members(self: Self):
+        """
+        iterates the keys of the object starting at the current position, the caller consumes each value
+        :return: generator of keys
+        """
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(":")
+            yield key
+            if self.expect(",}") == "}":
+                return
+
+
+def iter_targets(chunks):
+    """
+    iterates the targets of a targets.json document without loading the document,
+    every other member of the document is skipped
+    :param chunks: iterable of bytes or str chunks of the document
+    :return: generator of (filename, target dictionary)
+    """
+    reader = _StreamReader(chunks)
+    for key in reader.members():
+        if key != "signed":
+            reader.value()
+            continue
+        for signed_key in reader.members():
+            if signed_key != "targets":
+                reader.value()
+                continue
+            for filename in reader.members():
+                yield filename, reader.value()
+
+
+class SoftwareCatalog:
+    """
+    compact index of the software targets of targets.json. the document is parsed incrementally so only one target
+    is decoded at a time, each target is kept as a slotted SoftwareTarget with interned names and hardware ids.
+    lookups by filename, by name and version and the latest version per hardware id or name are dictionary lookups
+
+    catalog = hotac.software_catalog()
+    catalog.latest("hw-01")
+    catalog.latest("hw-01", name="software-a")
+    catalog.versions("software-a")
+    """
+
+    def __init__(self: Self, targets=()) -> None:
+        """
+        :param targets: iterable of SoftwareTarget
+        """
+        self._by_filename = {}
+        self._by_name = {}
+        self._by_hardware = {}
+        self._latest = {}
+        for target in targets:
+            self.add(target)
+
+    @classmethod
+    def from_chunks(cls, chunks) -> Self:
+        """
+        :param chunks: iterable of bytes or str chunks of a targets.json document
+        :return: SoftwareCatalog
+        """
+        return cls(_target_from_data(filename, data) for filename, data in iter_targets(chunks))
+
+    @classmethod
+    def from_file(cls, path: str) -> Self:
+        with open(path, "rb") as f:
+            return cls.from_chunks(iter(lambda: f.read(chunk_size), b""))
+
+    @classmethod
+    def from_response(cls, r) -> Self:
+        """
+        :param r: requests Response of targets.json, preferably requested with stream=True
+        :return: SoftwareCatalog
+        """
+        r.raise_for_status()
+        return cls.from_chunks(r.iter_content(chunk_size))
+
+    def add(self: Self, target: SoftwareTarget) -> None:
+        self._by_filename[target.filename] = target
+        self._by_name.setdefault(target.name, {})[target.version] = target
+        key = version_key(target.version)
+        for latest_key in [(None, target.name)] + [(hardware_id, None) for hardware_id in target.hardware_ids] \
+                + [(hardware_id, target.name) for hardware_id in target.hardware_ids]:
+            current = self._latest.get(latest_key)
+            if current is None or key >= version_key(current.version):
+                self._latest[latest_key] = target
+        for hardware_id in target.hardware_ids:
+            self._by_hardware.setdefault(hardware_id, []).append(target)
+
+    def __len__(self: Self) -> int:
+        return len(self._by_filename)
+
+    def __iter__(self: Self):
+        return iter(self._by_filename.values())
+
+    def __contains__(self: Self, filename: str) -> bool:
+        return filename in self._by_filename
+
+    def get(self: Self, filename: str) -> SoftwareTarget or None:
+        return self._by_filename.get(filename)
+
+    def find(self: Self, name: str, version: str) -> SoftwareTarget or None:
+        return self._by_name.get(name, {}).get(version)
+
+    def versions(self: Self, name: str) -> list:
+        """
+        :param name: target name
+        :return: the versions of the target from oldest to newest
+        """
+        return sorted(self._by_name.get(name, {}), key=version_key)
+
+    def for_hardware(self: Self, hardware_id: str) -> list:
+        return list(self._by_hardware.get(hardware_id, ()))
+
+    @property
+    def names(self: Self) -> list:
+        return list(self._by_name)
+
+    @property
+    def hardware_ids(self: Self) -> list:
+        return list(self._by_hardware)
+
+    def latest(self: Self, hardware_id: str = None, name: str = None) -> SoftwareTarget or None:
+        """
+        :param hardware_id: optional hardware id the target has to support
+        :param name: optional target name
+        :return: the newest version matching, None if there is none
+        """
+        if hardware_id is None and name is None:
+            raise ValueError("latest needs a hardware_id or a name")
+        return self._latest.get((hardware_id, name))
@@ -1,13 +1,42 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import RLock, get_ident
 from requests import Session, Response
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError, Timeout
+from urllib.parse import urlsplit
 from typing import Self
 from Logger import set_up_logger
 from . import utils
 from .api_errors import AuthenticationError, DeviceNotFoundError, InvalidEnvironmentError, GroupNotFoundError
+from . import index
+from .bulk import BulkReport, ItemResult, run_bulk
+from .cache import DeviceUuidCache
+from .campaigns import CampaignLauncher, LaunchManifest
+from .catalog import SoftwareCatalog
+from .events import EventStream
+from .export import FleetExporter
+from .history_store import HistoryStore, HistorySync
+from .http_cache import HttpCache
+from .metrics import RequestMetrics
+from .models import Assignment, Device, Group, HistoryEntry, ModelTable, Update
+from .monitor import CampaignMonitor
+from .pagination import iter_pages
+from .resolve import DeviceResolver, SingleFlight, exact_match
+from .session_store import SessionStore, dump_cookies, load_cookies
+from .throttle import RequestPolicy
 
 logger = set_up_logger(name="here-ota-client")
 
+# env each client is scoped to by use_env in the current thread or task, keyed by id of the client
+scoped_envs = ContextVar("here_ota_scoped_envs", default=None)
+
 # sign in
 here_ota_url = "https://connect.ota.here.com/"
+here_account_url = "https://account.here.com/"
 here_ota_code_endpoint = "https://account.here.com/api/account/sign-in-with-password"
 
 here_ota_search_device_by_device_name = "https://connect.ota.here.com/api/v1/devices?nameContains="
@@ -39,12 +68,27 @@ here_ota_create_group_endpoint = "https://connect.ota.here.com/api/v1/device_gro
 # https://connect.ota.here.com/user/organizations
 
 
+def rebase_url(url: str, base_url: str = here_ota_url, account_url: str = here_account_url) -> str:
+    """
+    points a here ota or here account url at another host, such as a local stand-in server
+    :param url: url built for connect.ota.here.com or account.here.com
+    :param base_url: url replacing https://connect.ota.here.com/
+    :param account_url: url replacing https://account.here.com/
+    :return: url string
+    """
+    if url.startswith(here_ota_url):
+        return base_url + url[len(here_ota_url):]
+    if url.startswith(here_account_url):
+        return account_url + url[len(here_account_url):]
+    return url
+
+
 def build_env_url(name_space):
     return f"https://connect.ota.here.com/organizations/{name_space}/index"
 
 
-def build_get_here_ota_campaign_data_url(name: str, limit: int = 1000):
-    return f"https://connect.ota.here.com/api/v2/updates?nameContains={name}&limit={limit}&offset=0&sortBy=createdAt"
+def build_get_here_ota_campaign_data_url(name: str, limit: int = 1000, offset: int = 0):
+    return f"https://connect.ota.here.com/api/v2/updates?nameContains={name}&limit={limit}&offset={offset}&sortBy=createdAt"
 
 
 def build_here_ota_authorize_url(client_id, state) -> str:
@@ -55,14 +99,48 @@ def build_here_ota_add_device_to_group_endpoint(group_uuid: str, device_uuid: st
     return f"https://connect.ota.here.com/api/v1/device_groups/{group_uuid}/devices/{device_uuid}"
 
 
-def build_get_here_ota_groups_url(limit: int = 10, offset: int = 0) -> str:
+def build_get_here_ota_groups_url(limit: int = 10, offset: int = 0, sort_by: str = None) -> str:
     """
     collects id, groupName, namespace, createdAt, groupType, and expression
     :param limit: the amount of groups to be returned as an integer default 10
     :param offset: offset arg for pagination as an int default 0
+    :param sort_by: optional sort field such as createdAt (newest first)
     :return: url string
     """
-    return f"https://connect.ota.here.com/api/v1/device_groups?limit={limit}&offset={offset}"
+    url = f"https://connect.ota.here.com/api/v1/device_groups?limit={limit}&offset={offset}"
+    if sort_by is not None:
+        url += f"&sortBy={sort_by}"
+    return url
+
+
+def build_here_ota_campaign_stats_url(campaign_id: str) -> str:
+    """
+    :param campaign_id: campaign id as a string
+    :return: url of the campaign progress stats
+    """
+    return f"https://connect.ota.here.com/api/v2/campaigns/{campaign_id}/stats"
+
+
+def build_here_ota_devices_url(name_contains: str = "", limit: int = 100, offset: int = 0) -> str:
+    """
+    builds the device search url
+    :param name_contains: devices whose name contains this string are returned, all devices when empty
+    :param limit: the amount of devices to be returned as an integer default 100
+    :param offset: offset arg for pagination as an int default 0
+    :return: url string
+    """
+    return f"https://connect.ota.here.com/api/v1/devices?nameContains={name_contains}&limit={limit}&offset={offset}"
+
+
+def build_here_ota_devices_in_group_url(group_id: str, limit: int = 100, offset: int = 0) -> str:
+    """
+    builds the device search url filtered to the devices of a group
+    :param group_id: group id as a string
+    :param limit: the amount of devices to be returned as an integer default 100
+    :param offset: offset arg for pagination as an int default 0
+    :return: url string
+    """
+    return f"https://connect.ota.here.com/api/v1/devices?nameContains=&limit={limit}&offset={offset}&groupId={group_id}"
 
 
 def build_here_ota_events_url(uuid: str) -> str:
@@ -74,14 +152,15 @@ def build_here_ota_events_url(uuid: str) -> str:
     return f"https://connect.ota.here.com/api/v1/devices/{uuid}/events?eventTypes=EcuDownloadStarted,EcuDownloadCompleted,EcuInstallationStarted,EcuInstallationCompleted"
 
 
-def build_here_ota_device_history_url(uuid: str, limit: int = 10) -> str:
+def build_here_ota_device_history_url(uuid: str, limit: int = 10, offset: int = 0) -> str:
     """
-    uses the uuid and limit to create url for installation history
+    uses the uuid, limit and offset to create url for installation history, entries are sorted newest first
     :param uuid: uuid as a string
     :param limit: integer of the amount of results to return
+    :param offset: integer of the amount of newer entries to skip
     :return: string
     """
-    return f"https://connect.ota.here.com/api/v1/devices/{uuid}/installation_history?limit={limit}&offset=0"
+    return f"https://connect.ota.here.com/api/v1/devices/{uuid}/installation_history?limit={limit}&offset={offset}"
 
 
 def build_here_ota_device_network_endpoint(uuid: str) -> str:
@@ -107,18 +186,44 @@ class HereOtaClient(Session):
     __env = None
     __envs = None
 
-    def __init__(self: Self, username: str, password: str) -> Self:
+    def __init__(self: Self, username: str, password: str, device_cache: DeviceUuidCache = None,
+                 session_store: SessionStore = None, lazy: bool = False, request_policy: RequestPolicy = None,
+                 base_url: str = here_ota_url, account_url: str = here_account_url,
+                 metrics: RequestMetrics = None, http_cache: HttpCache = None,
+                 env_context_ttl: float = 900) -> Self:
         """
         calls requests Session object init method, and API client init to add a logger
+        :param device_cache: optional DeviceUuidCache shared between clients, by default an in memory cache is used
+        :param session_store: optional SessionStore, a stored session for username is reused instead of authenticating
+        and the session is saved after every authentication
+        :param lazy: if True authentication is delayed until the first request
+        :param request_policy: optional RequestPolicy with the retries, rate limits and connection pool size
+        applied to every request, by default failed requests are retried without rate limits
+        :param base_url: url of the here ota api, change it to run against another host such as a local stand-in
+        :param account_url: url of the here account sign in api
+        :param metrics: optional RequestMetrics recording every request sent, see stats
+        :param http_cache: optional HttpCache for the software targets and updates catalogs, see cached_get
+        :param env_context_ttl: seconds the csrf token and websocket url of an env are reused before
+        its index page is fetched again, see env_context
         :return: self
         """
         super().__init__()
+        self.metrics = metrics
+        self.base_url = base_url.rstrip("/") + "/"
+        self.account_url = account_url.rstrip("/") + "/"
+        self.request_policy = request_policy if request_policy is not None else RequestPolicy()
+        adapter = HTTPAdapter(
+            pool_connections=self.request_policy.pool_connections, pool_maxsize=self.request_policy.pool_maxsize
+        )
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
         headers = {
             "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/108.0.0.0 Safari/537.36",
         }
         self.headers.update(headers)
         self.__csrf = None
         self.token = None
+        self.userId = None
         self.__authentication_data = None
         self.__env = None
 
@@ -126,16 +231,275 @@ class HereOtaClient(Session):
         self.envs = None
         self.__username = username
         self.__password = password
-        self.authenticate()
+        self.device_cache = device_cache if device_cache is not None else DeviceUuidCache()
+        self.http_cache = http_cache
+        self.env_context_ttl = env_context_ttl
+        self._env_contexts = {}
+        self._name_indexes = {}
+        self._single_flight = SingleFlight()
+        self.session_store = session_store
+        self._authenticated = False
+        # id of the thread signing in, other threads wait on the lock until the sign in is done
+        self._auth_lock = RLock()
+        self._auth_thread = None
+        self._auth_generation = 0
+        if not self._restore_session() and not lazy:
+            self.authenticate()
 
     @property
     def current_env(self):
-        return self.__env
+        self._ensure_authenticated()
+        return self._scoped_env() or self.__env
 
     @property
     def list_envs(self):
+        self._ensure_authenticated()
         return self.__envs
 
+    @property
+    def websocket_url(self):
+        self._ensure_authenticated()
+        env = self._scoped_env()
+        return self.env_context(env)["websocket"] if env else self.__websocket
+
+    @property
+    def _authenticating(self: Self) -> bool:
+        """True in the thread signing in"""
+        return self._auth_thread == get_ident()
+
+    def _ensure_authenticated(self: Self) -> None:
+        if self._authenticating:
+            return
+        if self._auth_thread is not None:
+            # another thread is signing in, wait for it instead of sending requests without a session
+            with self._auth_lock:
+                pass
+        if not self._authenticated:
+            with self._auth_lock:
+                if not self._authenticated:
+                    self.authenticate()
+
+    def _reauthenticate(self: Self, generation: int) -> None:
+        """
+        authenticates again after a 401 or 403 unless another thread already did since the request was sent,
+        concurrent callers wait for the sign in in flight and share it
+        :param generation: the authentication generation the rejected request was sent with
+        """
+        with self._auth_lock:
+            if self._auth_generation != generation:
+                return
+            logger.info("Session rejected, authenticating again")
+            env = self.__env
+            self.authenticate()
+            if env is not None and env != self.__env:
+                self.change_env(env)
+
+    def request(self: Self, method, url, *args, **kwargs) -> Response:
+        """
+        authenticates first when the client was created lazily, and authenticates again and
+        retries once when a request is rejected with 401 or 403 because the session expired.
+        urls of connect.ota.here.com and account.here.com are sent to base_url and account_url
+        :return: Response
+        """
+        url = rebase_url(url, self.base_url, self.account_url)
+        self._ensure_authenticated()
+        generation = self._auth_generation
+        r = self._send(method, url, *args, **self._scope_request(url, kwargs))
+        if r.status_code in (401, 403) and not self._authenticating:
+            headers = kwargs.get("headers") or {}
+            token_env = self._env_of_token(headers.get("Csrf-Token"))
+            r.close()
+            self._reauthenticate(generation)
+            if "Csrf-Token" in headers:
+                # a per request csrf token belongs to the expired session, it is replaced by the new token
+                # of the same env or dropped when its env is unknown
+                headers = {k: v for k, v in headers.items() if k != "Csrf-Token"}
+                if token_env is not None:
+                    context = self.env_context(token_env)
+                    if context["csrf_token"] == kwargs["headers"]["Csrf-Token"]:
+                        context = self.env_context(token_env, refresh=True)
+                    headers["Csrf-Token"] = context["csrf_token"]
+                kwargs["headers"] = headers
+            r = self._send(method, url, *args, **self._scope_request(url, kwargs))
+        return r
+
+    def _env_of_token(self: Self, csrf_token: str or None) -> str or None:
+        """
+        :param csrf_token: csrf token as a string
+        :return: the env whose cached context has the csrf token, None if there is none
+        """
+        if csrf_token is None:
+            return None
+        return next((env for env, (context, _) in list(self._env_contexts.items())
+                     if context["csrf_token"] == csrf_token), None)
+
+    def _scoped_env(self: Self) -> str or None:
+        envs = scoped_envs.get()
+        return envs.get(id(self)) if envs else None
+
+    def _scope_request(self: Self, url: str, kwargs: dict) -> dict:
+        """
+        adds the csrf token of the env scoped by use_env to api requests that do not set their own
+        :param url: rebased url
+        :param kwargs: request keyword arguments
+        :return: request keyword arguments
+        """
+        env = self._scoped_env()
+        if env is None or self._authenticating or not url.startswith(self.base_url + "api/"):
+            return kwargs
+        headers = kwargs.get("headers") or {}
+        if "Csrf-Token" in headers:
+            return kwargs
+        return {**kwargs, "headers": {**headers, "Csrf-Token": self.env_context(env)["csrf_token"]}}
+
+    def _send(self: Self, method, url, *args, **kwargs) -> Response:
+        """
+        sends a request applying the rate limit of its endpoint family and retrying
+        throttled or failed requests as configured in the request policy
+        :return: Response
+        """
+        bucket = self.request_policy.bucket(url)
+        retry = self.request_policy.retry
+        metrics = self.metrics
+        attempt = 0
+        while True:
+            if bucket is not None:
+                bucket.acquire()
+            start = time.perf_counter()
+            try:
+                r = super().request(method, url, *args, **kwargs)
+            except (ConnectionError, Timeout) as e:
+                if metrics is not None:
+                    metrics.record(method, url, None, time.perf_counter() - start)
+                if not retry.should_retry(method, None, attempt):
+                    raise
+                delay = retry.delay(attempt)
+                logger.warning("%s %s failed with %s, retrying in %.2fs", method, url, e, delay)
+            else:
+                if metrics is not None:
+                    # a streamed body is not read here, its size is taken from the headers
+                    size = int(r.headers.get("Content-Length", 0)) if kwargs.get("stream") else len(r.content)
+                    metrics.record(method, url, r.status_code, time.perf_counter() - start, size)
+                if not retry.should_retry(method, r.status_code, attempt):
+                    return r
+                delay = retry.delay(attempt, r.headers.get("Retry-After"))
+                logger.warning("%s %s returned %s, retrying in %.2fs", method, url, r.status_code, delay)
+                # a streamed response holds its connection until closed
+                r.close()
+            if metrics is not None:
+                metrics.record_retry(method, url)
+            time.sleep(delay)
+            attempt += 1
+
+    def _restore_session(self: Self) -> bool:
+        """
+        loads the stored session for the username if there is a session store
+        :return: True if a session was restored
+        """
+        if self.session_store is None:
+            return False
+        state = self.session_store.load(self.__username)
+        if state is None:
+            return False
+        load_cookies(self.cookies, state["cookies"])
+        self.headers["Csrf-Token"] = state["csrf_token"]
+        self.token = state["token"]
+        self.userId = state["userId"]
+        self.__envs = state["envs"]
+        self.__env = state["env"]
+        self.__websocket = state["websocket"]
+        expires_at = time.monotonic() + self.env_context_ttl
+        self._env_contexts = {env: (context, expires_at) for env, context in state.get("env_contexts", {}).items()}
+        self._authenticated = True
+        logger.info("Restored session, current env %s", self.__env)
+        return True
+
+    def _save_session(self: Self) -> None:
+        if self.session_store is None:
+            return
+        self.session_store.save({
+            "username": self.__username,
+            "cookies": dump_cookies(self.cookies),
+            "csrf_token": self.headers.get("Csrf-Token"),
+            "token": self.token,
+            "userId": self.userId,
+            "envs": self.__envs,
+            "env": self.__env,
+            "websocket": self.__websocket,
+            "env_contexts": {env: context for env, (context, _) in self._env_contexts.items()},
+        })
+
+    def event_stream(self: Self, **kwargs) -> EventStream:
+        """
+        builds an EventStream on the websocket of the current env authenticated with the session cookies,
+        it has to be started from inside a running asyncio loop
+        :param kwargs: passed on to EventStream
+        :return: EventStream
+        """
+        headers = {
+            "User-Agent": self.headers["User-Agent"],
+            "Cookie": "; ".join(f"{cookie.name}={cookie.value}" for cookie in self.cookies),
+        }
+        return EventStream(self.websocket_url, headers=headers, **kwargs)
+
+    def stats(self: Self) -> dict:
+        """
+        snapshot of the request metrics per endpoint template and of the device uuid and http caches,
+        endpoints is empty when the client was created without metrics
+        :return: dictionary
+        """
+        cache = {"device_uuid": {"hits": self.device_cache.hits, "misses": self.device_cache.misses}}
+        if self.http_cache is not None:
+            cache["http"] = {"hits": self.http_cache.hits + self.http_cache.revalidated,
+                             "misses": self.http_cache.misses}
+        return {"endpoints": self.metrics.stats() if self.metrics is not None else {}, "cache": cache}
+
+    def cached_get(self: Self, url: str) -> Response:
+        """
+        GET through the http cache for large catalogs that rarely change such as here_ota_software_versions
+        and the updates catalog. the cache is scoped to the namespace of the current env, a fresh entry costs
+        no request and a stale one a conditional request answered with 304 when it did not change.
+        the returned response reads its body from disk, use it in a with block or read its content
+        :param url: url as a string
+        :return: Response
+        """
+        if self.http_cache is None:
+            return self.get(url, stream=True)
+        cache = self.http_cache
+        scope = self.list_envs[self.current_env]
+        entry = cache.lookup(scope, url)
+        if entry is not None and cache.is_fresh(entry):
+            cache.hits += 1
+            return cache.response(entry)
+        r = self.get(url, headers=cache.validators(entry), stream=True)
+        if r.status_code == 304 and entry is not None:
+            r.close()
+            cache.revalidated += 1
+            cache.refresh(entry, r)
+            return cache.response(entry)
+        cache.misses += 1
+        if not cache.is_cacheable(r):
+            return r
+        with r:
+            entry = cache.store(scope, url, r)
+        return cache.response(entry)
+
+    def software_catalog(self: Self) -> SoftwareCatalog:
+        """
+        downloads targets.json of the current env through the http cache and parses it incrementally
+        into an indexed SoftwareCatalog
+        :return: SoftwareCatalog
+        """
+        with self.cached_get(here_ota_software_versions) as r:
+            return SoftwareCatalog.from_response(r)
+
+    def close(self: Self) -> None:
+        """
+        persists the device cache when it has a path then closes the session
+        :return: void
+        """
+        self.device_cache.save()
+        super().close()
 
     def authenticate(self) -> None:
         """
@@ -143,6 +507,23 @@ class HereOtaClient(Session):
         username and password. set a token for the current session
         :return: void
         """
+        with self._auth_lock:
+            self._auth_thread = get_ident()
+            try:
+                self.cookies.clear()
+                self.headers.pop("Csrf-Token", None)
+                self._sign_in()
+            finally:
+                self._auth_thread = None
+            self._authenticated = True
+            self._auth_generation += 1
+            self._save_session()
+
+    def _sign_in(self) -> None:
+        """
+        the requests of the sign in flow, see authenticate
+        :return: void
+        """
 
         # get request to here ota to get the csrf token
         r1 = self.get(
@@ -195,95 +576,251 @@ class HereOtaClient(Session):
         )
 
         # set token
-        logger.debug(authenticated.content.decode())
-        self.__csrf_token = utils.get_here_ota_token2(authenticated.content.decode())
+        content = authenticated.content.decode()
+        logger.debug("%s", content)
+        self.__csrf_token = utils.get_here_ota_token2(content)
         self.headers["Csrf-Token"] = self.__csrf_token
 
         # validate result codes for previous requests
         if authenticated.status_code == 200:
             logger.info("Authenticated")
             data = r2.json()
-            logger.debug(data['firstname'] + ", " + data['lastname'] + ", " + data["email"])
+            logger.debug("%s, %s, %s", data['firstname'], data['lastname'], data["email"])
         else:
-            logger.debug(str(authenticated.content.decode()))
+            logger.debug("%s", content)
             raise AuthenticationError(f"Unable to authenticate: {self.__username}")
 
         # save the websocket url to use to listen for ECU events such as ECUinstalltionstared, ECUDownloadStarted etc.
-        self.__websocket = utils.get_here_ota_websocket_addr(authenticated.content.decode())
+        self.__websocket = utils.get_here_ota_websocket_addr(content)
 
         # set available envs
         envs_data = self.get(here_ota_envs_endpoint).json()
         self.__envs = {i["name"]: i["namespace"] for i in envs_data}
         # set current / default env
         self.__env = self.get(here_ota_default_namespace).json()["name"]
-        logger.info(f"Current env {self.__env}")
+        self._env_contexts = {self.__env: (
+            {"env": self.__env, "namespace": self.__envs.get(self.__env), "csrf_token": self.__csrf_token,
+             "websocket": self.__websocket},
+            time.monotonic() + self.env_context_ttl,
+        )}
+        logger.info("Current env %s", self.__env)
         return
 
     def change_env(self: Self, env: str) -> None:
         """
-        changes the current session environment to the specified env
+        changes the current session environment to the specified env, no request is made
+        while the cached context of the env has not expired
         :param env: environment to change to
         :return: void
         """
 
-        if env not in self.__envs:  # if the env argument is not in our envs list raise an error
-            raise InvalidEnvironmentError(f"{env} id not a valid env choose from: {self.__envs}")
-        # perform a get to the
-        name_space = self.__envs.get(env)
-        env_url = build_env_url(name_space)
-        r = self.get(env_url)
+        env_context = self.env_context(env)
 
         # set token
-        new_env_data = r.content.decode()
-        self.__csrf = utils.get_here_ota_token2(new_env_data)
+        self.__csrf = env_context["csrf_token"]
         self.headers["Csrf-Token"] = self.__csrf
-        self.__websocket = utils.get_here_ota_websocket_addr(new_env_data)
+        self.__websocket = env_context["websocket"]
         self.__env = env
+        self._save_session()
+
+    def env_context(self: Self, env: str, refresh: bool = False) -> dict:
+        """
+        returns the csrf token, websocket url and namespace of an env, fetched once and reused
+        for env_context_ttl seconds. the contexts are dropped when the client authenticates again
+        :param env: environment name
+        :param refresh: if True the context is fetched even when it is cached
+        :return: dictionary with the env, namespace, csrf_token and websocket
+        """
+        cached = self._env_contexts.get(env)
+        if cached is not None and not refresh and cached[1] > time.monotonic():
+            return cached[0]
+        context = self.fetch_env_context(env)
+        self._env_contexts[env] = (context, time.monotonic() + self.env_context_ttl)
+        return context
+
+    @contextmanager
+    def use_env(self: Self, env: str or None):
+        """
+        scopes the requests made in the with block to env without changing the current env of the client,
+        other threads and tasks keep their own env so it can be used from concurrent code.
+        the scope follows the thread pools of this package, generators have to be consumed inside the block
+
+        with hotac.use_env("staging"):
+            hotac.get_device_history(device_name)
 
+        :param env: environment name, None leaves the env unchanged
+        :return: the env context
+        """
+        if env is None:
+            yield None
+            return
+        context = self.env_context(env)
+        token = scoped_envs.set({**(scoped_envs.get() or {}), id(self): env})
+        try:
+            yield context
+        finally:
+            scoped_envs.reset(token)
+
+    def fetch_env_context(self: Self, env: str) -> dict:
+        """
+        fetches the index page of an env and collects its csrf token and websocket url
+        without changing the current session environment
+        :param env: environment name
+        :return: dictionary with the env, namespace, csrf_token and websocket
+        """
+        self._ensure_authenticated()
+        if env not in self.__envs:  # if the env argument is not in our envs list raise an error
+            raise InvalidEnvironmentError(f"{env} id not a valid env choose from: {self.__envs}")
+        # perform a get to the env index page
+        name_space = self.__envs.get(env)
+        r = self.get(build_env_url(name_space))
         if r.status_code != 200:  # if we are not able to change to env successfully raise an error
-            logger.debug(r.content.decode())
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("%s", r.content.decode())
             raise EnvironmentError(f"Unsuccessful Response code changing to {env}")
+        env_data = r.content.decode()
+        return {
+            "env": env,
+            "namespace": name_space,
+            "csrf_token": utils.get_here_ota_token2(env_data),
+            "websocket": utils.get_here_ota_websocket_addr(env_data),
+        }
 
-    def get_device_info(self: Self, device_name: str, env: bool = False) -> dict:
+    def get_device_info(self: Self, device_name: str, env: str = None) -> dict:
         """
         returns details on a device from the search device by device_name endpoint
         :param device_name: device_name as a string
-        :param env: if provided env will be changed before request is made
+        :param env: if provided the request is made in this env without changing the current env
         :return: dictionary containing the device data
         """
-        if env: self.change_env(env)
-
         # get request to devices endpoint with specified device_name
-        r1 = self.get(
-            here_ota_search_device_by_device_name + device_name + "&limit=24&offset=0"
+        with self.use_env(env):
+            return self.search_devices(device_name)
+
+    def search_devices(self: Self, name_contains: str, limit: int = 24, offset: int = 0) -> dict:
+        """
+        searches the devices whose name contains name_contains. concurrent identical searches
+        share a single request
+        :param name_contains: substring of the device names
+        :param limit: amount of devices to return
+        :param offset: offset arg for pagination
+        :return: dictionary with the values and total
+        """
+        return self._single_flight.do(
+            (self.current_env, name_contains, limit, offset),
+            lambda: self.get(build_here_ota_devices_url(name_contains, limit=limit, offset=offset)).json(),
         )
-        return r1.json()
 
-    def get_device_uuid(self: Self, device_name: str) -> str:
+    def resolve_devices(self: Self, device_names: list, group_id: str = None, **kwargs) -> dict:
+        """
+        resolves many device names to their devices with as few searches as possible, names sharing a prefix
+        are listed together, see DeviceResolver. with a group_id the members of the group are listed once instead.
+        only exact name matches are returned and their uuids are stored in the device cache
+        :param device_names: list of device names
+        :param group_id: optional id of a group holding the devices
+        :param kwargs: passed on to DeviceResolver
+        :return: dictionary of device name to its device dictionary, None when there is no device with that name
+        """
+        if group_id is not None:
+            wanted = set(device_names)
+            results = dict.fromkeys(device_names)
+            for device in self.iter_group_devices(group_id):
+                if device.get("deviceName") in wanted:
+                    results[device["deviceName"]] = device
+        else:
+            results = DeviceResolver(self, **kwargs).resolve(device_names)
+        env = self.current_env
+        for device_name, device in results.items():
+            if device is not None:
+                self.device_cache.set(env, device_name, device["uuid"])
+        return results
+
+    def get_device_uuid(self: Self, device_name: str, use_cache: bool = True, env: str = None) -> str:
         """
-        hits the device query endpoint to retrieve the device uuid
+        hits the device query endpoint to retrieve the device uuid, the search is skipped
+        when the uuid is already in the device cache for the current env. only the device named
+        exactly device_name is returned and cached, devices merely containing the name are not
         :param device_name: device_name number as a string
-        :param env: if provided will change to this env before request
+        :param use_cache: if False the cache is bypassed and refreshed
+        :param env: if provided the request is made in this env without changing the current env
         :return: string uuid for vehicle
         """
-        response = self.get_device_info(device_name)['values']
-        if not response:
-            raise DeviceNotFoundError(f"No uuid found, device_name might not exist in environment: {self.__env}")
-        else:
-            return response[0]['uuid']
+        with self.use_env(env):
+            current_env = self.current_env
+            if use_cache:
+                uuid = self.device_cache.get(current_env, device_name)
+                if uuid is not None:
+                    return uuid
+            response = self.get_device_info(device_name)
+            device = exact_match(device_name, response['values'])
+            if device is None and response.get('total', 0) > len(response['values']):
+                # the device named exactly device_name may be past the first page of the search
+                device = self.resolve_devices([device_name])[device_name]
+            if device is None:
+                self.device_cache.invalidate(current_env, device_name)
+                raise DeviceNotFoundError(f"No uuid found, device_name might not exist in environment: {current_env}")
+            self.device_cache.set(current_env, device_name, device['uuid'])
+            return device['uuid']
+
+    def _request_device_resource(self: Self, device_name: str, method: str, build_url, uuid: str = None) -> Response:
+        """
+        resolves the device uuid and requests the url built from it. a 404 means the cached
+        mapping is stale so the entry is dropped and the request retried with a fresh uuid
+        :param device_name: device_name as a string
+        :param method: http method as a string
+        :param build_url: function taking the device uuid and returning the url
+        :param uuid: optional uuid already resolved for the device
+        :return: Response
+        """
+        if uuid is None:
+            uuid = self.get_device_uuid(device_name)
+        r = self.request(method, build_url(uuid))
+        if r.status_code == 404:
+            self.device_cache.invalidate(self.current_env, device_name)
+            fresh_uuid = self.get_device_uuid(device_name, use_cache=False)
+            if fresh_uuid != uuid:
+                r = self.request(method, build_url(fresh_uuid))
+        return r
+
+    def find_envs_for_device_names(self: Self, device_names: list, max_workers: int = 8) -> dict:
+        """
+        searches every env for each of the device names concurrently. each env is queried with its own
+        csrf token passed per request so the session headers and current env are never changed.
+        found uuids are stored in the device cache
+        :param device_names: list of device names
+        :param max_workers: maximum amount of concurrent requests
+        :return: dictionary of device name to a list of the envs the device was found in
+        """
+        envs = list(self.list_envs)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            env_contexts = list(executor.map(self.env_context, envs))
+            searches = {
+                (device_name, env_context["env"]): executor.submit(
+                    self.get,
+                    here_ota_search_device_by_device_name + device_name + "&limit=24&offset=0",
+                    headers={"Csrf-Token": env_context["csrf_token"]},
+                )
+                for device_name in device_names
+                for env_context in env_contexts
+            }
+            results = {device_name: [] for device_name in device_names}
+            for (device_name, env), future in searches.items():
+                # the search matches substrings, only a device named exactly device_name counts
+                device = exact_match(device_name, future.result().json()['values'])
+                if device is not None:
+                    results[device_name].append(env)
+                    self.device_cache.set(env, device_name, device['uuid'])
+        return results
 
     def find_and_switch_to_env_for_device_name(self: Self, device_name: str) -> bool:
         """
         This method is used to locate the env for a provided device_name. returns the env of the device_name and a bool
-        True of False if the device_name is found
+        True of False if the device_name is found. all envs are searched concurrently and the session
+        only changes env once the device has been found
         :param device_name: string representation of device_name
         :return: tuple or string
         """
-        results = []
-        for env in self.__envs:
-            response = self.get_device_info(device_name, env=env)['values']
-            if response:
-                results.append(env)
+        results = self.find_envs_for_device_names([device_name])[device_name]
         if len(results) > 1:
             raise EnvironmentError(f"device: {device_name} exists in multiple envs {results}")
         elif len(results) == 1:
@@ -292,42 +829,45 @@ class HereOtaClient(Session):
             return env
         raise DeviceNotFoundError(f"device_name not found in any of: {self.__envs} by device_name")
 
-    def get_device_history(self: Self, device_name: str, limit: int = 10) -> dict:
+    def get_device_history(self: Self, device_name: str, limit: int = 10, env: str = None,
+                           typed: bool = False) -> dict or list:
         """
         returns the device history for a specified device_name
         :param device_name: device_name number as a string
-        :param env: if provided will change to this env before request
+        :param env: if provided the request is made in this env without changing the current env
         :param limit: amount of campaign to return default 10
+        :param typed: if True a list of HistoryEntry is returned instead of the response dictionary
         :return: campaign data in the form of a DataFrame or an empty list if there is no data
         """
-        # collect uuid
-
-        uuid = self.get_device_uuid(device_name)
-
-        # hit device history endpoint for uuid and amount of campaign/limit
-        r1 = self.get(
-            build_here_ota_device_history_url(uuid, limit)
-        )
-        logger.debug(f"{r1.status_code}")
+        # hit device history endpoint for the device uuid and amount of campaign/limit
+        with self.use_env(env):
+            r1 = self._request_device_resource(
+                device_name, "GET", lambda uuid: build_here_ota_device_history_url(uuid, limit)
+            )
+        logger.debug("%s", r1.status_code)
 
         history = r1.json()
+        if typed:
+            return [HistoryEntry.from_dict(entry) for entry in history.get("values", [])]
         return history
 
-    def get_device_assignments(self: Self, device_name: str) -> list:
+    def get_device_assignments(self: Self, device_name: str, env: str = None, typed: bool = False) -> list:
         """
         retrieves the current assignments or pending assignments for the specified device_name
         an empty list is returned if no pending assignments exist
         :param device_name: the device_name as a string
-        :param env: if provided will change to this env before request
+        :param env: if provided the request is made in this env without changing the current env
+        :param typed: if True a list of Assignment is returned instead of dictionaries
         :return: empty list or pandas DataFrame
         """
 
-        # get uuid
-        uuid = self.get_device_uuid(device_name)
-        # hit assignments endpoint with uuid
-        r1 = self.get(here_ota_assignments + uuid)
+        # hit assignments endpoint with the device uuid
+        with self.use_env(env):
+            r1 = self._request_device_resource(device_name, "GET", lambda uuid: here_ota_assignments + uuid)
         # collect response data
         assignments = r1.json()
+        if typed:
+            return [Assignment.from_dict(assignment) for assignment in assignments]
         return assignments
 
     def create_static_group(self: Self, name: str) -> dict:
@@ -346,21 +886,86 @@ class HereOtaClient(Session):
                     "name": name
                 },
         )
-        logger.debug(r.content.decode())
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("%s", r.content.decode())
+        r.raise_for_status()
         return r.json()
 
-    def get_groups(self: Self, limit: int = 1000, offset=0) -> dict:
+    def get_groups(self: Self, limit: int = 1000, offset=0, sort_by: str = None) -> dict:
         """
         this method gets the device first 1000 groups in the current env
         :param limit: integer of how many records to return default 1000
+        :param sort_by: optional sort field such as createdAt
         :return: python dictionary of results
         """
-        r = self.get(build_get_here_ota_groups_url(limit=limit, offset=offset))
+        r = self.get(build_get_here_ota_groups_url(limit=limit, offset=offset, sort_by=sort_by))
         if r.status_code != 200:
             raise AuthenticationError("Unable to ping endpoint")
         return r.json()
 
-    def find_group_id_by_name(self: Self, name: str, limit: int = 1000, offset=0) -> str:
+    def group_index(self: Self, refresh: bool = True) -> index.NameIndex:
+        """
+        returns the local index of groups for the current env, on refresh only the groups
+        created since the last refresh are downloaded, an unchanged org costs one page request
+        :param refresh: if False the index is returned as is without any request
+        :return: NameIndex of group dictionaries
+        """
+        group_index = self._name_indexes.setdefault((self.current_env, "groups"), index.NameIndex("id", "groupName"))
+        if refresh:
+            group_index.refresh(iter_pages(
+                lambda limit, offset: self.get_groups(limit=limit, offset=offset, sort_by="createdAt"), 100,
+                prefetch=False,
+            ))
+        return group_index
+
+    def update_index(self: Self, refresh: bool = True) -> index.NameIndex:
+        """
+        returns the local index of updates for the current env, on refresh only the updates
+        created since the last refresh are downloaded
+        :param refresh: if False the index is returned as is without any request
+        :return: NameIndex of update dictionaries
+        """
+        update_index = self._name_indexes.setdefault((self.current_env, "updates"), index.NameIndex("uuid", "name"))
+        if refresh:
+            update_index.refresh(iter_pages(
+                lambda limit, offset: self.get(build_get_here_ota_campaign_data_url("", limit=limit, offset=offset)).json(),
+                100, prefetch=False,
+            ))
+        return update_index
+
+    def resolve_group(self: Self, name: str, match: str = index.EXACT, policy=index.UNIQUE) -> dict:
+        """
+        finds a group without prompting using the local group index
+        :param name: group name, prefix or substring
+        :param match: "exact", "prefix" or "substring"
+        :param policy: "first", "unique" or a callable(name, matches) returning the chosen group
+        :return: group dictionary
+        """
+        group = self.group_index().resolve(name, match, policy)
+        if group is None:
+            raise GroupNotFoundError(f"No group matching {name} found in {self.current_env}")
+        return group
+
+    def resolve_update(self: Self, name: str, match: str = index.EXACT, policy=index.UNIQUE) -> dict:
+        """
+        finds an update without prompting using the local update index
+        :param name: update name, prefix or substring
+        :param match: "exact", "prefix" or "substring"
+        :param policy: "first", "unique" or a callable(name, matches) returning the chosen update
+        :return: update dictionary
+        """
+        update = self.update_index().resolve(name, match, policy)
+        if update is None:
+            raise ValueError(f"No update found with name: {name}")
+        return update
+
+    def find_group_id_by_name(self: Self, name: str, limit: int = 1000, offset=0, policy=None) -> str:
+        """
+        finds the id of the group named name. prompts for each match unless a policy is provided,
+        see resolve_group for the policies
+        """
+        if policy is not None:
+            return self.resolve_group(name, index.EXACT, policy)["id"]
         data = self.get_groups(limit=limit, offset=offset)['values']
         for group_data in data:
             group_name = group_data["groupName"].strip()
@@ -371,16 +976,22 @@ class HereOtaClient(Session):
                     return group_data["id"]
         raise GroupNotFoundError(f"No group containing {name} found in first {limit} groups")
 
-    def find_here_ota_campaign_id_by_name(self: Self, name: str) -> str or None:
-        r = self.get(build_get_here_ota_campaign_data_url(name))
-        logger.debug(f"Response code: {r.status_code}")
-        data = r.json()
+    def find_here_ota_campaign_id_by_name(self: Self, name: str, policy=None) -> str or None:
+        """
+        finds the uuid of the update named name. prompts for each match unless a policy is provided,
+        see resolve_update for the policies
+        """
+        if policy is not None:
+            return self.resolve_update(name, index.EXACT, policy)["uuid"]
+        with self.cached_get(build_get_here_ota_campaign_data_url(name)) as r:
+            logger.debug("Response code: %s", r.status_code)
+            data = r.json()
         for update in data['values']:
             if name == update["name"]:
-                logger.info(f'Name: {update["name"]}')
-                logger.info(f'Created at: {update["createdAt"]}')
-                logger.info(f'Updated at: {update["updatedAt"]}')
-                logger.info(f"Description: {update['description']}")
+                logger.info("Name: %s", update["name"])
+                logger.info("Created at: %s", update["createdAt"])
+                logger.info("Updated at: %s", update["updatedAt"])
+                logger.info("Description: %s", update["description"])
                 update_id = update["uuid"]
                 correct = input("correct ? (Y/N/Q): ").lower()
                 if correct == "y":
@@ -395,33 +1006,144 @@ class HereOtaClient(Session):
 
     def add_device_to_group(self, group: str, device_name: str) -> Response:
         group_id = self.find_group_by_name(group)
-        device_id = self.get_device_uuid(device_name)
-        r = self.add_device_to_group_by_uuid(group_id, device_id)
+        r = self._request_device_resource(
+            device_name, "POST", lambda uuid: build_here_ota_add_device_to_group_endpoint(group_id, uuid)
+        )
+        return r
+
+    def remove_device_from_group_by_uuid(self: Self, group_uuid: str, device_uuid: str) -> Response:
+        r = self.delete(build_here_ota_add_device_to_group_endpoint(group_uuid, device_uuid))
+        return r
+
+    def remove_device_from_group(self, group: str, device_name: str) -> Response:
+        group_id = self.find_group_by_name(group)
+        r = self._request_device_resource(
+            device_name, "DELETE", lambda uuid: build_here_ota_add_device_to_group_endpoint(group_id, uuid)
+        )
+        return r
+
+    def _change_group_membership(self: Self, method: str, group: str, device_names: list, group_id: str = None,
+                                 max_workers: int = 8, policy=None) -> BulkReport:
+        """
+        resolves the group once and the device uuids in one batch, the uuids missing from the device cache
+        are resolved with resolve_devices. only the membership requests are then sent concurrently,
+        names without a device are reported as failures
+        :param method: POST to add the devices or DELETE to remove them
+        :param group: group name, ignored when group_id is provided
+        :param device_names: list of device names
+        :param group_id: optional group id to skip the group lookup
+        :param max_workers: maximum amount of concurrent requests
+        :param policy: optional policy to pick the group without prompting, see resolve_group
+        :return: BulkReport keyed by device name
+        """
+        if group_id is None:
+            group_id = self.find_group_by_name(group, policy=policy)
+        env = self.current_env
+        uuids = {}
+        unresolved = []
+        for device_name in dict.fromkeys(device_names):
+            uuid = self.device_cache.get(env, device_name)
+            if uuid is None:
+                unresolved.append(device_name)
+            else:
+                uuids[device_name] = uuid
+        if unresolved:
+            for device_name, device in self.resolve_devices(unresolved, max_workers=max_workers).items():
+                if device is not None:
+                    uuids[device_name] = device["uuid"]
+        report = run_bulk(
+            uuids,
+            lambda device_name: self._request_device_resource(
+                device_name, method, lambda uuid: build_here_ota_add_device_to_group_endpoint(group_id, uuid),
+                uuid=uuids[device_name],
+            ),
+            max_workers=max_workers,
+        )
+        for device_name in unresolved:
+            if device_name not in uuids:
+                report.results[device_name] = ItemResult(
+                    device_name, False, error=f"No device named {device_name} in environment: {env}"
+                )
+        return report
+
+    def add_devices_to_group(self: Self, group: str, device_names: list, group_id: str = None, policy=None,
+                             max_workers: int = 8) -> BulkReport:
+        """
+        adds many devices to a group in parallel, failures are reported per device instead of stopping the batch
+        :param group: group name, ignored when group_id is provided
+        :param device_names: list of device names
+        :param group_id: optional group id to skip the group lookup
+        :param policy: optional policy to pick the group without prompting, see resolve_group
+        :param max_workers: maximum amount of concurrent requests
+        :return: BulkReport keyed by device name
+        """
+        return self._change_group_membership("POST", group, device_names, group_id=group_id, max_workers=max_workers,
+                                             policy=policy)
+
+    def remove_devices_from_group(self: Self, group: str, device_names: list, group_id: str = None, policy=None,
+                                  max_workers: int = 8) -> BulkReport:
+        """
+        removes many devices from a group in parallel, failures are reported per device instead of stopping the batch
+        :param group: group name, ignored when group_id is provided
+        :param device_names: list of device names
+        :param group_id: optional group id to skip the group lookup
+        :param policy: optional policy to pick the group without prompting, see resolve_group
+        :param max_workers: maximum amount of concurrent requests
+        :return: BulkReport keyed by device name
+        """
+        return self._change_group_membership("DELETE", group, device_names, group_id=group_id, max_workers=max_workers,
+                                             policy=policy)
+
+    def _campaign_headers(self: Self) -> dict:
+        """the campaign endpoints expect the Host and Origin of the api, sent per request"""
+        origin = self.base_url.rstrip("/")
+        return {"Host": urlsplit(origin).netloc, "Origin": origin}
+
+    def create_campaign(self: Self, name: str, update_id: str, group_ids: list, approval_needed: bool = False) -> str:
+        """
+        creates a campaign of an update on groups without launching it
+        :param name: campaign name
+        :param update_id: update uuid
+        :param group_ids: list of group ids
+        :param approval_needed: if True devices ask for approval before installing
+        :return: campaign id
+        """
+        r = self.post(
+            here_ota_campaigns[:-1],  # post needs to be done on endpoint without slash
+            json={"name": name, "update": update_id, "groups": list(group_ids), "approvalNeeded": approval_needed},
+            headers=self._campaign_headers(),
+        )
+        r.raise_for_status()
+        return r.json()
+
+    def launch_campaign(self: Self, campaign_id: str) -> Response:
+        r = self.post(f"{here_ota_campaigns}{campaign_id}/launch", headers=self._campaign_headers())
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("%s", r.content.decode())
         return r
 
     def launch_campaign_on_group_by_name(self: Self, name: str, group_name: str, campaign_name: str) -> Response:
         group_uuid = self.find_group_by_name(group_name)
         update_id = self.find_here_ota_campaign_id_by_name(campaign_name)
         assert update_id is not None
-        header = {
-            "Host": "connect.ota.here.com",
-            "Origin": "https://connect.ota.here.com"
-        }
-        self.headers.update(header)
-        r = self.post(
-            here_ota_campaigns[:-1], # pos needs to be done on endpoint without slash
-            json= \
-                {
-                    "name": name,
-                    "update": update_id,
-                    "groups": [group_uuid],
-                    "approvalNeeded": False
-                }
-        )
-        launch_id = r.json()
-        r = self.post(f"{here_ota_campaigns}{launch_id}/launch")
-        logger.debug(r.content.decode())
-        return r
+        return self.launch_campaign(self.create_campaign(name, update_id, [group_uuid]))
+
+    def launch_campaigns(self: Self, name: str, update: str = None, groups: list = (), devices=(),
+                         update_id: str = None, env: str = None, **kwargs) -> LaunchManifest:
+        """
+        creates and launches a campaign of an update on every group and on every device or cohort of devices
+        concurrently without prompting, devices are put in new static groups first, see CampaignLauncher
+        :param name: campaign name, each campaign is named <name>-<group name, device name or cohort name>
+        :param update: update name, ignored when update_id is provided
+        :param groups: list of group names
+        :param devices: list of device names each launched on its own, or dictionary of cohort name to device names
+        :param update_id: optional update uuid to skip the update lookup
+        :param env: if provided the campaigns are launched in this env without changing the current env
+        :param kwargs: passed on to CampaignLauncher such as max_workers and rate
+        :return: LaunchManifest of the campaign id or error per target
+        """
+        with self.use_env(env):
+            return CampaignLauncher(self, **kwargs).launch(name, update, groups, devices, update_id=update_id)
 
     def get_campaign_info(self: Self, correlation_id: str):
         r1 = self.get(
@@ -429,7 +1151,31 @@ class HereOtaClient(Session):
         )
         return r1
 
-    def find_group_by_name(self: Self, name: str, limit: int = 1000, offset=0) -> str:
+    def get_campaign_stats(self: Self, campaign_id: str) -> dict:
+        """
+        returns the progress stats of a campaign such as status, affected, processed, finished and failed
+        :param campaign_id: campaign id as a string
+        :return: dictionary of stats
+        """
+        r = self.get(build_here_ota_campaign_stats_url(campaign_id))
+        return r.json()
+
+    def monitor_campaigns(self: Self, campaign_ids: list, **kwargs) -> CampaignMonitor:
+        """
+        builds a CampaignMonitor following the launched campaigns
+        :param campaign_ids: list of campaign ids
+        :param kwargs: passed on to CampaignMonitor
+        :return: CampaignMonitor
+        """
+        return CampaignMonitor(self, campaign_ids, **kwargs)
+
+    def find_group_by_name(self: Self, name: str, limit: int = 1000, offset=0, policy=None) -> str:
+        """
+        finds the id of a group whose name contains name. prompts for each match unless a policy
+        is provided, see resolve_group for the policies
+        """
+        if policy is not None:
+            return self.resolve_group(name, index.SUBSTRING, policy)["id"]
         data = self.get_groups(limit=limit, offset=offset)['values']
         for group_data in data:
             group_name = group_data["groupName"].strip()
@@ -443,26 +1189,125 @@ class HereOtaClient(Session):
 
     def get_device_names_in_group(self, group_name):
         group_id = self.find_group_by_name(group_name)
-        data = self.get_devices_in_group_by_id(group_id)["values"]
-        device_names = [device["deviceName"] for device in data]
+        device_names = [device["deviceName"] for device in self.iter_group_devices(group_id)]
         return device_names
 
-    def get_devices_in_group_by_id(self, group_id, limit=100):
-        r = self.get(f"https://connect.ota.here.com/api/v1/devices?nameContains=&limit={limit}&offset=0&groupId={group_id}")
+    def get_devices_in_group_by_id(self, group_id, limit=100, offset=0):
+        r = self.get(build_here_ota_devices_in_group_url(group_id, limit=limit, offset=offset))
         return r.json()
 
-    def get_device_events(self: Self, device_name: str) -> dict:
+    def iter_groups(self: Self, page_size: int = 100, typed: bool = False):
+        """
+        lazily pages through every group in the current env, prefetching the next page in the background
+        :param page_size: amount of groups requested per page
+        :param typed: if True Group models are returned instead of dictionaries
+        :return: generator of group dictionaries
+        """
+        groups = iter_pages(lambda limit, offset: self.get_groups(limit=limit, offset=offset), page_size)
+        return map(Group.from_dict, groups) if typed else groups
+
+    def iter_group_devices(self: Self, group_id: str, page_size: int = 100, typed: bool = False):
+        """
+        lazily pages through every device in a group, prefetching the next page in the background
+        :param group_id: group id as a string
+        :param page_size: amount of devices requested per page
+        :param typed: if True Device models are returned instead of dictionaries
+        :return: generator of device dictionaries
+        """
+        devices = iter_pages(
+            lambda limit, offset: self.get_devices_in_group_by_id(group_id, limit=limit, offset=offset), page_size
+        )
+        return map(Device.from_dict, devices) if typed else devices
+
+    def iter_updates(self: Self, name: str = "", page_size: int = 100, typed: bool = False):
+        """
+        lazily pages through the updates sorted by createdAt, prefetching the next page in the background
+        :param name: optional name filter, updates containing this string are returned
+        :param page_size: amount of updates requested per page
+        :param typed: if True Update models are returned instead of dictionaries
+        :return: generator of update dictionaries
+        """
+        updates = iter_pages(
+            lambda limit, offset: self.get(build_get_here_ota_campaign_data_url(name, limit=limit, offset=offset)).json(),
+            page_size
+        )
+        return map(Update.from_dict, updates) if typed else updates
+
+    def device_inventory(self: Self, group_id: str = None) -> ModelTable:
+        """
+        loads every device of a group, or of the current env when no group is given, into a columnar
+        ModelTable that holds a large inventory in a fraction of the memory of the device dictionaries
+        :param group_id: optional group id
+        :return: ModelTable of Device
+        """
+        return ModelTable(Device, self.iter_group_devices(group_id) if group_id is not None else self.iter_devices())
+
+    def get_device_events(self: Self, device_name: str, env: str = None) -> dict:
         """TODO"""
-        uuid = self.get_device_uuid(device_name)
-        # r1 = self.get(
-        #     build_here_ota_device_history_url(uuid)
-        # )
-        return self.get(build_here_ota_events_url(uuid)).json()
+        with self.use_env(env):
+            return self._request_device_resource(device_name, "GET", build_here_ota_events_url).json()
 
     def get_device_info_by_uuid(self: Self, uuid: str):
         return self.get(here_ota_search_device_by_uuid + uuid)
 
-    def get_device_network(self: Self, device_name: str) -> dict:
-        uuid = self.get_device_uuid(device_name)
-        r = self.get(build_here_ota_device_network_endpoint(uuid))
+    def get_device_network(self: Self, device_name: str, env: str = None) -> dict:
+        with self.use_env(env):
+            r = self._request_device_resource(device_name, "GET", build_here_ota_device_network_endpoint)
         return r.json()
+
+    def get_device_history_by_uuid(self: Self, uuid: str, limit: int = 10, offset: int = 0) -> Response:
+        return self.get(build_here_ota_device_history_url(uuid, limit, offset))
+
+    def get_device_events_by_uuid(self: Self, uuid: str) -> Response:
+        return self.get(build_here_ota_events_url(uuid))
+
+    def get_device_assignments_by_uuid(self: Self, uuid: str) -> Response:
+        return self.get(here_ota_assignments + uuid)
+
+    def get_device_network_by_uuid(self: Self, uuid: str) -> Response:
+        return self.get(build_here_ota_device_network_endpoint(uuid))
+
+    def iter_devices(self: Self, name_contains: str = "", page_size: int = 100, typed: bool = False):
+        """
+        lazily pages through every device of the current env, prefetching the next page in the background
+        :param name_contains: optional filter, devices whose name contains this string are returned
+        :param page_size: amount of devices requested per page
+        :param typed: if True Device models are returned instead of dictionaries
+        :return: generator of device dictionaries
+        """
+        devices = iter_pages(
+            lambda limit, offset: self.get(build_here_ota_devices_url(name_contains, limit=limit, offset=offset)).json(),
+            page_size
+        )
+        return map(Device.from_dict, devices) if typed else devices
+
+    def sync_history(self: Self, store: HistoryStore, device_names: list = None, group_id: str = None, **kwargs):
+        """
+        downloads the installation history and events newer than the stored cursors of the devices of a group,
+        of the device names, or of the current env when neither is given into a local HistoryStore
+        :param store: HistoryStore
+        :param device_names: optional list of device names
+        :param group_id: optional group id
+        :param kwargs: passed on to HistorySync
+        :return: SyncSummary
+        """
+        sync = HistorySync(self, store, **kwargs)
+        if device_names is not None:
+            return sync.sync_devices(device_names)
+        if group_id is not None:
+            return sync.sync_group(group_id)
+        return sync.sync_devices(self.iter_devices())
+
+    def export_fleet(self: Self, path: str, group_id: str = None, **kwargs):
+        """
+        streams a snapshot of every device in a group, or in the current env when no group is given,
+        to a jsonl or csv file. an interrupted export resumes where it stopped, see FleetExporter
+        :param path: output file ending in .jsonl or .csv
+        :param group_id: optional group id
+        :param kwargs: passed on to FleetExporter
+        :return: ExportSummary
+        """
+        exporter = FleetExporter(self, path, **kwargs)
+        if group_id is not None:
+            return exporter.export_group(group_id)
+        return exporter.export_env()
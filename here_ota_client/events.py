@@ -0,0 +1,257 @@
+import asyncio
+import json
+import random
+import aiohttp
+from dataclasses import dataclass, field
+from typing import Self
+from Logger import set_up_logger
+
+logger = set_up_logger(name="here-ota-events")
+
+device_event_marker = "DeviceEventMessage"
+
+
+@dataclass(frozen=True, slots=True)
+class DeviceEvent:
+    """an ECU event decoded from a DeviceEventMessage websocket frame"""
+    correlation_id: str
+    event_type: str
+    device_uuid: str = None
+    received_at: str = None
+    raw: dict = field(default=None, repr=False, compare=False)
+
+    @property
+    def campaign_id(self: Self) -> str:
+        """the campaign uuid at the end of a correlation id such as urn:here-ota:campaign:<uuid>"""
+        return self.correlation_id.rsplit(":", 1)[-1]
+
+
+def decode_device_event(message: str) -> DeviceEvent or None:
+    """
+    decodes a websocket message into a DeviceEvent, messages of any other type return None.
+    most frames are not device events so they are rejected with a substring check before any json parsing
+    :param message: string websocket message
+    :return: DeviceEvent or None
+    """
+    if device_event_marker not in message:
+        return None
+    return _device_event_from_data(json.loads(message))
+
+
+def decode_device_events(messages: list) -> list:
+    """
+    decodes a batch of websocket messages into DeviceEvents skipping any other type of message.
+    the candidate frames are parsed with a single json.loads call on a json array,
+    if one frame is malformed the batch falls back to decoding the frames one by one
+    :param messages: list of string websocket messages
+    :return: list of DeviceEvent
+    """
+    candidates = [message for message in messages if device_event_marker in message]
+    if not candidates:
+        return []
+    try:
+        decoded = json.loads("[" + ",".join(candidates) + "]")
+    except ValueError:
+        decoded = []
+        for message in candidates:
+            try:
+                decoded.append(json.loads(message))
+            except ValueError:
+                logger.debug("Skipping malformed websocket message: %.200s", message)
+    events = []
+    for data in decoded:
+        try:
+            event = _device_event_from_data(data)
+        except (KeyError, TypeError):
+            continue
+        if event is not None:
+            events.append(event)
+    return events
+
+
+def _device_event_from_data(data: dict) -> DeviceEvent or None:
+    if data.get("type") != "DeviceEventMessage":
+        return None
+    event = data['event']
+    # positional arguments, this runs for every event of the stream
+    return DeviceEvent(event['payload']['correlationId'], event['eventType']['id'], event.get('deviceUuid'),
+                       event.get('receivedAt'), data)
+
+
+class Subscription:
+    """
+    a bounded queue of the events matching the device, campaign and event type filters.
+    a filter left as None matches every event
+    """
+
+    def __init__(self: Self, devices=None, campaigns=None, event_types=None, maxsize: int = 1000) -> None:
+        self.devices = set(devices) if devices is not None else None
+        self.campaigns = set(campaigns) if campaigns is not None else None
+        self.event_types = set(event_types) if event_types is not None else None
+        self.queue = asyncio.Queue(maxsize=maxsize)
+
+    def matches(self: Self, event: DeviceEvent) -> bool:
+        if self.devices is not None and event.device_uuid not in self.devices:
+            return False
+        if self.campaigns is not None and event.correlation_id not in self.campaigns \
+                and event.campaign_id not in self.campaigns:
+            return False
+        if self.event_types is not None and event.event_type not in self.event_types:
+            return False
+        return True
+
+    async def get(self: Self) -> DeviceEvent:
+        return await self.queue.get()
+
+    def __aiter__(self: Self):
+        return self
+
+    async def __anext__(self: Self) -> DeviceEvent:
+        return await self.queue.get()
+
+
+class EventStream:
+    """
+    long lived listener on the here ota websocket. decodes DeviceEventMessage frames and puts them on the
+    queue of every matching subscription. the frames already received are decoded together in one batch while
+    the socket keeps being read, once max_batch frames wait for a full queue reading from the socket waits until
+    the subscriber catches up. the connection is reopened with exponential backoff when it drops
+
+    async with client.event_stream() as stream:
+        subscription = stream.subscribe(campaigns=[campaign_id])
+        async for event in subscription:
+            ...
+    """
+
+    def __init__(self: Self, url: str, headers: dict = None, session: aiohttp.ClientSession = None,
+                 min_backoff: float = 1, max_backoff: float = 60, heartbeat: float = 30, max_batch: int = 500) -> None:
+        """
+        :param url: websocket url, for a client use client.websocket_url
+        :param headers: headers sent when connecting such as the session Cookie
+        :param session: optional aiohttp session to connect with, a new one is created otherwise
+        :param min_backoff: seconds to wait before the first reconnect
+        :param max_backoff: maximum seconds to wait between reconnects
+        :param heartbeat: seconds between websocket pings
+        :param max_batch: maximum amount of frames buffered before reading from the socket waits
+        """
+        self.url = url
+        self.headers = headers or {}
+        self.session = session
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.heartbeat = heartbeat
+        self.max_batch = max_batch
+        self.connected = asyncio.Event()
+        self._owns_session = session is None
+        self._subscriptions = []
+        self._task = None
+        self._stopped = False
+
+    async def __aenter__(self: Self) -> Self:
+        self.start()
+        return self
+
+    async def __aexit__(self: Self, *exc_info) -> None:
+        await self.stop()
+
+    def subscribe(self: Self, devices=None, campaigns=None, event_types=None, maxsize: int = 1000) -> Subscription:
+        """
+        :param devices: device uuids to receive events for
+        :param campaigns: campaign ids or correlation ids to receive events for
+        :param event_types: event type ids such as EcuInstallationCompleted
+        :param maxsize: size of the subscription queue
+        :return: Subscription
+        """
+        subscription = Subscription(devices, campaigns, event_types, maxsize)
+        self._subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self: Self, subscription: Subscription) -> None:
+        self._subscriptions.remove(subscription)
+
+    def start(self: Self) -> asyncio.Task:
+        if self._task is None or self._task.done():
+            self._stopped = False
+            self._task = asyncio.ensure_future(self.run())
+        return self._task
+
+    async def stop(self: Self) -> None:
+        self._stopped = True
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._owns_session and self.session is not None:
+            await self.session.close()
+
+    async def dispatch(self: Self, event: DeviceEvent) -> None:
+        for subscription in list(self._subscriptions):
+            if subscription.matches(event):
+                await subscription.queue.put(event)
+
+    async def run(self: Self) -> None:
+        """
+        connects and dispatches events until stop is called, reconnecting with backoff
+        :return: void
+        """
+        if self.session is None:
+            self.session = aiohttp.ClientSession()
+        backoff = self.min_backoff
+        while not self._stopped:
+            try:
+                async with self.session.ws_connect(self.url, headers=self.headers, heartbeat=self.heartbeat) as ws:
+                    logger.info("Connected to %s", self.url)
+                    self.connected.set()
+                    backoff = self.min_backoff
+                    await self._read(ws)
+            except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+                logger.warning("Websocket error: %s", e)
+            self.connected.clear()
+            if self._stopped:
+                break
+            delay = random.uniform(backoff / 2, backoff)
+            logger.info("Websocket closed, reconnecting in %.1fs", delay)
+            await asyncio.sleep(delay)
+            backoff = min(backoff * 2, self.max_backoff)
+
+    async def _read(self: Self, ws) -> None:
+        """
+        reads the frames of one connection while a second task decodes and dispatches them. reading does not
+        suspend while aiohttp holds received frames, so the dispatcher gets every frame already received as one
+        batch. the frames left when the connection closes are dispatched before returning
+        """
+        frames = []
+        ready = asyncio.Event()
+        drained = asyncio.Event()
+        closed = False
+
+        async def dispatch_batches():
+            while True:
+                await ready.wait()
+                ready.clear()
+                batch = frames[:]
+                frames.clear()
+                drained.set()
+                for event in decode_device_events(batch):
+                    await self.dispatch(event)
+                if closed and not frames:
+                    return
+
+        dispatcher = asyncio.ensure_future(dispatch_batches())
+        try:
+            async for message in ws:
+                if message.type == aiohttp.WSMsgType.TEXT:
+                    frames.append(message.data)
+                    ready.set()
+                    if len(frames) >= self.max_batch:
+                        drained.clear()
+                        await drained.wait()
+                elif message.type == aiohttp.WSMsgType.ERROR:
+                    break
+            closed = True
+            ready.set()
+            await dispatcher
+        finally:
+            dispatcher.cancel()
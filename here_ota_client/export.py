@@ -0,0 +1,141 @@
+import csv
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from contextvars import copy_context
+from dataclasses import dataclass
+from typing import Self
+from Logger import set_up_logger
+
+logger = set_up_logger(name="here-ota-export")
+
+JSONL = "jsonl"
+CSV = "csv"
+
+csv_columns = ["uuid", "deviceName", "info", "history", "assignments", "network", "errors"]
+
+
+@dataclass
+class ExportSummary:
+    written: int = 0
+    skipped: int = 0
+    failed: int = 0
+
+
+class FleetExporter:
+    """
+    streams devices and writes one record per device with its info, installation history, assignments
+    and network info to a jsonl or csv file. devices are fetched concurrently with a bounded amount in flight
+    so memory does not grow with the fleet. the uuid of each device written without errors is appended to a
+    checkpoint file, when the export is run again the devices already in the checkpoint are skipped and new records
+    are appended. a device whose resources fail is still written with the errors in its record instead of stopping
+    the export, it is not checkpointed so the next run fetches it again and appends a newer record for it
+    """
+
+    def __init__(self: Self, client, path: str, fmt: str = None, checkpoint_path: str = None, max_workers: int = 8,
+                 history_limit: int = 10) -> None:
+        """
+        :param client: HereOtaClient
+        :param path: output file
+        :param fmt: "jsonl" or "csv", taken from the file extension by default
+        :param checkpoint_path: file of the exported uuids, defaults to path + ".checkpoint"
+        :param max_workers: maximum amount of devices fetched concurrently
+        :param history_limit: amount of installation history entries exported per device
+        """
+        self.client = client
+        self.path = path
+        self.fmt = fmt or (CSV if path.endswith(".csv") else JSONL)
+        if self.fmt not in (JSONL, CSV):
+            raise ValueError(f"Unknown export format: {self.fmt}")
+        self.checkpoint_path = checkpoint_path or path + ".checkpoint"
+        self.max_workers = max_workers
+        self.history_limit = history_limit
+
+    def export_group(self: Self, group_id: str) -> ExportSummary:
+        return self.export_devices(self.client.iter_group_devices(group_id))
+
+    def export_env(self: Self) -> ExportSummary:
+        return self.export_devices(self.client.iter_devices())
+
+    def _load_checkpoint(self: Self) -> set:
+        if not os.path.exists(self.checkpoint_path):
+            return set()
+        with open(self.checkpoint_path) as f:
+            return {line.strip() for line in f if line.strip()}
+
+    def fetch_record(self: Self, device: dict) -> dict:
+        """
+        fetches the resources of one device, the device dictionary from the listing is used as its info
+        :param device: device dictionary from the device search
+        :return: record dictionary
+        """
+        uuid = device["uuid"]
+        record = {"uuid": uuid, "deviceName": device.get("deviceName"), "info": device, "errors": {}}
+        resources = {
+            "history": lambda: self.client.get_device_history_by_uuid(uuid, self.history_limit),
+            "assignments": lambda: self.client.get_device_assignments_by_uuid(uuid),
+            "network": lambda: self.client.get_device_network_by_uuid(uuid),
+        }
+        for name, fetch in resources.items():
+            try:
+                r = fetch()
+                if r.ok:
+                    record[name] = r.json()
+                else:
+                    record[name] = None
+                    record["errors"][name] = f"{r.status_code}: {r.text[:200]}"
+            except Exception as e:
+                record[name] = None
+                record["errors"][name] = f"{type(e).__name__}: {e}"
+        return record
+
+    def export_devices(self: Self, devices) -> ExportSummary:
+        """
+        :param devices: iterable of device dictionaries
+        :return: ExportSummary
+        """
+        done = self._load_checkpoint()
+        summary = ExportSummary()
+        new_file = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        with open(self.path, "a", newline="") as out, open(self.checkpoint_path, "a") as checkpoint, \
+                ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            writer = None
+            if self.fmt == CSV:
+                writer = csv.DictWriter(out, fieldnames=csv_columns)
+                if new_file:
+                    writer.writeheader()
+            in_flight = set()
+
+            def write_completed(futures):
+                for future in futures:
+                    record = future.result()
+                    self._write(out, writer, record)
+                    out.flush()
+                    summary.written += 1
+                    if record["errors"]:
+                        summary.failed += 1
+                        logger.warning("%s exported with errors: %s", record["deviceName"], record["errors"])
+                        continue
+                    checkpoint.write(record["uuid"] + "\n")
+                    checkpoint.flush()
+
+            for device in devices:
+                if device["uuid"] in done:
+                    summary.skipped += 1
+                    continue
+                in_flight.add(executor.submit(copy_context().run, self.fetch_record, device))
+                if len(in_flight) >= self.max_workers * 2:
+                    completed, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    write_completed(completed)
+            write_completed(in_flight)
+        logger.info("Exported %s devices to %s, %s already exported", summary.written, self.path, summary.skipped)
+        return summary
+
+    def _write(self: Self, out, writer, record: dict) -> None:
+        if writer is None:
+            out.write(json.dumps(record) + "\n")
+        else:
+            writer.writerow({
+                column: record.get(column) if column in ("uuid", "deviceName") else json.dumps(record.get(column))
+                for column in csv_columns
+            })
@@ -0,0 +1,255 @@
+import json
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Self
+from Logger import set_up_logger
+
+logger = set_up_logger(name="here-ota-history")
+
+schema = """
+CREATE TABLE IF NOT EXISTS history (
+    env TEXT NOT NULL,
+    device_uuid TEXT NOT NULL,
+    correlation_id TEXT NOT NULL,
+    received_at TEXT NOT NULL,
+    success INTEGER,
+    raw TEXT NOT NULL,
+    PRIMARY KEY (env, device_uuid, correlation_id, received_at)
+);
+CREATE INDEX IF NOT EXISTS history_correlation_id ON history (env, correlation_id);
+CREATE INDEX IF NOT EXISTS history_received_at ON history (env, received_at);
+CREATE TABLE IF NOT EXISTS events (
+    env TEXT NOT NULL,
+    device_uuid TEXT NOT NULL,
+    event_type TEXT NOT NULL,
+    correlation_id TEXT,
+    received_at TEXT NOT NULL,
+    raw TEXT NOT NULL,
+    PRIMARY KEY (env, device_uuid, event_type, received_at, correlation_id)
+);
+CREATE TABLE IF NOT EXISTS devices (
+    env TEXT NOT NULL,
+    device_uuid TEXT NOT NULL,
+    device_name TEXT,
+    cursor TEXT,
+    synced_at REAL,
+    PRIMARY KEY (env, device_uuid)
+);
+CREATE INDEX IF NOT EXISTS devices_name ON devices (env, device_name);
+"""
+
+
+class HistoryStore:
+    """
+    local sqlite store of the installation history and events of devices. every device has a cursor, the
+    receivedAt of its newest stored history entry, so a sync only downloads what is newer. queries
+    over the whole fleet such as every result of a campaign are answered locally
+
+    store = HistoryStore("history.sqlite")
+    """
+
+    def __init__(self: Self, path: str = ":memory:") -> None:
+        """
+        :param path: sqlite database file, in memory by default
+        """
+        self.path = path
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.row_factory = sqlite3.Row
+        self._lock = Lock()
+        with self._lock, self._connection:
+            if path != ":memory:":
+                self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.executescript(schema)
+
+    def close(self: Self) -> None:
+        self._connection.close()
+
+    def _query(self: Self, sql: str, parameters=()) -> list:
+        with self._lock:
+            return self._connection.execute(sql, parameters).fetchall()
+
+    def cursor(self: Self, env: str, device_uuid: str) -> str or None:
+        """
+        :return: receivedAt of the newest stored history entry of the device, None if it was never synced
+        """
+        rows = self._query("SELECT cursor FROM devices WHERE env = ? AND device_uuid = ?", (env, device_uuid))
+        return rows[0]["cursor"] if rows else None
+
+    def save(self: Self, env: str, device_uuid: str, device_name: str, history: list, events: list = ()) -> int:
+        """
+        stores the history entries and events of one device and moves its cursor in one transaction
+        :param env: env of the device
+        :param device_uuid: device uuid
+        :param device_name: device name
+        :param history: installation history entries
+        :param events: device events
+        :return: amount of new history entries
+        """
+        history_rows = [
+            (env, device_uuid, entry.get("correlationId") or "", entry["receivedAt"],
+             None if entry.get("success") is None else int(entry["success"]), json.dumps(entry))
+            for entry in history
+        ]
+        event_rows = [
+            (env, device_uuid, (event.get("eventType") or {}).get("id", ""),
+             (event.get("payload") or {}).get("correlationId"), event["receivedAt"], json.dumps(event))
+            for event in events
+        ]
+        with self._lock, self._connection:
+            before = self._connection.total_changes
+            self._connection.executemany("INSERT OR IGNORE INTO history VALUES (?, ?, ?, ?, ?, ?)", history_rows)
+            new_entries = self._connection.total_changes - before
+            self._connection.executemany("INSERT OR IGNORE INTO events VALUES (?, ?, ?, ?, ?, ?)", event_rows)
+            cursor = self._connection.execute(
+                "SELECT MAX(received_at) FROM history WHERE env = ? AND device_uuid = ?", (env, device_uuid)
+            ).fetchone()[0]
+            self._connection.execute(
+                "INSERT INTO devices VALUES (?, ?, ?, ?, ?) ON CONFLICT (env, device_uuid) DO UPDATE SET "
+                "device_name = excluded.device_name, cursor = excluded.cursor, synced_at = excluded.synced_at",
+                (env, device_uuid, device_name, cursor or "", time.time()),
+            )
+        return new_entries
+
+    def device_history(self: Self, env: str, device_name: str, limit: int = None) -> list:
+        """
+        :param env: env of the device
+        :param device_name: device name
+        :param limit: optional maximum amount of entries
+        :return: stored history entries of the device, newest first
+        """
+        rows = self._query(
+            "SELECT history.raw FROM history JOIN devices USING (env, device_uuid) "
+            "WHERE env = ? AND device_name = ? ORDER BY received_at DESC LIMIT ?",
+            (env, device_name, -1 if limit is None else limit),
+        )
+        return [json.loads(row["raw"]) for row in rows]
+
+    def device_events(self: Self, env: str, device_name: str) -> list:
+        rows = self._query(
+            "SELECT events.raw FROM events JOIN devices USING (env, device_uuid) "
+            "WHERE env = ? AND device_name = ? ORDER BY received_at DESC",
+            (env, device_name),
+        )
+        return [json.loads(row["raw"]) for row in rows]
+
+    def campaign_results(self: Self, env: str, correlation_id: str) -> dict:
+        """
+        :param env: env of the campaign
+        :param correlation_id: correlation id such as urn:here-ota:campaign:<campaign id>
+        :return: dictionary of device name to the success of its latest installation of the campaign
+        """
+        rows = self._query(
+            "SELECT device_name, success, MAX(received_at) FROM history JOIN devices USING (env, device_uuid) "
+            "WHERE env = ? AND correlation_id = ? GROUP BY device_uuid",
+            (env, correlation_id),
+        )
+        return {row["device_name"]: None if row["success"] is None else bool(row["success"]) for row in rows}
+
+    def failures(self: Self, env: str, since: str = None) -> list:
+        """
+        :param env: env of the devices
+        :param since: optional receivedAt timestamp, only failures received after it are returned
+        :return: list of (device name, correlation id, receivedAt) of failed installations, newest first
+        """
+        rows = self._query(
+            "SELECT device_name, correlation_id, received_at FROM history JOIN devices USING (env, device_uuid) "
+            "WHERE env = ? AND success = 0 AND received_at > ? ORDER BY received_at DESC",
+            (env, since or ""),
+        )
+        return [(row["device_name"], row["correlation_id"], row["received_at"]) for row in rows]
+
+    def count(self: Self, env: str = None) -> int:
+        if env is None:
+            return self._query("SELECT COUNT(*) FROM history")[0][0]
+        return self._query("SELECT COUNT(*) FROM history WHERE env = ?", (env,))[0][0]
+
+
+@dataclass
+class SyncSummary:
+    devices: int = 0
+    new_entries: int = 0
+    failed: dict = field(default_factory=dict)
+
+
+class HistorySync:
+    """
+    downloads the installation history and events of devices into a HistoryStore. the first sync of a device
+    pages backward through its whole history, later syncs stop at the first page reaching the stored cursor
+    so an unchanged device costs one small request for its history
+
+    sync = HistorySync(hotac, HistoryStore("history.sqlite"))
+    sync.sync_group(group_id)
+    """
+
+    def __init__(self: Self, client, store: HistoryStore, page_size: int = 50, max_workers: int = 8,
+                 events: bool = True) -> None:
+        """
+        :param client: HereOtaClient
+        :param store: HistoryStore
+        :param page_size: amount of history entries requested per page
+        :param max_workers: maximum amount of devices synced concurrently
+        :param events: if False only the installation history is synced
+        """
+        self.client = client
+        self.store = store
+        self.page_size = page_size
+        self.max_workers = max_workers
+        self.events = events
+
+    def _json(self: Self, r) -> object:
+        r.raise_for_status()
+        return r.json()
+
+    def sync_device(self: Self, device: dict or str) -> int:
+        """
+        :param device: device name, or a device dictionary with its uuid and deviceName from a device listing
+        :return: amount of new history entries
+        """
+        env = self.client.current_env
+        if isinstance(device, str):
+            device = {"deviceName": device, "uuid": self.client.get_device_uuid(device)}
+        device_uuid = device["uuid"]
+        cursor = self.store.cursor(env, device_uuid)
+        entries = []
+        offset = 0
+        while True:
+            page = self._json(self.client.get_device_history_by_uuid(device_uuid, self.page_size, offset))
+            values = page.get("values", [])
+            entries.extend(values)
+            offset += len(values)
+            if not values or (cursor and values[-1]["receivedAt"] < cursor):
+                break
+            total = page.get("total")
+            if (total is not None and offset >= total) or (total is None and len(values) < self.page_size):
+                break
+        events = self._json(self.client.get_device_events_by_uuid(device_uuid)) if self.events else ()
+        return self.store.save(env, device_uuid, device.get("deviceName"), entries, events)
+
+    def sync_devices(self: Self, devices) -> SyncSummary:
+        """
+        syncs devices concurrently, a failing device is recorded in the summary instead of stopping the sync
+        :param devices: iterable of device names or device dictionaries
+        :return: SyncSummary
+        """
+        summary = SyncSummary()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {}
+            for device in devices:
+                futures[executor.submit(copy_context().run, self.sync_device, device)] = device
+            for future, device in futures.items():
+                name = device if isinstance(device, str) else device.get("deviceName")
+                try:
+                    summary.new_entries += future.result()
+                    summary.devices += 1
+                except Exception as e:
+                    summary.failed[name] = f"{type(e).__name__}: {e}"
+        logger.info("Synced %s devices, %s new history entries, %s failed",
+                    summary.devices, summary.new_entries, len(summary.failed))
+        return summary
+
+    def sync_group(self: Self, group_id: str) -> SyncSummary:
+        return self.sync_devices(self.client.iter_group_devices(group_id))
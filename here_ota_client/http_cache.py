@@ -0,0 +1,191 @@
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass, asdict
+from threading import Lock
+from typing import Self
+from requests import Response
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from Logger import set_up_logger
+
+logger = set_up_logger(name="here-ota-http-cache")
+
+cached_headers = ("Content-Type", "ETag", "Last-Modified")
+
+
+@dataclass
+class CacheEntry:
+    key: str
+    scope: str
+    url: str
+    size: int
+    stored_at: float
+    used_at: float
+    headers: dict
+
+
+class HttpCache:
+    """
+    on disk cache of GET responses revalidated with ETag and Last-Modified. entries are scoped, the client
+    uses the namespace of the env so the same url is cached separately for every env. a response younger than
+    max_age is served without any request, an older one is revalidated and a 304 serves it from disk.
+    when the bodies exceed max_bytes the least recently used entries are evicted
+
+    client = HereOtaClient(username, password, http_cache=HttpCache("~/.here_ota_cache"))
+    """
+
+    def __init__(self: Self, directory: str, max_bytes: int = 256 * 2 ** 20, max_age: float = 0) -> None:
+        """
+        :param directory: directory of the cached bodies and the index
+        :param max_bytes: maximum total size of the cached bodies
+        :param max_age: seconds a response is served without revalidation
+        """
+        self.directory = os.path.expanduser(directory)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self._lock = Lock()
+        os.makedirs(self.directory, exist_ok=True)
+        self._index_path = os.path.join(self.directory, "index.json")
+        self._entries = self._load_index()
+
+    def _load_index(self: Self) -> dict:
+        try:
+            with open(self._index_path) as f:
+                entries = {key: CacheEntry(**entry) for key, entry in json.load(f).items()}
+        except FileNotFoundError:
+            return {}
+        except (ValueError, TypeError):
+            logger.warning("Ignoring unreadable http cache index %s", self._index_path)
+            return {}
+        return {key: entry for key, entry in entries.items() if os.path.exists(self.body_path(entry))}
+
+    def _save_index(self: Self) -> None:
+        tmp_path = self._index_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({key: asdict(entry) for key, entry in self._entries.items()}, f)
+        os.replace(tmp_path, self._index_path)
+
+    @staticmethod
+    def _key(scope: str, url: str) -> str:
+        return hashlib.sha256(f"{scope}\n{url}".encode()).hexdigest()
+
+    def body_path(self: Self, entry: CacheEntry) -> str:
+        return os.path.join(self.directory, entry.key)
+
+    def lookup(self: Self, scope: str, url: str) -> CacheEntry or None:
+        with self._lock:
+            return self._entries.get(self._key(scope, url))
+
+    def is_fresh(self: Self, entry: CacheEntry) -> bool:
+        return time.time() - entry.stored_at < self.max_age
+
+    @staticmethod
+    def validators(entry: CacheEntry or None) -> dict:
+        """
+        :param entry: cached entry or None
+        :return: conditional request headers revalidating the entry
+        """
+        if entry is None:
+            return {}
+        headers = {}
+        if entry.headers.get("ETag"):
+            headers["If-None-Match"] = entry.headers["ETag"]
+        if entry.headers.get("Last-Modified"):
+            headers["If-Modified-Since"] = entry.headers["Last-Modified"]
+        return headers
+
+    @staticmethod
+    def is_cacheable(r: Response) -> bool:
+        return r.status_code == 200 and ("ETag" in r.headers or "Last-Modified" in r.headers)
+
+    def store(self: Self, scope: str, url: str, r: Response, chunk_size: int = 2 ** 16) -> CacheEntry:
+        """
+        streams the body of a response to disk and evicts old entries when the cache is full
+        :param scope: scope of the entry such as the env namespace
+        :param url: requested url
+        :param r: response, preferably requested with stream=True
+        :param chunk_size: size of the chunks written
+        :return: CacheEntry
+        """
+        key = self._key(scope, url)
+        now = time.time()
+        entry = CacheEntry(key, scope, url, 0, now, now, {k: r.headers[k] for k in cached_headers if k in r.headers})
+        tmp_path = f"{self.body_path(entry)}.{os.getpid()}.{id(entry)}.tmp"
+        with open(tmp_path, "wb") as f:
+            for chunk in r.iter_content(chunk_size):
+                f.write(chunk)
+                entry.size += len(chunk)
+        os.replace(tmp_path, self.body_path(entry))
+        with self._lock:
+            self._entries[key] = entry
+            self._evict(keep=key)
+            self._save_index()
+        return entry
+
+    def refresh(self: Self, entry: CacheEntry, r: Response) -> None:
+        """
+        marks an entry as revalidated after a 304 response
+        :param entry: cached entry
+        :param r: 304 response, it may carry new validators
+        :return: void
+        """
+        with self._lock:
+            entry.stored_at = time.time()
+            entry.headers.update({k: r.headers[k] for k in ("ETag", "Last-Modified") if k in r.headers})
+            self._save_index()
+
+    def _evict(self: Self, keep: str) -> None:
+        total = sum(entry.size for entry in self._entries.values())
+        for entry in sorted(self._entries.values(), key=lambda entry: entry.used_at):
+            if total <= self.max_bytes:
+                break
+            if entry.key == keep:
+                continue
+            total -= entry.size
+            del self._entries[entry.key]
+            try:
+                os.remove(self.body_path(entry))
+            except FileNotFoundError:
+                pass
+            logger.debug("Evicted %s from the http cache", entry.url)
+
+    def response(self: Self, entry: CacheEntry) -> Response:
+        """
+        builds a 200 response reading the cached body from disk, the body is only read when it is used
+        so close the response or read its content
+        :param entry: cached entry
+        :return: Response
+        """
+        entry.used_at = time.time()
+        r = Response()
+        r.status_code = 200
+        r.url = entry.url
+        r.headers = CaseInsensitiveDict(entry.headers)
+        r.encoding = get_encoding_from_headers(r.headers)
+        r.raw = open(self.body_path(entry), "rb")
+        return r
+
+    def invalidate(self: Self, scope: str, url: str) -> None:
+        with self._lock:
+            entry = self._entries.pop(self._key(scope, url), None)
+            if entry is not None:
+                try:
+                    os.remove(self.body_path(entry))
+                except FileNotFoundError:
+                    pass
+                self._save_index()
+
+    def clear(self: Self) -> None:
+        with self._lock:
+            for entry in self._entries.values():
+                try:
+                    os.remove(self.body_path(entry))
+                except FileNotFoundError:
+                    pass
+            self._entries.clear()
+            self._save_index()
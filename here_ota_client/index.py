@@ -0,0 +1,161 @@
+from bisect import bisect_left, insort
+from threading import Lock
+from typing import Self
+from .api_errors import AmbiguousMatchError
+
+EXACT = "exact"
+PREFIX = "prefix"
+SUBSTRING = "substring"
+
+# ambiguous match policies
+FIRST = "first"
+UNIQUE = "unique"
+
+
+def _trigrams(value: str) -> set:
+    return {value[i:i + 3] for i in range(len(value) - 2)}
+
+
+def resolve_match(name: str, matches: list, policy=UNIQUE):
+    """
+    picks one item out of the matches for name without prompting
+    :param name: the name that was looked up
+    :param matches: list of matching items
+    :param policy: "first" returns the first match, "unique" raises AmbiguousMatchError when more than
+    one item matches, a callable is called with (name, matches) and returns the chosen item
+    :return: the chosen item
+    """
+    if callable(policy):
+        return policy(name, matches)
+    if policy == FIRST or len(matches) == 1:
+        return matches[0]
+    if policy == UNIQUE:
+        raise AmbiguousMatchError(f"{len(matches)} matches found for {name}")
+    raise ValueError(f"Unknown match policy: {policy}")
+
+
+class NameIndex:
+    """
+    in memory index of named items such as groups or updates. supports exact lookups through a dictionary,
+    prefix lookups through a sorted list of names and substring lookups through a trigram index,
+    so none of them scan every item. refresh only reads the items created after the newest indexed item
+    """
+
+    def __init__(self: Self, id_key: str, name_key: str) -> None:
+        """
+        :param id_key: key holding the unique id of an item, "id" for groups and "uuid" for updates
+        :param name_key: key holding the name of an item, "groupName" for groups and "name" for updates
+        """
+        self.id_key = id_key
+        self.name_key = name_key
+        self.watermark = None
+        self._items = {}
+        self._by_name = {}
+        self._sorted_names = []
+        self._trigrams = {}
+        self._lock = Lock()
+
+    def __len__(self: Self) -> int:
+        return len(self._items)
+
+    def __contains__(self: Self, item_id: str) -> bool:
+        return item_id in self._items
+
+    def add(self: Self, item: dict) -> None:
+        """
+        adds or replaces an item in the index
+        :param item: item dictionary as returned by the api
+        :return: void
+        """
+        item_id = item[self.id_key]
+        with self._lock:
+            if item_id in self._items:
+                self._remove(item_id)
+            name = item[self.name_key].strip()
+            self._items[item_id] = item
+            ids = self._by_name.setdefault(name, [])
+            if not ids:
+                insort(self._sorted_names, name)
+            ids.append(item_id)
+            for trigram in _trigrams(name):
+                self._trigrams.setdefault(trigram, set()).add(item_id)
+            created_at = item.get("createdAt")
+            if created_at is not None and (self.watermark is None or created_at > self.watermark):
+                self.watermark = created_at
+
+    def _remove(self: Self, item_id: str) -> None:
+        name = self._items.pop(item_id)[self.name_key].strip()
+        ids = self._by_name[name]
+        ids.remove(item_id)
+        if not ids:
+            del self._by_name[name]
+            del self._sorted_names[bisect_left(self._sorted_names, name)]
+        for trigram in _trigrams(name):
+            self._trigrams[trigram].discard(item_id)
+
+    def refresh(self: Self, items) -> int:
+        """
+        adds items from an iterator sorted newest first, stopping at the first item
+        that is not newer than the newest indexed item
+        :param items: iterable of item dictionaries sorted by createdAt descending
+        :return: amount of items added
+        """
+        watermark = self.watermark
+        added = 0
+        for item in items:
+            if watermark is not None and item.get("createdAt", watermark) <= watermark and item[self.id_key] in self:
+                break
+            self.add(item)
+            added += 1
+        return added
+
+    def exact(self: Self, name: str) -> list:
+        return [self._items[item_id] for item_id in self._by_name.get(name, ())]
+
+    def prefix(self: Self, prefix: str) -> list:
+        results = []
+        position = bisect_left(self._sorted_names, prefix)
+        while position < len(self._sorted_names) and self._sorted_names[position].startswith(prefix):
+            results.extend(self.exact(self._sorted_names[position]))
+            position += 1
+        return results
+
+    def substring(self: Self, value: str) -> list:
+        if len(value) < 3:
+            # too short for the trigram index
+            return [item for item in self._items.values() if value in item[self.name_key]]
+        trigrams = sorted(_trigrams(value), key=lambda trigram: len(self._trigrams.get(trigram, ())))
+        candidates = set(self._trigrams.get(trigrams[0], ()))
+        for trigram in trigrams[1:]:
+            if not candidates:
+                break
+            candidates &= self._trigrams.get(trigram, set())
+        items = [self._items[item_id] for item_id in candidates if value in self._items[item_id][self.name_key]]
+        return sorted(items, key=lambda item: item[self.name_key])
+
+    def lookup(self: Self, name: str, match: str = EXACT) -> list:
+        """
+        :param name: name, prefix or substring to look up
+        :param match: "exact", "prefix" or "substring"
+        :return: list of matching items
+        """
+        if match == EXACT:
+            return self.exact(name)
+        elif match == PREFIX:
+            return self.prefix(name)
+        elif match == SUBSTRING:
+            return self.substring(name)
+        raise ValueError(f"Unknown match type: {match}")
+
+    def resolve(self: Self, name: str, match: str = EXACT, policy=UNIQUE) -> dict or None:
+        """
+        looks up name and picks a single item with the policy, None is returned when nothing matches
+        :param name: name, prefix or substring to look up
+        :param match: "exact", "prefix" or "substring"
+        :param policy: "first", "unique" or a callable, see resolve_match
+        :return: item dictionary or None
+        """
+        matches = self.lookup(name, match)
+        if not matches:
+            return None
+        return resolve_match(name, matches, policy)
@@ -0,0 +1,224 @@
+import math
+import multiprocessing
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Self
+from Logger import set_up_logger
+from .metrics import RequestMetrics
+
+logger = set_up_logger(name="here-ota-jobs")
+
+RESULTS = "results"
+DONE = "done"
+FAILED = "failed"
+
+
+@dataclass
+class WorkerConfig:
+    """account, env and client options of one worker process"""
+    username: str
+    password: str
+    env: str = None
+    client_kwargs: dict = field(default_factory=dict)
+
+
+@dataclass
+class JobResult:
+    """outcome of one item of a job"""
+    item: object
+    ok: bool
+    value: object = None
+    error: str = None
+    worker: int = None
+
+
+def _run_worker(worker_id: int, config: WorkerConfig, task, threads: int, tasks, results) -> None:
+    """
+    entry point of a worker process. authenticates one client then takes chunks from its own task queue
+    until it gets None, each chunk is run on a thread pool and its results are put on the shared result queue
+    """
+    from .client import HereOtaClient
+
+    try:
+        client = HereOtaClient(config.username, config.password, **{"metrics": RequestMetrics(),
+                                                                     **config.client_kwargs})
+        if config.env:
+            client.change_env(config.env)
+    except Exception as e:
+        results.put((FAILED, worker_id, None, f"{type(e).__name__}: {e}"))
+        return
+
+    def run_item(item):
+        try:
+            return JobResult(item, True, task(client, item), worker=worker_id)
+        except Exception as e:
+            return JobResult(item, False, error=f"{type(e).__name__}: {e}", worker=worker_id)
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        while True:
+            message = tasks.get()
+            if message is None:
+                break
+            chunk_id, chunk = message
+            results.put((RESULTS, worker_id, chunk_id, list(executor.map(run_item, chunk))))
+    client.close()
+    results.put((DONE, worker_id, None, client.stats()))
+
+
+class FleetJobRunner:
+    """
+    shards a list of items such as device names across a pool of processes, each holding its own authenticated
+    client so responses are parsed on every core. workers can use different accounts or envs. every worker runs
+    threads_per_worker requests at a time, so the api concurrency is workers * threads_per_worker.
+
+    items are handed out in chunks with guided sizes, large while many items remain and shrinking towards the
+    end. a worker gets its next chunk once it returned the results of the previous one, so a slow worker takes
+    fewer chunks and the tail is spread over every worker. every chunk is tracked until its results arrive and
+    the chunk of a worker that dies or fails to sign in is handed to another worker. a chunk still running on a
+    slow but live worker is not run again elsewhere since tasks may not be idempotent. results are streamed back
+    as they complete and the request metrics of the workers are merged in stats
+
+    def audit(client, device_name):
+        return client.get_device_history(device_name)
+
+    runner = FleetJobRunner([WorkerConfig(username, password)] * 4)
+    for result in runner.run(audit, device_names):
+        ...
+    runner.stats
+
+    the task has to be a module level function so it can be sent to the worker processes
+    """
+
+    def __init__(self: Self, workers: list, threads_per_worker: int = 4, min_chunk: int = 1,
+                 start_method: str = "spawn") -> None:
+        """
+        :param workers: list of WorkerConfig, one process is started per config
+        :param threads_per_worker: concurrent requests of each worker
+        :param min_chunk: smallest amount of items handed out at once
+        :param start_method: multiprocessing start method, spawn is safe with the threads of the parent
+        """
+        if not workers:
+            raise ValueError("FleetJobRunner needs at least one worker")
+        self.workers = list(workers)
+        self.threads_per_worker = threads_per_worker
+        self.min_chunk = min_chunk
+        self.context = multiprocessing.get_context(start_method)
+        self.stats = None
+
+    def chunk_size(self: Self, remaining: int) -> int:
+        return max(self.min_chunk, math.ceil(remaining / (2 * len(self.workers))))
+
+    def run(self: Self, task, items):
+        """
+        runs task(client, item) for every item on the worker processes
+        :param task: module level function taking a HereOtaClient and an item
+        :param items: iterable of picklable items
+        :return: generator of JobResult in completion order, stats is set once it is exhausted
+        """
+        items = list(items)
+        tasks = {worker_id: self.context.Queue() for worker_id in range(len(self.workers))}
+        results = self.context.Queue()
+        processes = {
+            worker_id: self.context.Process(
+                target=_run_worker,
+                args=(worker_id, config, task, self.threads_per_worker, tasks[worker_id], results),
+                daemon=True,
+            )
+            for worker_id, config in enumerate(self.workers)
+        }
+        for process in processes.values():
+            process.start()
+
+        metrics = RequestMetrics()
+        cache = {}
+        worker_stats = {worker_id: {"items": 0, "chunks": 0, "error": None} for worker_id in processes}
+        # chunks not completed yet by chunk id, the chunk each worker was handed and the chunks to hand out again
+        chunks = {}
+        assigned = {}
+        requeued = []
+        next_item = 0
+        finished = set()
+        stopping = False
+        try:
+            def feed():
+                """hands a chunk to every live worker without one, requeued chunks first"""
+                nonlocal next_item
+                for worker_id in processes:
+                    if worker_id in finished or worker_id in assigned:
+                        continue
+                    if requeued:
+                        chunk_id = requeued.pop()
+                    elif next_item < len(items):
+                        size = self.chunk_size(len(items) - next_item)
+                        chunk_id = next_item
+                        chunks[chunk_id] = items[next_item:next_item + size]
+                        next_item += size
+                    else:
+                        return
+                    assigned[worker_id] = chunk_id
+                    tasks[worker_id].put((chunk_id, chunks[chunk_id]))
+
+            feed()
+            while len(finished) < len(processes):
+                if not chunks and next_item >= len(items) and not stopping:
+                    for worker_id in processes:
+                        if worker_id not in finished:
+                            tasks[worker_id].put(None)
+                    stopping = True
+                try:
+                    kind, worker_id, chunk_id, payload = results.get(timeout=0.5)
+                except queue.Empty:
+                    self._recover_dead_workers(processes, finished, assigned, chunks, requeued, worker_stats)
+                    if len(finished) == len(processes) and chunks:
+                        raise RuntimeError(f"Every worker failed: {worker_stats}")
+                    feed()
+                    continue
+                if kind == RESULTS:
+                    assigned.pop(worker_id, None)
+                    if chunks.pop(chunk_id, None) is None:
+                        continue  # a requeued chunk completed twice
+                    if chunk_id in requeued:
+                        requeued.remove(chunk_id)
+                    worker_stats[worker_id]["items"] += len(payload)
+                    worker_stats[worker_id]["chunks"] += 1
+                    feed()
+                    yield from payload
+                elif kind == DONE:
+                    finished.add(worker_id)
+                    metrics.merge(payload["endpoints"])
+                    for name, counts in payload["cache"].items():
+                        merged = cache.setdefault(name, {"hits": 0, "misses": 0})
+                        merged["hits"] += counts["hits"]
+                        merged["misses"] += counts["misses"]
+                elif kind == FAILED:
+                    finished.add(worker_id)
+                    worker_stats[worker_id]["error"] = payload
+                    logger.warning("Worker %s failed: %s", worker_id, payload)
+                    chunk_id = assigned.pop(worker_id, None)
+                    if chunk_id is not None:
+                        requeued.append(chunk_id)
+                    if len(finished) == len(processes) and chunks:
+                        raise RuntimeError(f"Every worker failed: {worker_stats}")
+                    feed()
+        finally:
+            for worker_id, process in processes.items():
+                if worker_id not in finished:
+                    # the generator was closed early
+                    process.terminate()
+                process.join()
+            self.stats = {"endpoints": metrics.stats(), "cache": cache, "workers": worker_stats}
+
+    @staticmethod
+    def _recover_dead_workers(processes: dict, finished: set, assigned: dict, chunks: dict, requeued: list,
+                              worker_stats: dict) -> None:
+        """queues the chunk handed to every worker that exited without finishing again, started or not"""
+        for worker_id, process in processes.items():
+            if worker_id in finished or process.is_alive():
+                continue
+            finished.add(worker_id)
+            worker_stats[worker_id]["error"] = f"exited with code {process.exitcode}"
+            chunk_id = assigned.pop(worker_id, None)
+            if chunk_id is not None and chunk_id in chunks:
+                logger.warning("Worker %s exited with code %s, queueing its chunk again", worker_id, process.exitcode)
+                requeued.append(chunk_id)
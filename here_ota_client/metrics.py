@@ -0,0 +1,235 @@
+import re
+from bisect import bisect_left
+from threading import Lock
+from typing import Self
+from urllib.parse import urlsplit
+from Logger import set_up_logger
+
+logger = set_up_logger(name="here-ota-metrics")
+
+# upper bounds in seconds of the latency histogram buckets
+latency_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+
+id_segment_pattern = re.compile(r"^([0-9a-fA-F-]{16,}|\d+|urn:.*)$")
+
+
+def endpoint_template(method: str, url: str) -> str:
+    """
+    reduces a url to its endpoint template so calls for different devices or groups are counted together,
+    GET https://connect.ota.here.com/api/v1/devices/<uuid>/events?... -> GET /api/v1/devices/{id}/events
+    :param method: http method
+    :param url: url as a string
+    :return: template string
+    """
+    segments = urlsplit(url).path.split("/")
+    for i, segment in enumerate(segments):
+        if id_segment_pattern.match(segment) or (i > 0 and segments[i - 1] == "organizations" and "|" in segment):
+            segments[i] = "{id}"
+    return f"{method.upper()} {'/'.join(segments) or '/'}"
+
+
+class EndpointStats:
+    __slots__ = ("count", "errors", "retries", "bytes", "latency_sum", "latency_max", "buckets")
+
+    def __init__(self: Self) -> None:
+        self.count = 0
+        self.errors = 0
+        self.retries = 0
+        self.bytes = 0
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self.buckets = [0] * len(latency_buckets)
+
+    def quantile(self: Self, q: float) -> float:
+        """
+        :param q: quantile between 0 and 1
+        :return: upper bound of the bucket holding the quantile
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(latency_buckets, self.buckets):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.latency_max)
+        return self.latency_max
+
+    def merge(self: Self, snapshot: dict) -> None:
+        """
+        adds a snapshot of another EndpointStats, such as one of another process
+        :param snapshot: dictionary returned by snapshot
+        :return: void
+        """
+        self.count += snapshot["count"]
+        self.errors += snapshot["errors"]
+        self.retries += snapshot["retries"]
+        self.bytes += snapshot["bytes"]
+        self.latency_sum += snapshot["latency_sum"]
+        self.latency_max = max(self.latency_max, snapshot["latency_max"])
+        for i, count in enumerate(snapshot["buckets"].values()):
+            self.buckets[i] += count
+
+    def snapshot(self: Self) -> dict:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "retries": self.retries,
+            "bytes": self.bytes,
+            "latency_sum": self.latency_sum,
+            "latency_max": self.latency_max,
+            "latency_p50": self.quantile(0.5),
+            "latency_p99": self.quantile(0.99),
+            "buckets": dict(zip(latency_buckets, self.buckets)),
+        }
+
+
+class RequestMetrics:
+    """
+    per endpoint template counts, errors, retries, response bytes and latency histograms of a client's requests.
+    a client only records when it was created with metrics, otherwise its request path skips this entirely
+
+    client = HereOtaClient(username, password, metrics=RequestMetrics(exporters=[LoggingExporter()]))
+    client.stats()
+    client.metrics.export()
+    """
+
+    def __init__(self: Self, exporters: list = None) -> None:
+        """
+        :param exporters: objects with an export(stats) method called by export
+        """
+        self.exporters = exporters or []
+        self._endpoints = {}
+        self._lock = Lock()
+
+    def _endpoint(self: Self, method: str, url: str) -> EndpointStats:
+        template = endpoint_template(method, url)
+        stats = self._endpoints.get(template)
+        if stats is None:
+            stats = self._endpoints.setdefault(template, EndpointStats())
+        return stats
+
+    def record(self: Self, method: str, url: str, status_code: int or None, elapsed: float, size: int = 0) -> None:
+        """
+        :param method: http method
+        :param url: url as a string
+        :param status_code: response status code or None when the request raised
+        :param elapsed: seconds the request took
+        :param size: response size in bytes
+        :return: void
+        """
+        with self._lock:
+            stats = self._endpoint(method, url)
+            stats.count += 1
+            if status_code is None or status_code >= 400:
+                stats.errors += 1
+            stats.bytes += size
+            stats.latency_sum += elapsed
+            stats.latency_max = max(stats.latency_max, elapsed)
+            stats.buckets[bisect_left(latency_buckets, elapsed)] += 1
+
+    def record_retry(self: Self, method: str, url: str) -> None:
+        with self._lock:
+            self._endpoint(method, url).retries += 1
+
+    def stats(self: Self) -> dict:
+        """
+        :return: dictionary of endpoint template to a snapshot of its stats
+        """
+        with self._lock:
+            return {template: stats.snapshot() for template, stats in self._endpoints.items()}
+
+    def merge(self: Self, endpoints: dict) -> None:
+        """
+        adds the endpoint snapshots of another client, such as client.stats()["endpoints"] of a worker process
+        :param endpoints: dictionary of endpoint template to snapshot
+        :return: void
+        """
+        with self._lock:
+            for template, snapshot in endpoints.items():
+                stats = self._endpoints.setdefault(template, EndpointStats())
+                stats.merge(snapshot)
+
+    def reset(self: Self) -> None:
+        with self._lock:
+            self._endpoints.clear()
+
+    def export(self: Self, stats: dict = None) -> None:
+        """
+        passes a stats snapshot to every exporter
+        :param stats: optional snapshot such as client.stats(), defaults to this object's stats
+        :return: void
+        """
+        stats = stats if stats is not None else {"endpoints": self.stats()}
+        for exporter in self.exporters:
+            exporter.export(stats)
+
+
+class LoggingExporter:
+    """logs one line per endpoint template"""
+
+    def __init__(self: Self, log=logger, level: int = 20) -> None:
+        self.log = log
+        self.level = level
+
+    def export(self: Self, stats: dict) -> None:
+        for template, endpoint in sorted(stats.get("endpoints", {}).items()):
+            self.log.log(
+                self.level, "%s count=%d errors=%d retries=%d bytes=%d p50=%.3fs p99=%.3fs",
+                template, endpoint["count"], endpoint["errors"], endpoint["retries"], endpoint["bytes"],
+                endpoint["latency_p50"], endpoint["latency_p99"],
+            )
+        for name, cache in sorted(stats.get("cache", {}).items()):
+            self.log.log(self.level, "cache %s hits=%d misses=%d", name, cache["hits"], cache["misses"])
+
+
+def prometheus_text(stats: dict, prefix: str = "here_ota_client") -> str:
+    """
+    formats a stats snapshot in the prometheus text exposition format
+    :param stats: snapshot such as client.stats()
+    :param prefix: metric name prefix
+    :return: string
+    """
+    def labels(template):
+        method, path = template.split(" ", 1)
+        return f'method="{method}",endpoint="{path}"'
+
+    lines = [
+        f"# TYPE {prefix}_requests_total counter",
+        f"# TYPE {prefix}_request_errors_total counter",
+        f"# TYPE {prefix}_request_retries_total counter",
+        f"# TYPE {prefix}_response_bytes_total counter",
+        f"# TYPE {prefix}_request_duration_seconds histogram",
+    ]
+    for template, endpoint in sorted(stats.get("endpoints", {}).items()):
+        label = labels(template)
+        lines.append(f"{prefix}_requests_total{{{label}}} {endpoint['count']}")
+        lines.append(f"{prefix}_request_errors_total{{{label}}} {endpoint['errors']}")
+        lines.append(f"{prefix}_request_retries_total{{{label}}} {endpoint['retries']}")
+        lines.append(f"{prefix}_response_bytes_total{{{label}}} {endpoint['bytes']}")
+        cumulative = 0
+        for bound, count in endpoint["buckets"].items():
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f'{prefix}_request_duration_seconds_bucket{{{label},le="{le}"}} {cumulative}')
+        lines.append(f"{prefix}_request_duration_seconds_sum{{{label}}} {endpoint['latency_sum']}")
+        lines.append(f"{prefix}_request_duration_seconds_count{{{label}}} {endpoint['count']}")
+    if stats.get("cache"):
+        lines.append(f"# TYPE {prefix}_cache_hits_total counter")
+        lines.append(f"# TYPE {prefix}_cache_misses_total counter")
+        for name, cache in sorted(stats["cache"].items()):
+            lines.append(f'{prefix}_cache_hits_total{{cache="{name}"}} {cache["hits"]}')
+            lines.append(f'{prefix}_cache_misses_total{{cache="{name}"}} {cache["misses"]}')
+    return "\n".join(lines) + "\n"
+
+
+class PrometheusExporter:
+    """writes the stats in the prometheus text format to a file, such as a node exporter textfile"""
+
+    def __init__(self: Self, path: str, prefix: str = "here_ota_client") -> None:
+        self.path = path
+        self.prefix = prefix
+
+    def export(self: Self, stats: dict) -> None:
+        with open(self.path, "w") as f:
+            f.write(prometheus_text(stats, self.prefix))
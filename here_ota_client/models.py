@@ -0,0 +1,290 @@
+import json
+import re
+import sys
+import time
+import uuid as uuid_lib
+from array import array
+from dataclasses import dataclass, fields
+from datetime import datetime, timezone
+from typing import ClassVar, Self
+
+timestamp_format = "%Y-%m-%dT%H:%M:%SZ"
+timestamp_pattern = re.compile(r"(\d{4})-(\d\d)-(\d\d)T(\d\d):(\d\d):(\d\d)Z")
+
+
+def _from_dict(cls, data: dict):
+    """
+    builds a model from an api dictionary, the mapped keys become slots and the other keys
+    are kept as a json string only decoded when raw is used. mapped keys missing from the
+    dictionary are None and listed next to the other keys as [extra, missing keys]
+    """
+    values = [data.get(key) for key in cls.keys]
+    for i in cls.interned:
+        if isinstance(values[i], str):
+            values[i] = sys.intern(values[i])
+    extra = {key: value for key, value in data.items() if key not in cls.key_set}
+    absent = [key for key in cls.keys if key not in data]
+    if absent:
+        return cls(*values, json.dumps([extra, absent], separators=(",", ":")))
+    return cls(*values, json.dumps(extra, separators=(",", ":")) if extra else None)
+
+
+def _raw(self) -> dict:
+    """
+    :return: the api dictionary the model was built from
+    """
+    data = {key: getattr(self, name) for key, name in zip(self.keys, self.names)}
+    if self.extra:
+        extra = json.loads(self.extra)
+        if isinstance(extra, list):
+            extra, absent = extra
+            for key in absent:
+                del data[key]
+        data.update(extra)
+    return data
+
+
+def model(cls):
+    """
+    turns a class with annotated fields into a frozen slotted dataclass with from_dict and raw,
+    keys holds the api key of every field, extra the json of the api keys without a field
+    and of the mapped keys the api dictionary did not have
+    """
+    cls.__annotations__["extra"] = str
+    cls.extra = None
+    cls = dataclass(frozen=True, slots=True)(cls)
+    cls.names = tuple(field.name for field in fields(cls) if field.name != "extra")
+    cls.key_set = frozenset(cls.keys)
+    cls.interned = tuple(cls.names.index(name) for name in getattr(cls, "categories", ()))
+    cls.from_dict = classmethod(_from_dict)
+    cls.raw = property(_raw)
+    return cls
+
+
+@model
+class Device:
+    keys: ClassVar[tuple] = ("uuid", "deviceName", "deviceId", "deviceType", "deviceStatus", "namespace",
+                             "lastSeen", "createdAt", "activatedAt")
+    categories: ClassVar[tuple] = ("device_type", "status", "namespace")
+    uuid: str
+    name: str
+    device_id: str
+    device_type: str
+    status: str
+    namespace: str
+    last_seen: str
+    created_at: str
+    activated_at: str
+
+
+@model
+class Group:
+    keys: ClassVar[tuple] = ("id", "groupName", "groupType", "namespace", "createdAt", "updatedAt", "expression")
+    categories: ClassVar[tuple] = ("group_type", "namespace")
+    id: str
+    name: str
+    group_type: str
+    namespace: str
+    created_at: str
+    updated_at: str
+    expression: str
+
+
+@model
+class Update:
+    keys: ClassVar[tuple] = ("uuid", "name", "description", "createdAt", "updatedAt")
+    uuid: str
+    name: str
+    description: str
+    created_at: str
+    updated_at: str
+
+
+@model
+class HistoryEntry:
+    keys: ClassVar[tuple] = ("deviceUuid", "correlationId", "success", "receivedAt")
+    device_uuid: str
+    correlation_id: str
+    success: bool
+    received_at: str
+
+    @property
+    def campaign_id(self: Self) -> str or None:
+        if self.correlation_id and self.correlation_id.startswith("urn:here-ota:campaign:"):
+            return self.correlation_id.rsplit(":", 1)[-1]
+        return None
+
+
+@model
+class Assignment:
+    keys: ClassVar[tuple] = ("correlationId", "deviceId", "inFlight")
+    correlation_id: str
+    device_id: str
+    in_flight: bool
+
+
+def from_page(cls, page: dict) -> list:
+    """
+    :param cls: model class
+    :param page: decoded page with a values list
+    :return: list of models
+    """
+    return [cls.from_dict(value) for value in page.get("values", [])]
+
+
+class _UuidColumn:
+    """uuids packed as 16 bytes each"""
+
+    def __init__(self: Self) -> None:
+        self._packed = bytearray()
+
+    def __len__(self: Self) -> int:
+        return len(self._packed) // 16
+
+    def append(self: Self, value: str) -> None:
+        if not isinstance(value, str):
+            raise ValueError(value)
+        # only uuids formatted back to the same string are packed, UUID also parses uppercase and braced forms
+        packed = uuid_lib.UUID(value)
+        if str(packed) != value:
+            raise ValueError(value)
+        self._packed += packed.bytes
+
+    def __getitem__(self: Self, index: int) -> str:
+        return str(uuid_lib.UUID(bytes=bytes(self._packed[index * 16:index * 16 + 16])))
+
+
+class _TimestampColumn:
+    """timestamps such as 2023-01-01T00:00:00Z packed as epoch seconds"""
+    missing = -2 ** 63
+
+    def __init__(self: Self) -> None:
+        self._seconds = array("q")
+
+    def __len__(self: Self) -> int:
+        return len(self._seconds)
+
+    def append(self: Self, value: str) -> None:
+        if value is None:
+            self._seconds.append(self.missing)
+            return
+        # only timestamps formatted back to the same string are packed, datetime rejects invalid dates
+        match = timestamp_pattern.fullmatch(value) if isinstance(value, str) else None
+        if match is None:
+            raise ValueError(value)
+        self._seconds.append(int(datetime(*map(int, match.groups()), tzinfo=timezone.utc).timestamp()))
+
+    def __getitem__(self: Self, index: int) -> str or None:
+        seconds = self._seconds[index]
+        return None if seconds == self.missing else time.strftime(timestamp_format, time.gmtime(seconds))
+
+
+class _CodedColumn:
+    """repeated values such as a status stored as codes into a list of the distinct values"""
+
+    def __init__(self: Self) -> None:
+        self.codes = array("H")
+        self.values = []
+        self._lookup = {}
+
+    def __len__(self: Self) -> int:
+        return len(self.codes)
+
+    def append(self: Self, value) -> None:
+        code = self._lookup.get(value)
+        if code is None:
+            if len(self.values) >= 2 ** 16:
+                raise ValueError(value)
+            code = self._lookup[value] = len(self.values)
+            self.values.append(value)
+        self.codes.append(code)
+
+    def __getitem__(self: Self, index: int):
+        return self.values[self.codes[index]]
+
+
+class ModelTable:
+    """
+    columnar container for large result sets such as the whole device inventory of an env. every field is a column,
+    uuids are packed as 16 bytes, timestamps as epoch seconds and repeated values such as the device type or status
+    as codes, so a row costs a fraction of a dictionary. a packed column holding a value it cannot pack falls back
+    to a list. rows are built as models only when accessed
+
+    table = ModelTable(Device, hotac.iter_devices())
+    table[0].name
+    table.column("status")
+    table.counts("status")
+    """
+
+    def __init__(self: Self, model_class, rows=()) -> None:
+        """
+        :param model_class: Device, Group, Update, HistoryEntry or Assignment
+        :param rows: iterable of api dictionaries or models
+        """
+        self.model_class = model_class
+        self._length = 0
+        self._names = model_class.names + ("extra",)
+        categories = getattr(model_class, "categories", ())
+        self._columns = {}
+        for name in self._names:
+            if name in ("uuid", "id", "device_uuid"):
+                self._columns[name] = _UuidColumn()
+            elif name.endswith("_at") or name == "last_seen":
+                self._columns[name] = _TimestampColumn()
+            elif name in categories:
+                self._columns[name] = _CodedColumn()
+            else:
+                self._columns[name] = []
+        self.extend(rows)
+
+    def __len__(self: Self) -> int:
+        return self._length
+
+    def append(self: Self, row: dict or object) -> None:
+        if isinstance(row, dict):
+            row = self.model_class.from_dict(row)
+        for name, column in self._columns.items():
+            value = getattr(row, name)
+            try:
+                column.append(value)
+            except ValueError:
+                self._columns[name] = [column[i] for i in range(len(column))] + [value]
+        self._length += 1
+
+    def extend(self: Self, rows) -> None:
+        for row in rows:
+            self.append(row)
+
+    def __getitem__(self: Self, index: int):
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("ModelTable index out of range")
+        return self.model_class(*(self._columns[name][index] for name in self._names))
+
+    def __iter__(self: Self):
+        return (self[i] for i in range(self._length))
+
+    def column(self: Self, name: str) -> list:
+        """
+        :param name: field name such as status
+        :return: list of the values of the field for every row
+        """
+        column = self._columns[name]
+        return list(column) if isinstance(column, list) else [column[i] for i in range(self._length)]
+
+    def counts(self: Self, name: str) -> dict:
+        """
+        :param name: field name of a repeated value such as status
+        :return: dictionary of value to the amount of rows with it
+        """
+        column = self._columns[name]
+        if isinstance(column, _CodedColumn):
+            counts = [0] * len(column.values)
+            for code in column.codes:
+                counts[code] += 1
+            return dict(zip(column.values, counts))
+        result = {}
+        for value in self.column(name):
+            result[value] = result.get(value, 0) + 1
+        return result
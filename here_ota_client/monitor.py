@@ -0,0 +1,176 @@
+import time
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Self
+from Logger import set_up_logger
+from .events import DeviceEvent
+
+logger = set_up_logger(name="here-ota-monitor")
+
+PENDING = "pending"
+DOWNLOADING = "downloading"
+INSTALLING = "installing"
+INSTALLED = "installed"
+FAILED = "failed"
+STATES = (PENDING, DOWNLOADING, INSTALLING, INSTALLED, FAILED)
+
+# campaign statuses after which nothing changes anymore
+finished_statuses = frozenset({"finished", "cancelled"})
+
+event_states = {
+    "EcuDownloadStarted": DOWNLOADING,
+    "EcuDownloadCompleted": DOWNLOADING,
+    "EcuInstallationStarted": INSTALLING,
+    "EcuInstallationCompleted": INSTALLED,
+}
+
+
+@dataclass
+class CampaignProgress:
+    """running counts of a campaign's devices per state and the rate of each state per minute"""
+    campaign_id: str
+    status: str = None
+    counts: dict = field(default_factory=lambda: dict.fromkeys(STATES, 0))
+    rates: dict = field(default_factory=lambda: dict.fromkeys(STATES, 0.0))
+    stats: dict = field(default_factory=dict)
+    updated_at: float = None
+
+    @property
+    def finished(self: Self) -> bool:
+        return self.status in finished_statuses
+
+
+class CampaignMonitor:
+    """
+    follows launched campaigns by polling the campaign stats endpoint and merging websocket device events.
+    polling starts every min_interval seconds and backs off up to max_interval while the stats do not change
+    or while the websocket events already report the progress
+
+    monitor = client.monitor_campaigns([campaign_id])
+    for progress in monitor.watch():
+        print(progress[campaign_id].counts)
+    """
+
+    def __init__(self: Self, client, campaign_ids: list, min_interval: float = 5, max_interval: float = 120,
+                 backoff: float = 2) -> None:
+        """
+        :param client: HereOtaClient used for the stats requests
+        :param campaign_ids: ids of the launched campaigns
+        :param min_interval: seconds between polls while a campaign is active
+        :param max_interval: maximum seconds between polls
+        :param backoff: factor the interval grows by after each poll without changes
+        """
+        self.client = client
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.interval = min_interval
+        self.progress = {campaign_id: CampaignProgress(campaign_id) for campaign_id in campaign_ids}
+        self.requests = 0
+        self._device_states = {campaign_id: {} for campaign_id in campaign_ids}
+        self._started_at = time.monotonic()
+        self._events_since_poll = 0
+        self._lock = Lock()
+
+    @property
+    def finished(self: Self) -> bool:
+        return all(progress.finished for progress in self.progress.values())
+
+    def handle_event(self: Self, event: DeviceEvent) -> None:
+        """
+        updates the state of the event's device when the event belongs to a monitored campaign
+        :param event: DeviceEvent from an EventStream
+        :return: void
+        """
+        device_states = self._device_states.get(event.campaign_id)
+        state = event_states.get(event.event_type)
+        if device_states is None or state is None or event.device_uuid is None:
+            return
+        if state == INSTALLED and event.raw is not None \
+                and event.raw["event"].get("payload", {}).get("success") is False:
+            state = FAILED
+        with self._lock:
+            device_states[event.device_uuid] = state
+            self._events_since_poll += 1
+            self._update_counts(self.progress[event.campaign_id])
+
+    async def consume(self: Self, subscription) -> None:
+        """
+        feeds the events of an EventStream subscription to the monitor until every campaign is finished
+        :param subscription: Subscription, see EventStream.subscribe
+        :return: void
+        """
+        async for event in subscription:
+            self.handle_event(event)
+            if self.finished:
+                return
+
+    def _update_counts(self: Self, progress: CampaignProgress) -> None:
+        """
+        merges the server stats with the device states collected from events, the server stats
+        are authoritative for finished and failed devices, events fill in devices still in progress
+        """
+        event_counts = dict.fromkeys(STATES, 0)
+        for state in self._device_states[progress.campaign_id].values():
+            event_counts[state] += 1
+        stats = progress.stats
+        failed = max(event_counts[FAILED], stats.get("failed", 0))
+        installed = max(event_counts[INSTALLED], stats.get("finished", 0) - stats.get("failed", 0))
+        affected = max(stats.get("affected", 0), sum(event_counts.values()))
+        counts = {
+            DOWNLOADING: event_counts[DOWNLOADING],
+            INSTALLING: event_counts[INSTALLING],
+            INSTALLED: installed,
+            FAILED: failed,
+        }
+        counts[PENDING] = max(0, affected - sum(counts.values()))
+        minutes = max(time.monotonic() - self._started_at, 1e-9) / 60
+        progress.counts = {state: counts[state] for state in STATES}
+        progress.rates = {state: counts[state] / minutes for state in STATES}
+        progress.updated_at = time.time()
+
+    def poll(self: Self) -> dict:
+        """
+        requests the stats of every unfinished campaign and adapts the polling interval
+        :return: dictionary of campaign id to CampaignProgress
+        """
+        changed = False
+        for campaign_id, progress in self.progress.items():
+            if progress.finished:
+                continue
+            stats = self.client.get_campaign_stats(campaign_id)
+            self.requests += 1
+            with self._lock:
+                if stats != progress.stats:
+                    changed = True
+                progress.stats = stats
+                progress.status = stats.get("status", progress.status)
+                self._update_counts(progress)
+        with self._lock:
+            events_seen = self._events_since_poll
+            self._events_since_poll = 0
+        if changed and not events_seen:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * self.backoff, self.max_interval)
+        logger.debug("Polled %s campaigns, next poll in %ss", len(self.progress), self.interval)
+        return self.progress
+
+    def watch(self: Self, timeout: float = None):
+        """
+        polls until every campaign is finished or the timeout passes, sleeping the adaptive interval between polls
+        :param timeout: optional seconds to watch for
+        :return: generator of dictionaries of campaign id to CampaignProgress
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            yield self.poll()
+            if self.finished:
+                return
+            delay = self.interval
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                delay = min(delay, remaining)
+            time.sleep(delay)
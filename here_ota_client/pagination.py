@@ -0,0 +1,74 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+
+
+def _has_next_page(page: dict, values: list, offset: int, page_size: int) -> bool:
+    """
+    decides if another page should be requested using the total when the endpoint returns one
+    :param page: the decoded response of the last page
+    :param values: the values of the last page
+    :param offset: offset of the next page
+    :param page_size: requested page size
+    :return: bool
+    """
+    if not values:
+        return False
+    total = page.get("total")
+    if total is not None:
+        return offset < total
+    return len(values) >= page_size
+
+
+def iter_pages(fetch_page, page_size: int = 100, prefetch: bool = True):
+    """
+    lazily yields every value of a paginated endpoint. the next page is requested on a
+    background thread while the caller consumes the current one so at most two pages are held in memory.
+    the page requests run in a copy of the caller's context so an env scoped with use_env still applies
+    :param fetch_page: function taking (limit, offset) and returning the decoded page with a values list
+    :param page_size: amount of values requested per page
+    :param prefetch: if False the next page is only requested once the caller reaches it, for callers
+    such as an index refresh that usually stop within the first page
+    :return: generator of values
+    """
+    if not prefetch:
+        offset = 0
+        while True:
+            page = fetch_page(page_size, offset)
+            values = page.get("values", [])
+            offset += len(values)
+            yield from values
+            if not _has_next_page(page, values, offset, page_size):
+                return
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        offset = 0
+        future = executor.submit(copy_context().run, fetch_page, page_size, offset)
+        while future is not None:
+            page = future.result()
+            values = page.get("values", [])
+            offset += len(values)
+            future = executor.submit(copy_context().run, fetch_page, page_size, offset) \
+                if _has_next_page(page, values, offset, page_size) else None
+            yield from values
+
+
+async def aiter_pages(fetch_page, page_size: int = 100):
+    """
+    asyncio version of iter_pages, the next page is requested in a task while the current one is consumed
+    :param fetch_page: coroutine function taking (limit, offset) and returning the decoded page
+    :param page_size: amount of values requested per page
+    :return: async generator of values
+    """
+    offset = 0
+    task = asyncio.ensure_future(fetch_page(page_size, offset))
+    try:
+        while task is not None:
+            page = await task
+            values = page.get("values", [])
+            offset += len(values)
+            task = asyncio.ensure_future(fetch_page(page_size, offset)) if _has_next_page(page, values, offset, page_size) else None
+            for value in values:
+                yield value
+    finally:
+        if task is not None:
+            task.cancel()
@@ -0,0 +1,129 @@
+import math
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextvars import copy_context
+from threading import Lock
+from typing import Self
+
+
+class SingleFlight:
+    """
+    coalesces identical calls in flight at the same time, the first caller of a key runs the call
+    and every concurrent caller of the same key waits for and shares its result or exception
+    """
+
+    def __init__(self: Self) -> None:
+        self.coalesced = 0
+        self._calls = {}
+        self._lock = Lock()
+
+    def do(self: Self, key, func, *args):
+        """
+        :param key: hashable key identifying the call
+        :param func: function to call
+        :param args: arguments of func
+        :return: the result of func
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result()
+        try:
+            result = func(*args)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+def exact_match(device_name: str, values: list) -> dict or None:
+    """
+    :param device_name: device name
+    :param values: devices of a nameContains search
+    :return: the device named exactly device_name, None if the search only had substring hits
+    """
+    return next((device for device in values if device.get("deviceName") == device_name), None)
+
+
+class DeviceResolver:
+    """
+    resolves many device names with few searches. the sorted names are clustered by their common prefix and
+    every cluster is listed with one nameContains search of the prefix, paged when needed. when the first page
+    shows the prefix matches more pages of devices than the cluster has names, the cluster is split on the
+    next character, down to single names searched on their own. only exact name matches are returned
+    """
+
+    def __init__(self: Self, client, page_size: int = 100, min_prefix: int = 3, max_workers: int = 8) -> None:
+        """
+        :param client: HereOtaClient
+        :param page_size: amount of devices requested per page of a prefix listing
+        :param min_prefix: shortest prefix listed, shorter clusters are split
+        :param max_workers: maximum amount of concurrent searches
+        """
+        self.client = client
+        self.page_size = page_size
+        self.min_prefix = min_prefix
+        self.max_workers = max_workers
+
+    def resolve(self: Self, device_names) -> dict:
+        """
+        :param device_names: iterable of device names
+        :return: dictionary of device name to its device dictionary, None when no device has exactly that name
+        """
+        names = sorted(set(device_names))
+        results = dict.fromkeys(names)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = [executor.submit(copy_context().run, self._resolve_cluster, names)] if names else []
+            while pending:
+                found, clusters = pending.pop().result()
+                results.update(found)
+                pending.extend(executor.submit(copy_context().run, self._resolve_cluster, cluster)
+                               for cluster in clusters)
+        return results
+
+    def _resolve_cluster(self: Self, names: list) -> tuple:
+        """
+        :param names: sorted device names sharing a prefix
+        :return: (dictionary of the names resolved, list of clusters to resolve next)
+        """
+        if len(names) == 1:
+            return {names[0]: exact_match(names[0], self.client.search_devices(names[0])["values"])}, []
+        prefix = os.path.commonprefix(names)
+        if len(prefix) < self.min_prefix:
+            return {}, self._split(names, prefix)
+        page = self.client.search_devices(prefix, limit=self.page_size)
+        values = page["values"]
+        total = page.get("total", len(values))
+        pages = math.ceil(total / self.page_size)
+        wanted = set(names)
+        found = {device["deviceName"]: device for device in values if device.get("deviceName") in wanted}
+        if pages > len(names) and len(found) < len(names):
+            return found, self._split([name for name in names if name not in found], prefix)
+        for offset in range(self.page_size, total, self.page_size):
+            if len(found) == len(names):
+                break
+            found.update((device["deviceName"], device) for device in
+                         self.client.search_devices(prefix, self.page_size, offset)["values"]
+                         if device.get("deviceName") in wanted)
+        return found, []
+
+    @staticmethod
+    def _split(names: list, prefix: str) -> list:
+        """splits sorted names on the character following their common prefix"""
+        clusters = {}
+        for name in names:
+            clusters.setdefault(name[len(prefix):len(prefix) + 1], []).append(name)
+        if len(clusters) == 1:
+            # the names left share a longer prefix, listing it is narrower
+            return [names]
+        return list(clusters.values())
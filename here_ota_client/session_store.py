@@ -0,0 +1,81 @@
+import json
+import os
+from typing import Self
+
+
+class SessionStore:
+    """
+    json file holding the authenticated state of a HereOtaClient (cookies, csrf token, access token,
+    envs and websocket url) so a new client can reuse it without authenticating again.
+    the file contains session secrets so it is created readable by the owner only
+    """
+
+    def __init__(self: Self, path: str) -> None:
+        """
+        :param path: path of the json file
+        """
+        self.path = os.path.expanduser(path)
+
+    def load(self: Self, username: str) -> dict or None:
+        """
+        returns the stored state for username or None when there is none
+        :param username: here account username the state was saved for
+        :return: dictionary or None
+        """
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path) as f:
+            try:
+                state = json.load(f)
+            except ValueError:
+                return None
+        if state.get("username") != username:
+            return None
+        return state
+
+    def save(self: Self, state: dict) -> None:
+        """
+        writes the state to the json file replacing the previous one
+        :param state: dictionary of the client state
+        :return: void
+        """
+        tmp_path = self.path + ".tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self: Self) -> None:
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def dump_cookies(cookie_jar) -> list:
+    """
+    :param cookie_jar: requests cookie jar
+    :return: list of cookie dictionaries that can be stored as json
+    """
+    return [
+        {
+            "name": cookie.name,
+            "value": cookie.value,
+            "domain": cookie.domain,
+            "path": cookie.path,
+            "expires": cookie.expires,
+            "secure": cookie.secure,
+        }
+        for cookie in cookie_jar
+    ]
+
+
+def load_cookies(cookie_jar, cookies: list) -> None:
+    """
+    :param cookie_jar: requests cookie jar to add the cookies to
+    :param cookies: list of cookie dictionaries from dump_cookies
+    :return: void
+    """
+    for cookie in cookies:
+        cookie_jar.set(
+            cookie["name"], cookie["value"],
+            domain=cookie["domain"], path=cookie["path"], expires=cookie["expires"], secure=cookie["secure"]
+        )
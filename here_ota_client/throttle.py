@@ -0,0 +1,128 @@
+import random
+import time
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from threading import Lock
+from typing import Self
+from urllib.parse import urlsplit
+
+idempotent_methods = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+
+def endpoint_family(url: str) -> str:
+    """
+    groups urls by the resource they hit, /api/v1/devices/<uuid>/events -> devices,
+    /api/v2/campaigns -> campaigns, /user/organizations -> user
+    :param url: url as a string
+    :return: family name
+    """
+    segments = [segment for segment in urlsplit(url).path.split("/") if segment]
+    if len(segments) >= 3 and segments[0] == "api":
+        return segments[2]
+    return segments[0] if segments else "root"
+
+
+class TokenBucket:
+    """thread safe token bucket refilled at rate tokens per second up to burst tokens"""
+
+    def __init__(self: Self, rate: float, burst: int = None) -> None:
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1, int(rate))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = Lock()
+
+    def acquire(self: Self) -> float:
+        """
+        takes a token, sleeping until one is available
+        :return: seconds waited
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+        return wait
+
+
+@dataclass
+class RetryPolicy:
+    """
+    retries 429 responses for every method and 5xx responses and connection errors for idempotent methods,
+    waiting a jittered exponential backoff or the Retry-After header when the server sends one
+    """
+    retries: int = 3
+    backoff: float = 0.5
+    max_backoff: float = 30
+    statuses: frozenset = frozenset({429, 500, 502, 503, 504})
+
+    def should_retry(self: Self, method: str, status_code: int or None, attempt: int) -> bool:
+        """
+        :param method: http method
+        :param status_code: response status code or None when the request raised a connection error
+        :param attempt: number of retries already made
+        :return: bool
+        """
+        if attempt >= self.retries:
+            return False
+        if status_code == 429:
+            return True
+        if status_code is None or status_code in self.statuses:
+            return method.upper() in idempotent_methods
+        return False
+
+    def delay(self: Self, attempt: int, retry_after: str = None) -> float:
+        """
+        :param attempt: number of retries already made
+        :param retry_after: value of the Retry-After header if any
+        :return: seconds to wait before the next attempt
+        """
+        if retry_after:
+            seconds = parse_retry_after(retry_after)
+            if seconds is not None:
+                return min(seconds, self.max_backoff)
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+
+def parse_retry_after(value: str) -> float or None:
+    """
+    :param value: Retry-After header as delay seconds or an http date
+    :return: seconds or None if the value can not be parsed
+    """
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass
+class RequestPolicy:
+    """
+    request layer settings of a HereOtaClient
+
+    rate_limits maps an endpoint family (see endpoint_family) to (requests per second, burst),
+    the "default" entry applies to every family not listed, families without a limit are not throttled
+
+    RequestPolicy(rate_limits={"devices": (20, 40), "default": (10, 10)}, pool_maxsize=32)
+    """
+    retry: RetryPolicy = field(default_factory=RetryPolicy)
+    rate_limits: dict = field(default_factory=dict)
+    pool_connections: int = 10
+    pool_maxsize: int = 10
+
+    def __post_init__(self: Self) -> None:
+        self._buckets = {family: TokenBucket(*limit) for family, limit in self.rate_limits.items()}
+
+    def bucket(self: Self, url: str) -> TokenBucket or None:
+        """
+        :param url: url as a string
+        :return: the TokenBucket of the url's endpoint family or None when it is not rate limited
+        """
+        return self._buckets.get(endpoint_family(url), self._buckets.get("default"))
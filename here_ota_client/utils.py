@@ -1,6 +1,13 @@
 import re
 import json
 
+csrf_token1_pattern = re.compile(r'csrf:[\s]*[\'"](.*)?[\'"],')
+csrf_token2_pattern = re.compile(r'id="csrf-token-val" value="(.*)"')
+client_id_pattern = re.compile(r"client-id=(.*?)&")
+websocket_addr_pattern = re.compile('id="ws-url" value="(.*)?"')
+event_occurred_pattern = re.compile(r"{.id.:[\"'](.*?)[\"'],")
+correlation_id_pattern = re.compile(r"correlationId.*:[\"''](.*)[\"'],")
+
 
 def is_device_event(message) -> bool or tuple:
     """
@@ -9,6 +16,9 @@ def is_device_event(message) -> bool or tuple:
     :param message: string websocket response
     :return: campaign correlation id and event occurred value
     """
+    # cheaply reject other message types before parsing
+    if "DeviceEventMessage" not in message:
+        return False
     # load message into python dict and check for DeviceEventMessage
     data = json.loads(message)
     data_type = data.get("type", False)
@@ -21,19 +31,19 @@ def is_device_event(message) -> bool or tuple:
 
 
 def get_here_ota_token1(string):
-    return re.search(r'csrf:[\s]*[\'"](.*)?[\'"],', string).groups()[0]
+    return csrf_token1_pattern.search(string).groups()[0]
 
 
 def get_here_ota_token2(string):
-    return re.search(r'id="csrf-token-val" value="(.*)"', string).groups()[0]
+    return csrf_token2_pattern.search(string).groups()[0]
 
 
 def get_here_ota_client_id(string):
-    return re.search(r"client-id=(.*?)&", string).groups()[0]
+    return client_id_pattern.search(string).groups()[0]
 
 
 def get_here_ota_websocket_addr(string):
-    return re.search('id="ws-url" value="(.*)?"', string).groups()[0]
+    return websocket_addr_pattern.search(string).groups()[0]
 
 
 def set_token_and_websocket(api_client, data):
@@ -41,7 +51,7 @@ def set_token_and_websocket(api_client, data):
     pass
 
 def collect_event_occurred_and_correlation_id(message):
-    event = re.search(r"{.id.:[\"'](.*?)[\"'],", message).groups()[0]
-    correlation = re.search(r"correlationId.*:[\"''](.*)[\"'],", message).groups()[0]
+    event = event_occurred_pattern.search(message).groups()[0]
+    correlation = correlation_id_pattern.search(message).groups()[0]
     return event, correlation
 
@@ -1,7 +1,712 @@
+import asyncio
+import csv
+import json
+import logging
+import os
 import pytest
 import getpass
-from here_ota_client import HereOtaClient
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import formatdate
+from requests import HTTPError
+from Logger import configure_logging, set_up_logger
+from here_ota_client import HereOtaClient, AsyncHereOtaClient
+from here_ota_client.api_errors import AmbiguousMatchError, DeviceNotFoundError, GroupNotFoundError
+from here_ota_client.cache import DeviceUuidCache
+from here_ota_client.catalog import version_key
+from here_ota_client.events import decode_device_event, decode_device_events
+from here_ota_client.export import FleetExporter
+from here_ota_client import index
+from here_ota_client.client import here_ota_software_versions
+from here_ota_client.http_cache import HttpCache
+from here_ota_client.history_store import HistoryStore
+from here_ota_client.jobs import FleetJobRunner, WorkerConfig
+from here_ota_client.models import Device, HistoryEntry, ModelTable
+from here_ota_client.metrics import RequestMetrics, prometheus_text
+from here_ota_client.session_store import SessionStore
+from here_ota_client.monitor import DOWNLOADING, FAILED, INSTALLED, INSTALLING, PENDING
+from here_ota_client.throttle import RequestPolicy, RetryPolicy, TokenBucket, parse_retry_after
+from benchmarks.stand_in_server import StandInServer, StandInConfig
 
+search_route = "GET /api/v1/devices"
 
 
+@pytest.fixture(scope="module")
+def server():
+    with StandInServer(StandInConfig(fleet_size=600, groups=2)) as server:
+        yield server
 
+
+@pytest.fixture
+def client(server):
+    client = HereOtaClient(server.config.username, server.config.password, base_url=server.url,
+                           account_url=server.url)
+    yield client
+    client.close()
+
+
+def test_authenticate(client):
+    assert client.current_env == "default"
+    assert client.list_envs == {"default": "auth0|default", "staging": "auth0|staging"}
+    assert client.websocket_url.endswith("/ws")
+
+
+def test_get_device_uuid_is_cached(server, client):
+    searches = server.state.requests[search_route]
+    uuid = client.get_device_uuid("default-000010")
+    assert client.get_device_history("default-000010")["values"][0]["deviceUuid"] == uuid
+    assert client.get_device_network("default-000010")["hostname"] == "default-000010"
+    assert server.state.requests[search_route] == searches + 1
+
+
+def test_get_device_uuid_caches_only_exact_matches(server, client):
+    # default-00001 is only a substring of default-000010 to default-000019
+    cached = len(client.device_cache)
+    with pytest.raises(DeviceNotFoundError):
+        client.get_device_uuid("default-00001")
+    assert len(client.device_cache) == cached
+
+    async def run():
+        async with AsyncHereOtaClient(server.config.username, server.config.password, base_url=server.url,
+                                      account_url=server.url) as async_client:
+            with pytest.raises(DeviceNotFoundError):
+                await async_client.get_device_uuid("default-00001")
+            return len(async_client.device_cache)
+
+    assert asyncio.run(run()) == 0
+
+
+def test_device_uuid_cache_expiry_eviction_and_persistence(server, tmp_path):
+    def make_client(cache):
+        return HereOtaClient(server.config.username, server.config.password, base_url=server.url,
+                             account_url=server.url, device_cache=cache)
+
+    client = make_client(DeviceUuidCache(ttl=0.05))
+    searches = server.state.requests[search_route]
+    client.get_device_uuid("default-000030")
+    client.get_device_uuid("default-000030")
+    time.sleep(0.1)
+    client.get_device_uuid("default-000030")
+    assert server.state.requests[search_route] == searches + 2
+    client.close()
+
+    path = str(tmp_path / "uuids.json")
+    client = make_client(DeviceUuidCache(max_size=2, path=path))
+    uuids = {name: client.get_device_uuid(name) for name in ("default-000031", "default-000032", "default-000033")}
+    searches = server.state.requests[search_route]
+    # default-000031 was the least recently used entry
+    client.get_device_uuid("default-000033")
+    assert server.state.requests[search_route] == searches
+    client.get_device_uuid("default-000031")
+    assert server.state.requests[search_route] == searches + 1
+    client.close()
+
+    # closing the client saved the cache, a new client starts with the two most recent entries
+    client = make_client(DeviceUuidCache(max_size=2, path=path))
+    assert len(client.device_cache) == 2
+    assert client.get_device_uuid("default-000031") == uuids["default-000031"]
+    assert client.get_device_uuid("default-000033") == uuids["default-000033"]
+    assert server.state.requests[search_route] == searches + 1
+    client.close()
+
+
+def test_stale_cached_uuid_is_invalidated_and_retried_once(server, client):
+    history_route = "GET /api/v1/devices/{uuid}/installation_history"
+    uuid = client.get_device_uuid("default-000040", use_cache=False)
+    client.device_cache.set(client.current_env, "default-000040", "00000000-0000-0000-0000-000000000000")
+    searches, histories = server.state.requests[search_route], server.state.requests[history_route]
+    assert client.get_device_history("default-000040")["values"][0]["deviceUuid"] == uuid
+    assert server.state.requests[search_route] == searches + 1
+    assert server.state.requests[history_route] == histories + 2
+    assert client.device_cache.get(client.current_env, "default-000040") == uuid
+
+
+def test_iter_group_devices_pages_past_first_page(client):
+    group_id = client.resolve_group("default-group-0000")["id"]
+    devices = list(client.iter_group_devices(group_id, page_size=100))
+    assert len(devices) == 300
+    assert len({device["uuid"] for device in devices}) == 300
+
+
+def test_find_envs_for_device_names(client):
+    results = client.find_envs_for_device_names(["staging-000001", "default-000002", "missing"])
+    assert results == {"staging-000001": ["staging"], "default-000002": ["default"], "missing": []}
+    assert client.current_env == "default"
+    # default-00001 is only a substring of default-000010 to default-000019
+    assert client.find_envs_for_device_names(["default-00001"]) == {"default-00001": []}
+    assert client.device_cache.get("default", "default-00001") is None
+
+
+def test_add_devices_to_group_reports_per_device(client):
+    group_id = client.create_static_group("test-bulk")
+    report = client.add_devices_to_group("test-bulk", ["default-000001", "missing"], group_id=group_id)
+    assert report.succeeded == ["default-000001"]
+    assert report.failed == ["missing"]
+    assert [device["deviceName"] for device in client.iter_group_devices(group_id)] == ["default-000001"]
+
+
+def test_add_devices_to_group_resolves_uuids_in_batch(server, client):
+    device_names = [f"default-{i:06d}" for i in range(200, 260)]
+    group_id = client.create_static_group("test-bulk-batch")
+    searches = server.state.requests[search_route]
+    report = client.add_devices_to_group(None, device_names + ["missing"], group_id=group_id)
+    assert len(report.succeeded) == len(device_names) and report.failed == ["missing"]
+    assert server.state.requests[search_route] - searches < 10
+
+
+def test_reauthenticates_after_session_expiry(server, client):
+    server.call(server.state.expire_sessions)
+    assert client.get_device_info("default-000003")["values"][0]["deviceName"] == "default-000003"
+
+
+def test_concurrent_requests_share_one_reauthentication(server, client):
+    device_names = [f"default-{i:06d}" for i in range(40, 60)]
+    client.resolve_devices(device_names)
+    group_id = client.create_static_group("test-expiry")
+    sign_ins = server.state.requests["POST /api/account/sign-in-with-password"]
+    server.call(server.state.expire_sessions)
+    report = client.add_devices_to_group(None, device_names, group_id=group_id, max_workers=8)
+    assert report.failed == [] and len(report.succeeded) == len(device_names)
+    assert server.state.requests["POST /api/account/sign-in-with-password"] == sign_ins + 1
+    server.call(server.state.expire_sessions)
+    assert client.find_envs_for_device_names(["staging-000004", "default-000004"]) == \
+        {"staging-000004": ["staging"], "default-000004": ["default"]}
+
+
+def test_async_client_get_device_history(server):
+    async def run():
+        async with AsyncHereOtaClient(server.config.username, server.config.password, base_url=server.url,
+                                      account_url=server.url) as client:
+            histories = await asyncio.gather(*(client.get_device_history(f"default-{i:06d}") for i in range(10)))
+            return histories, await client.find_envs_for_device_names(["default-00001", "staging-000001"])
+
+    histories, envs = asyncio.run(run())
+    assert [len(history["values"]) for history in histories] == [10] * 10
+    assert envs == {"default-00001": [], "staging-000001": ["staging"]}
+
+
+def test_async_client_env_argument_does_not_switch(server):
+    async def run():
+        async with AsyncHereOtaClient(server.config.username, server.config.password, base_url=server.url,
+                                      account_url=server.url) as client:
+            results = await asyncio.gather(
+                client.get_device_info("staging-000001", env="staging"),
+                client.get_device_history("default-000001"),
+                client.get_device_network("staging-000002", env="staging"),
+            )
+            return results, client.current_env
+
+    (info, history, network), current_env = asyncio.run(run())
+    assert info["values"][0]["deviceName"] == "staging-000001"
+    assert len(history["values"]) == 10 and network["hostname"] == "staging-000002"
+    assert current_env == "default"
+
+
+def test_async_client_finds_groups_and_updates_without_prompting(server):
+    async def run():
+        async with AsyncHereOtaClient(server.config.username, server.config.password, base_url=server.url,
+                                      account_url=server.url) as client:
+            update = await anext(client.iter_updates())
+            with pytest.raises(AmbiguousMatchError):
+                await client.find_group_by_name("default-group")
+            with pytest.raises(GroupNotFoundError):
+                await client.find_group_id_by_name("default-group")
+            # an empty group so the campaign adds no history to the devices other tests read
+            launch_group_id = await client.create_static_group("test-async-launch")
+            launched = await client.launch_campaign_on_group_by_name("test-async-launch", "test-async-launch",
+                                                                     update["name"])
+            return (await client.find_group_by_name("default-group", policy="first"),
+                    await client.find_group_by_name("default-group-0001"),
+                    await client.find_group_id_by_name("default-group-0001"),
+                    update, await client.find_here_ota_campaign_id_by_name(update["name"]), launched.status,
+                    launch_group_id)
+
+    first, group_id, exact_group_id, update, update_id, launch_status, launch_group_id = asyncio.run(run())
+    assert first and group_id == exact_group_id and update_id == update["uuid"]
+    # the campaign requests carry the Host and Origin of the api like the sync client
+    assert launch_status == 200
+    campaigns = server.state.envs["default"].campaigns.values()
+    assert any(campaign["name"] == "test-async-launch" and campaign["groups"] == [launch_group_id]
+               for campaign in campaigns)
+
+
+def test_stats_per_endpoint_template(server):
+    client = HereOtaClient(server.config.username, server.config.password, base_url=server.url,
+                           account_url=server.url, metrics=RequestMetrics())
+    client.get_device_history("default-000004")
+    client.get_device_history("default-000005")
+    client.get_device_uuid("default-000004")
+    stats = client.stats()
+    assert stats["endpoints"]["GET /api/v1/devices/{id}/installation_history"]["count"] == 2
+    assert stats["cache"]["device_uuid"] == {"hits": 1, "misses": 2}
+    assert 'endpoint="/api/v1/devices/{id}/installation_history"' in prometheus_text(stats)
+    client.close()
+
+
+def test_cached_get_revalidates_per_env(server, tmp_path):
+    client = HereOtaClient(server.config.username, server.config.password, base_url=server.url,
+                           account_url=server.url, http_cache=HttpCache(str(tmp_path)))
+    with client.cached_get(here_ota_software_versions) as r:
+        targets = r.json()["signed"]["targets"]
+    with client.cached_get(here_ota_software_versions) as r:
+        assert r.json()["signed"]["targets"] == targets
+    assert (client.http_cache.misses, client.http_cache.revalidated) == (1, 1)
+    client.change_env("staging")
+    with client.cached_get(here_ota_software_versions) as r:
+        assert r.json()["signed"]["targets"] != targets
+    assert client.http_cache.misses == 2
+    client.close()
+
+
+def test_software_catalog_latest_per_hardware(client):
+    catalog = client.software_catalog()
+    assert len(catalog) == StandInConfig.targets
+    latest = catalog.latest("hw-01")
+    assert "hw-01" in latest.hardware_ids
+    assert latest.version == max((target.version for target in catalog.for_hardware("hw-01")), key=version_key)
+    assert catalog.find(latest.name, latest.version) is latest
+
+
+def test_use_env_scopes_requests_without_switching(server, client):
+    client.change_env("staging")
+    client.change_env("default")
+    index_pages = server.state.requests["GET /organizations/{namespace}/index"]
+    client.change_env("staging")
+    client.change_env("default")
+    assert server.state.requests["GET /organizations/{namespace}/index"] == index_pages
+    with client.use_env("staging"):
+        assert client.current_env == "staging"
+        assert client.get_device_history("staging-000002")["values"][0]["deviceUuid"] == \
+            client.get_device_uuid("staging-000002")
+    assert client.current_env == "default"
+    assert client.get_device_network("staging-000003", env="staging")["hostname"] == "staging-000003"
+
+
+def history_length(client, device_name):
+    return len(client.get_device_history(device_name)["values"])
+
+
+def test_fleet_job_runner_merges_worker_results(server):
+    config = WorkerConfig(server.config.username, server.config.password,
+                          client_kwargs={"base_url": server.url, "account_url": server.url})
+    runner = FleetJobRunner([config, config], threads_per_worker=2)
+    device_names = [f"default-{i:06d}" for i in range(40)] + ["missing"]
+    results = {result.item: result for result in runner.run(history_length, device_names)}
+    assert len(results) == 41
+    assert all(results[device_name].value == 10 for device_name in device_names[:-1])
+    assert not results["missing"].ok
+    assert runner.stats["endpoints"]["GET /api/v1/devices/{id}/installation_history"]["count"] == 40
+
+
+def crash_once(flag_path, value):
+    """exits the process unpickling it the first time, like a worker dying as soon as it takes a chunk"""
+    if not os.path.exists(flag_path):
+        open(flag_path, "w").close()
+        os._exit(1)
+    return value
+
+
+class CrashOnce:
+    def __init__(self, flag_path, value):
+        self.flag_path, self.value = flag_path, value
+
+    def __reduce__(self):
+        return crash_once, (self.flag_path, self.value)
+
+
+def test_fleet_job_runner_requeues_chunk_of_worker_dying_before_it_starts(server, tmp_path):
+    config = WorkerConfig(server.config.username, server.config.password,
+                          client_kwargs={"base_url": server.url, "account_url": server.url})
+    runner = FleetJobRunner([config, config], threads_per_worker=2)
+    device_names = [f"default-{i:06d}" for i in range(20)]
+    items = device_names[:5] + [CrashOnce(str(tmp_path / "crashed"), "default-000020")] + device_names[5:]
+    results = {result.item: result for result in runner.run(history_length, items)}
+    assert set(results) == set(device_names) | {"default-000020"}
+    assert all(result.ok for result in results.values())
+    assert [stats["error"] for stats in runner.stats["workers"].values()].count("exited with code 1") == 1
+
+
+def test_sync_history_only_downloads_new_entries(server, client):
+    store = HistoryStore()
+    device_names = ["default-000020", "default-000021"]
+    assert client.sync_history(store, device_names=device_names, page_size=4).new_entries == 30
+    history_route = "GET /api/v1/devices/{uuid}/installation_history"
+    requests = server.state.requests[history_route]
+    assert client.sync_history(store, device_names=device_names, page_size=4).new_entries == 0
+    assert server.state.requests[history_route] == requests + 2
+    assert store.device_history("default", "default-000020") == \
+        client.get_device_history("default-000020", limit=15)["values"]
+
+
+def test_resolve_devices_lists_shared_prefixes(server, client):
+    device_names = [f"default-{i:06d}" for i in range(100, 200)] + ["default-00010", "missing"]
+    searches = server.state.requests[search_route]
+    devices = client.resolve_devices(device_names)
+    assert server.state.requests[search_route] - searches < 10
+    assert all(devices[f"default-{i:06d}"]["deviceName"] == f"default-{i:06d}" for i in range(100, 200))
+    assert devices["default-00010"] is None and devices["missing"] is None
+
+
+def test_typed_models_and_device_inventory(client):
+    group_id = client.resolve_group("default-group-0001")["id"]
+    devices = list(client.iter_group_devices(group_id))
+    inventory = client.device_inventory(group_id)
+    assert len(inventory) == len(devices) == 300
+    assert [device.raw for device in inventory] == devices
+    assert inventory.counts("status") == {"UpToDate": 300}
+    # a uuid that would not format back to the same string keeps the column as a plain list
+    odd = [{**devices[0], "uuid": devices[0]["uuid"].upper()}, {**devices[1], "uuid": "{%s}" % devices[1]["uuid"]}]
+    assert [device.raw for device in ModelTable(Device, devices[2:4] + odd)] == devices[2:4] + odd
+    # optional keys missing from the payload stay missing in raw
+    partial = [{key: value for key, value in devices[0].items() if key not in ("activatedAt", "lastSeen")},
+               {key: value for key, value in devices[1].items() if key != "activatedAt"}]
+    assert Device.from_dict(partial[0]).activated_at is None and Device.from_dict(partial[0]).raw == partial[0]
+    assert [device.raw for device in ModelTable(Device, partial + devices[2:4])] == partial + devices[2:4]
+    entry = {"deviceUuid": devices[0]["uuid"], "note": 1}
+    assert HistoryEntry.from_dict(entry).raw == entry
+    entry = client.get_device_history("default-000001", typed=True)[0]
+    assert isinstance(entry, HistoryEntry) and entry.campaign_id
+
+
+def test_structured_queue_logging(server, client, capsys):
+    default_level = logging.getLevelName(os.environ.get("HERE_OTA_LOG_LEVEL", "INFO").upper())
+    assert set_up_logger("here-ota-test-default").level == default_level
+    logger = set_up_logger("here-ota-client")
+    assert set_up_logger("here-ota-client").handlers == logger.handlers and len(logger.handlers) == 1
+    configure_logging(level="INFO", structured=True, use_queue=True)
+    try:
+        client.get_device_history("default-000001")
+        logger.info("synced %s devices", 3, extra={"env": "default"})
+    finally:
+        # stops the listener once the queued records are written
+        configure_logging(level=default_level)
+    records = [json.loads(line) for line in capsys.readouterr().err.splitlines() if line.startswith("{")]
+    assert all(record["level"] != "DEBUG" for record in records)
+    assert records[-1] == {**records[-1], "message": "synced 3 devices", "env": "default", "logger": "here-ota-client"}
+
+
+def test_launch_campaigns_on_groups_and_device_cohorts(server, client):
+    update = next(client.iter_updates())
+    cohort = [f"default-{i:06d}" for i in range(10, 30)]
+    manifest = client.launch_campaigns("rollout", update["name"], groups=["default-group-0001", "missing"],
+                                       devices={"wave-1": cohort + ["missing"], "default-group-0001": cohort[:5]},
+                                       rate=100)
+    assert set(manifest.campaign_ids) == {("group", "default-group-0001"), ("devices", "wave-1"),
+                                          ("devices", "default-group-0001")}
+    assert set(manifest.failed) == {("group", "missing")}
+    assert manifest.results["devices", "wave-1"].missing == ["missing"]
+    env = server.state.envs[client.current_env]
+    campaign = env.campaigns[manifest.campaign_ids["devices", "wave-1"]]
+    assert campaign["update"] == update["uuid"]
+    assert len(env.group_members[campaign["groups"][0]]) == len(cohort)
+    assert "Host" not in client.headers
+
+    # the group of the cohort already exists, the error of the create request is recorded and nothing is launched
+    campaigns = len(env.campaigns)
+    manifest = client.launch_campaigns("rollout", update_id=update["uuid"], devices={"wave-1": cohort})
+    result = manifest.results["devices", "wave-1"]
+    assert not result.ok and not result.created_group and "409" in result.error
+    assert len(env.campaigns) == campaigns
+
+    # a failed campaign request still reports the group created for the cohort
+    server.call(lambda: server.state.inject_faults("POST /api/v2/campaigns", 400))
+    manifest = client.launch_campaigns("rollout", update_id=update["uuid"], devices={"wave-2": cohort})
+    result = manifest.results["devices", "wave-2"]
+    assert not result.ok and result.created_group and "400" in result.error
+    assert len(env.group_members[result.group_id]) == len(cohort) and len(env.campaigns) == campaigns
+    assert set(manifest.failed) == {("devices", "wave-2")}
+
+
+def test_fleet_export_resumes_and_retries_failed_devices(client, tmp_path):
+    group_id = client.resolve_group("default-group-0001")["id"]
+    devices = [device for _, device in zip(range(30), client.iter_group_devices(group_id))]
+    broken = {**devices[0], "uuid": "00000000-0000-0000-0000-000000000000", "deviceName": "broken"}
+
+    def interrupted():
+        yield from devices[:10]
+        raise RuntimeError("interrupted")
+
+    path = tmp_path / "fleet.jsonl"
+    exporter = FleetExporter(client, str(path), max_workers=2)
+    with pytest.raises(RuntimeError):
+        exporter.export_devices(interrupted())
+    written = len(path.read_text().splitlines())
+    assert 0 < written <= 10
+    summary = exporter.export_devices(devices + [broken])
+    assert (summary.skipped, summary.written, summary.failed) == (written, 31 - written, 1)
+    summary = exporter.export_devices(devices + [broken])
+    assert (summary.skipped, summary.written, summary.failed) == (30, 1, 1)
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert sorted(record["uuid"] for record in records if not record["errors"]) == \
+        sorted(device["uuid"] for device in devices)
+    assert [record["deviceName"] for record in records if record["errors"]] == ["broken", "broken"]
+
+    csv_path = tmp_path / "fleet.csv"
+    assert FleetExporter(client, str(csv_path)).export_devices(devices[:5]).written == 5
+    with open(csv_path, newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert sorted(row["deviceName"] for row in rows) == sorted(device["deviceName"] for device in devices[:5])
+    assert all(json.loads(row["history"])["values"] and json.loads(row["errors"]) == {} for row in rows)
+
+
+def test_name_index_lookups_policies_and_incremental_refresh():
+    groups = [{"id": str(i), "groupName": name, "createdAt": f"2023-01-0{i}T00:00:00Z"}
+              for i, name in enumerate(["eu-cars", "eu-trucks", "us-cars", "eu-cars"], 1)]
+    name_index = index.NameIndex("id", "groupName")
+    assert name_index.refresh(reversed(groups)) == 4
+    assert [group["id"] for group in name_index.lookup("eu-", index.PREFIX)] == ["4", "1", "2"]
+    assert [group["groupName"] for group in name_index.lookup("cars", index.SUBSTRING)] == \
+        ["eu-cars", "eu-cars", "us-cars"]
+    assert name_index.resolve("us-cars")["id"] == "3"
+    assert name_index.resolve("missing") is None
+    with pytest.raises(AmbiguousMatchError):
+        name_index.resolve("eu-cars")
+    assert name_index.resolve("eu-cars", policy=index.FIRST)["id"] == "4"
+    assert name_index.resolve("eu-cars", policy=lambda name, matches: matches[-1])["id"] == "1"
+    # a refresh stops at the first item already indexed
+    newest = {"id": "5", "groupName": "us-trucks", "createdAt": "2023-01-05T00:00:00Z"}
+    seen = []
+    assert name_index.refresh(seen.append(group) or group for group in [newest] + groups[::-1]) == 1
+    assert [group["id"] for group in seen] == ["5", "4"]
+
+
+def test_group_index_refresh_costs_one_request(server, client):
+    groups_route = "GET /api/v1/device_groups"
+    env = server.state.envs["default"]
+    if len(env.groups) < 250:
+        # more than one page of groups
+        server.call(lambda: [env.add_group(f"test-filler-{i:03d}") for i in range(250 - len(env.groups))])
+    client.resolve_group("default-group-0001")
+    requests = server.state.requests[groups_route]
+    for _ in range(5):
+        client.find_group_id_by_name("default-group-0001", policy="unique")
+    assert server.state.requests[groups_route] - requests == 5
+    group_id = client.create_static_group("test-index-refresh")
+    assert client.resolve_group("test-index-refresh")["id"] == group_id
+
+
+def test_decode_device_events_rejects_and_falls_back():
+    def frame(device_uuid, event_type="EcuInstallationCompleted"):
+        return json.dumps({"type": "DeviceEventMessage", "event": {
+            "deviceUuid": device_uuid, "eventType": {"id": event_type, "version": 0},
+            "receivedAt": "2023-01-01T00:00:00Z", "payload": {"correlationId": "urn:here-ota:campaign:c1"}}})
+
+    seen = json.dumps({"type": "DeviceSeen", "event": {"uuid": "d1"}})
+    # mentions the marker without being a device event
+    lookalike = json.dumps({"type": "DeviceSeen", "event": {"note": "DeviceEventMessage"}})
+    missing_payload = json.dumps({"type": "DeviceEventMessage", "event": {"eventType": {"id": "x"}}})
+    assert decode_device_event(seen) is None and decode_device_event(lookalike) is None
+    event = decode_device_event(frame("d1"))
+    assert (event.device_uuid, event.event_type, event.campaign_id) == ("d1", "EcuInstallationCompleted", "c1")
+    assert decode_device_events([seen, lookalike]) == []
+    assert [event.device_uuid for event in decode_device_events([frame("d1"), seen, frame("d2")])] == ["d1", "d2"]
+    # a malformed frame or an event without payload only drops that frame
+    batch = [frame("d1"), '{"type": "DeviceEventMessage", "event": {', missing_payload, frame("d2")]
+    assert [event.device_uuid for event in decode_device_events(batch)] == ["d1", "d2"]
+
+
+def test_event_stream_filters_reconnects_and_applies_backpressure(server, client):
+    group_id = client.resolve_group("default-group-0001")["id"]
+    update_id = next(client.iter_updates())["uuid"]
+
+    async def launch(stream, maxsize):
+        campaign_id = await asyncio.to_thread(client.create_campaign, "test-events", update_id, [group_id])
+        completed = stream.subscribe(campaigns=[campaign_id], event_types=["EcuInstallationCompleted"],
+                                     maxsize=maxsize)
+        other = stream.subscribe(campaigns=["other-campaign"])
+        await asyncio.to_thread(client.launch_campaign, campaign_id)
+        return completed, other
+
+    async def run():
+        async with AsyncHereOtaClient(server.config.username, server.config.password, base_url=server.url,
+                                      account_url=server.url) as async_client:
+            # reconnects after 0.1 to 0.2s, long enough for _wait_reconnected to see the connection drop
+            async with async_client.event_stream(min_backoff=0.2, max_batch=20) as stream:
+                await asyncio.wait_for(stream.connected.wait(), 5)
+                # a small queue read slowly, the socket waits for the subscriber instead of dropping events
+                completed, other = await launch(stream, maxsize=5)
+                await asyncio.sleep(0.2)
+                assert completed.queue.qsize() == 5
+                events = [await asyncio.wait_for(completed.get(), 5) for _ in range(300)]
+                assert len({event.device_uuid for event in events}) == 300 and other.queue.empty()
+                assert {event.event_type for event in events} == {"EcuInstallationCompleted"}
+
+                server.call(server.state.close_sockets)
+                await asyncio.wait_for(_wait_reconnected(stream), 5)
+                completed, _ = await launch(stream, maxsize=1000)
+                events = [await asyncio.wait_for(completed.get(), 5) for _ in range(300)]
+                assert len({event.device_uuid for event in events}) == 300
+
+    asyncio.run(run())
+
+
+async def _wait_reconnected(stream):
+    while stream.connected.is_set():
+        await asyncio.sleep(0.01)
+    await stream.connected.wait()
+
+
+def test_retry_policy_decisions():
+    policy = RetryPolicy(retries=2, backoff=0.1, max_backoff=1)
+    assert policy.should_retry("POST", 429, 0) and not policy.should_retry("POST", 503, 0)
+    assert policy.should_retry("get", 503, 1) and policy.should_retry("DELETE", None, 0)
+    assert not policy.should_retry("POST", None, 0) and not policy.should_retry("GET", 404, 0)
+    assert not policy.should_retry("GET", 429, 2)
+    assert policy.delay(0, "0.5") == 0.5 and policy.delay(0, "120") == 1
+    assert all(0 <= policy.delay(attempt) <= min(1, 0.1 * 2 ** attempt) for attempt in range(6))
+    assert 0 <= policy.delay(0, "soon") <= 0.1
+    assert parse_retry_after("3") == 3 and parse_retry_after("-1") == 0 and parse_retry_after("soon") is None
+    assert 8 < parse_retry_after(formatdate(time.time() + 10, usegmt=True)) <= 10
+
+
+def test_token_bucket_pacing():
+    bucket = TokenBucket(rate=50, burst=5)
+    start = time.monotonic()
+    waits = [bucket.acquire() for _ in range(15)]
+    assert waits[:5] == [0.0] * 5 and all(wait > 0 for wait in waits[5:])
+    # past the burst the tokens come at the rate
+    assert time.monotonic() - start >= 10 / 50 * 0.9
+
+
+def test_send_retries_and_closes_throttled_responses(server):
+    client = HereOtaClient(server.config.username, server.config.password, base_url=server.url,
+                           account_url=server.url, metrics=RequestMetrics(),
+                           request_policy=RequestPolicy(retry=RetryPolicy(backoff=0.01)))
+    pool = client.get_adapter(server.url).poolmanager.connection_from_url(server.url)
+    route = "GET /api/v1/user_repo/targets.json"
+    sent = server.state.requests[route]
+    server.call(lambda: server.state.inject_faults(route, 503, 429, retry_after="0"))
+    with client.cached_get(here_ota_software_versions) as r:
+        assert r.ok and r.json()["signed"]["targets"]
+    assert server.state.requests[route] - sent == 3
+    assert client.stats()["endpoints"][route]["retries"] == 2
+    # the streamed responses of the failed attempts gave their connection back
+    assert pool.pool.qsize() == pool.pool.maxsize
+
+    route = "POST /api/v1/device_groups"
+    sent = server.state.requests[route]
+    server.call(lambda: server.state.inject_faults(route, 503))
+    with pytest.raises(HTTPError):
+        client.create_static_group("test-retry")
+    assert server.state.requests[route] - sent == 1
+    server.call(lambda: server.state.inject_faults(route, 429, retry_after="0"))
+    assert client.create_static_group("test-retry")
+    assert server.state.requests[route] - sent == 3
+    client.close()
+
+
+def test_campaign_monitor_merges_events_and_backs_off(server, client):
+    group_id = client.resolve_group("default-group-0001")["id"]
+    update_id = next(client.iter_updates())["uuid"]
+
+    async def run():
+        async with AsyncHereOtaClient(server.config.username, server.config.password, base_url=server.url,
+                                      account_url=server.url) as async_client:
+            async with async_client.event_stream() as stream:
+                await asyncio.wait_for(stream.connected.wait(), 5)
+                campaign_id = await asyncio.to_thread(client.create_campaign, "test-monitor", update_id, [group_id])
+                monitor = client.monitor_campaigns([campaign_id], min_interval=0.02, max_interval=0.1)
+                subscription = stream.subscribe(campaigns=[campaign_id], maxsize=5000)
+                completed = stream.subscribe(campaigns=[campaign_id], event_types=["EcuInstallationCompleted"])
+                consumer = asyncio.ensure_future(monitor.consume(subscription))
+                await asyncio.to_thread(client.launch_campaign, campaign_id)
+                for _ in range(300):
+                    await asyncio.wait_for(completed.get(), 5)
+                while not subscription.queue.empty():
+                    await asyncio.sleep(0.01)
+                consumer.cancel()
+                # every device is known from the events alone, before the first poll
+                counts = dict(monitor.progress[campaign_id].counts)
+                assert monitor.requests == 0 and counts[INSTALLED] + counts[FAILED] == 300
+                snapshots = await asyncio.to_thread(lambda: [progress[campaign_id].counts
+                                                             for progress in monitor.watch(timeout=10)])
+                return campaign_id, monitor, counts, snapshots
+
+    campaign_id, monitor, counts, snapshots = asyncio.run(run())
+    stats = client.get_campaign_stats(campaign_id)
+    assert monitor.finished and stats["status"] == "finished"
+    assert counts[FAILED] == stats["failed"] and counts[INSTALLED] == stats["finished"] - stats["failed"]
+    assert snapshots[-1] == {**counts, DOWNLOADING: 0, INSTALLING: 0, PENDING: 0}
+
+    # stats that stop changing back the interval off up to max_interval, a change brings it back to min_interval
+    idle_id = client.create_campaign("test-monitor-idle", update_id, [group_id])
+    monitor = client.monitor_campaigns([idle_id], min_interval=1, max_interval=4, backoff=2)
+    intervals = []
+    for _ in range(4):
+        monitor.poll()
+        intervals.append(monitor.interval)
+    assert intervals == [1, 2, 4, 4] and monitor.requests == 4
+    client.launch_campaign(idle_id)
+    monitor.poll()
+    assert monitor.interval == 1 and monitor.progress[idle_id].status == "launched"
+
+
+def test_session_store_warm_start_lazy_sign_in_and_expiry(server, tmp_path):
+    sign_in_route = "POST /api/account/sign-in-with-password"
+    store = SessionStore(str(tmp_path / "session.json"))
+
+    def make_client(**kwargs):
+        return HereOtaClient(server.config.username, server.config.password, base_url=server.url,
+                             account_url=server.url, session_store=store, **kwargs)
+
+    sign_ins = server.state.requests[sign_in_route]
+    make_client().close()
+    assert server.state.requests[sign_in_route] == sign_ins + 1
+    assert os.stat(store.path).st_mode & 0o777 == 0o600
+
+    # a warm start reuses the stored session without signing in
+    client = make_client()
+    assert client.get_device_uuid("default-000050") and client.current_env == "default"
+    assert server.state.requests[sign_in_route] == sign_ins + 1
+    client.close()
+
+    # with lazy=True and nothing stored the sign in waits for the first request
+    store.clear()
+    client = make_client(lazy=True)
+    assert server.state.requests[sign_in_route] == sign_ins + 1
+    assert client.get_device_uuid("default-000051")
+    assert server.state.requests[sign_in_route] == sign_ins + 2
+    client.close()
+
+    # a restored session that expired gets a 401, signs in again and the request is retried once
+    server.call(server.state.expire_sessions)
+    client = make_client()
+    searches = server.state.requests[search_route]
+    assert client.get_device_uuid("default-000052")
+    assert server.state.requests[sign_in_route] == sign_ins + 3
+    assert server.state.requests[search_route] == searches + 2
+    client.close()
+
+    # a stored csrf token the server no longer accepts gets a 403 and is replaced the same way
+    with open(store.path) as f:
+        state = json.load(f)
+    state["csrf_token"] = "stale"
+    state["env_contexts"] = {}
+    store.save(state)
+    client = make_client()
+    assert client.get_device_uuid("default-000053")
+    assert server.state.requests[sign_in_route] == sign_ins + 4
+    assert server.state.requests[search_route] == searches + 4
+    client.close()
+
+
+def test_concurrent_identical_searches_share_one_request(server, client):
+    device_names = ["default-000100", "default-000101"]
+    callers = 8
+    barrier = threading.Barrier(callers)
+
+    def resolve(_):
+        barrier.wait()
+        return client.resolve_devices(device_names)
+
+    searches = server.state.requests[search_route]
+    # the latency keeps the first search in flight while the other callers arrive
+    server.call(setattr, server.config, "latency", 0.2)
+    try:
+        with ThreadPoolExecutor(max_workers=callers) as executor:
+            results = list(executor.map(resolve, range(callers)))
+    finally:
+        server.call(setattr, server.config, "latency", 0)
+    assert server.state.requests[search_route] == searches + 1
+    assert all(result == results[0] and all(result.values()) for result in results)